@@ -0,0 +1,205 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .temporal import TemporalEntity, TemporalEntityType
+
+'''
+Columnar storage for the entities of an output, numbers live in numpy arrays (one element per entity)
+and text in a string pool the rows point into, repeated strings (dates, years, sources) are stored once.
+
+Aggregations (counts per year, histograms, filters) run on the arrays without creating a single
+TemporalEntity, rows are only turned back into entities when something asks for them.
+Tables are immutable, every filter or sort returns a new table sharing the pool with the old one.
+'''
+
+_TYPE_CODES = {TemporalEntityType.WITH_YEAR: 1, TemporalEntityType.NO_YEAR: 2}
+_CODE_TYPES = {code: entity_type for entity_type, code in _TYPE_CODES.items()}
+
+_TEXT_COLUMNS = ("event", "date", "year_text", "context_before", "context_after", "year_before", "source")
+
+
+class StringPool(object):
+    def __init__(self):
+        self.strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def intern(self, s: str) -> int:
+        string_id = self._ids.get(s)
+        if string_id is None:
+            string_id = self._ids[s] = len(self.strings)
+            self.strings.append(s)
+        return string_id
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class EntityTable(object):
+    def __init__(self, columns: Dict[str, np.ndarray], pool: StringPool):
+        self.columns = columns
+        self.pool = pool
+
+    @classmethod
+    def from_entities(cls, entities: Iterable[TemporalEntity]) -> "EntityTable":
+        pool = StringPool()
+        intern = pool.intern
+
+        # one pass over the entities reading the slots directly, this is the only per entity python loop
+        rows = [(e._year_value, e._order, _TYPE_CODES.get(e._entity_type, 0), e._sentence_index,
+                 intern(e._event), intern(e._date), intern(e._year), intern(e._context_before), intern(e._context_after),
+                 intern(e._year_before), intern(e._source)) for e in entities]
+
+        year_values = [r[0] for r in rows]
+        columns = {
+            "year": np.array([y if y is not None else 0 for y in year_values], dtype=np.int32),
+            "has_year": np.array([y is not None for y in year_values], dtype=bool),
+            "order": np.array([r[1] for r in rows], dtype=np.int64),
+            "entity_type": np.array([r[2] for r in rows], dtype=np.int8),
+            "sentence_index": np.array([r[3] for r in rows], dtype=np.int32),
+        }
+        for offset, name in enumerate(_TEXT_COLUMNS):
+            columns[name] = np.array([r[4 + offset] for r in rows], dtype=np.int32)
+
+        return cls(columns, pool)
+
+    def __len__(self):
+        return len(self.columns["year"])
+
+    def __iter__(self) -> Iterator[TemporalEntity]:
+        return (self.entity(i) for i in range(len(self)))
+
+    def __getitem__(self, i: int) -> TemporalEntity:
+        return self.entity(i)
+
+    @property
+    def years(self) -> np.ndarray:
+        return self.columns["year"]
+
+    @property
+    def has_year(self) -> np.ndarray:
+        return self.columns["has_year"]
+
+    @property
+    def orders(self) -> np.ndarray:
+        return self.columns["order"]
+
+    @property
+    def entity_types(self) -> np.ndarray:
+        return self.columns["entity_type"]
+
+    @property
+    def sentence_indexes(self) -> np.ndarray:
+        return self.columns["sentence_index"]
+
+    def text(self, column: str, i: int) -> str:
+        return self.pool[int(self.columns[column][i])]
+
+    def entity(self, i: int) -> TemporalEntity:
+        c = self.columns
+        strings = self.pool.strings
+
+        entity = TemporalEntity(event=strings[c["event"][i]], date=strings[c["date"][i]], year=strings[c["year_text"][i]],
+                                entity_type=_CODE_TYPES.get(int(c["entity_type"][i]), TemporalEntityType.WITH_YEAR), order=int(c["order"][i]),
+                                context_before=strings[c["context_before"][i]], context_after=strings[c["context_after"][i]],
+                                source=strings[c["source"][i]], sentence_index=int(c["sentence_index"][i]))
+        entity._year_before = strings[c["year_before"][i]]
+        return entity
+
+    def to_entities(self) -> List[TemporalEntity]:
+        return [self.entity(i) for i in range(len(self))]
+
+    # new tables, the pool is shared
+
+    def take(self, indexes: np.ndarray) -> "EntityTable":
+        return EntityTable({name: column[indexes] for name, column in self.columns.items()}, self.pool)
+
+    def filter(self, mask: np.ndarray) -> "EntityTable":
+        return self.take(np.flatnonzero(mask))
+
+    def with_type(self, entity_type: TemporalEntityType) -> "EntityTable":
+        return self.filter(self.entity_types == _TYPE_CODES[entity_type])
+
+    def between_years(self, start_year: int, end_year: int) -> "EntityTable":
+        # inclusive on both ends, entities without a year are never in range
+        return self.filter(self.has_year & (self.years >= start_year) & (self.years <= end_year))
+
+    def from_source(self, source: str) -> "EntityTable":
+        source_id = self.pool._ids.get(source)
+        if source_id is None:
+            return self.take(np.array([], dtype=np.int64))
+        return self.filter(self.columns["source"] == source_id)
+
+    def sort_by_year(self) -> "EntityTable":
+        # stable, same as sorting the entity list by year. Normalized years have at most 4 digits,
+        # as int16 numpy sorts them with a radix sort
+        years = self.years
+        if len(years) and years.min() > np.iinfo(np.int16).min and years.max() < np.iinfo(np.int16).max:
+            years = years.astype(np.int16)
+        return self.take(np.argsort(years, kind="stable"))
+
+    # aggregations
+
+    def count_by_year(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+            (years, counts) sorted by year, entities without a year are left out
+        '''
+        return np.unique(self.years[self.has_year], return_counts=True)
+
+    def count_by_year_text(self) -> Dict[str, int]:
+        # keyed by the year as it's displayed, which is what the year maps on ParserOutput use, in year order
+        rows = np.flatnonzero(self.has_year)
+        year_ids = self.columns["year_text"][rows]
+        counts = np.bincount(year_ids, minlength=len(self.pool))
+        return {self.pool[int(i)]: int(counts[i]) for i in self.year_text_ids_by_year(rows)}
+
+    def indexes_by_year_text(self) -> Dict[str, np.ndarray]:
+        rows = np.flatnonzero(self.has_year)
+        if len(rows) == 0:
+            return {}
+
+        ordered_ids = self.year_text_ids_by_year(rows)
+        # there are rarely more than a few thousand distinct years, as int16 the stable sort below is a radix sort
+        rank_type = np.int16 if len(ordered_ids) < np.iinfo(np.int16).max else np.int32
+        rank = np.zeros(len(self.pool), dtype=rank_type)
+        rank[ordered_ids] = np.arange(len(ordered_ids), dtype=rank_type)
+
+        # one stable sort groups the rows by year and keeps their order within a year
+        row_ranks = rank[self.columns["year_text"][rows]]
+        order = rows[np.argsort(row_ranks, kind="stable")]
+        boundaries = np.cumsum(np.bincount(row_ranks, minlength=len(ordered_ids)))[:-1]
+        return {self.pool[int(i)]: indexes for i, indexes in zip(ordered_ids, np.split(order, boundaries))}
+
+    def year_text_ids_by_year(self, rows: np.ndarray) -> np.ndarray:
+        # pool ids of the year strings present in rows, ordered by year value
+        year_ids = self.columns["year_text"][rows]
+        present = np.zeros(len(self.pool), dtype=bool)
+        present[year_ids] = True
+        value_of_id = np.zeros(len(self.pool), dtype=np.int32)
+        value_of_id[year_ids] = self.years[rows]
+
+        ids = np.flatnonzero(present)
+        return ids[np.argsort(value_of_id[ids], kind="stable")]
+
+    def year_histogram(self, group_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+            (first year of every group, counts) for groups of group_size years, empty groups are left out
+        '''
+        if group_size <= 0:
+            raise ValueError("Group size must be a positive number")
+
+        groups = (self.years[self.has_year] // group_size) * group_size
+        return np.unique(groups, return_counts=True)
+
+    def count_by_type(self) -> Dict[TemporalEntityType, int]:
+        counts = np.bincount(self.entity_types, minlength=max(_CODE_TYPES) + 1)
+        return {entity_type: int(counts[code]) for code, entity_type in _CODE_TYPES.items()}
+
+    def year_range(self) -> Optional[Tuple[int, int]]:
+        years = self.years[self.has_year]
+        if len(years) == 0:
+            return None
+        return int(years.min()), int(years.max())
@@ -0,0 +1,93 @@
+import codecs
+import mmap
+import os
+import re
+from typing import BinaryIO, Iterable, Iterator
+
+'''
+Reads documents in sentence aligned chunks instead of one big string. Files are memory mapped so the
+OS pages them in as they're decoded and only the chunk being cut is held as a python string,
+uploads are read off their stream the same way.
+
+Chunks end after a paragraph or sentence boundary whenever there is one within chunk_length characters,
+at the last whitespace otherwise, concatenating every chunk gives back the decoded document.
+Offsets are character offsets into that decoded document.
+'''
+
+DEFAULT_INGESTION_CHUNK_LENGTH = 1024 * 1024
+_BLOCK_SIZE = 1024 * 1024
+
+_BOUNDARY = re.compile(r'\n\s*\n|(?<=[.!?])\s+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class DocumentChunk(object):
+    def __init__(self, text: str, start: int):
+        self.text = text
+        self.start = start
+        self.end = start + len(text)
+
+    def __len__(self):
+        return len(self.text)
+
+
+def iter_file_chunks(path: str, chunk_length: int = DEFAULT_INGESTION_CHUNK_LENGTH, encoding: str = "utf-8") -> Iterator[DocumentChunk]:
+    with open(path, "rb") as f:
+        # an empty file can't be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            blocks = (mapped[i:i+_BLOCK_SIZE] for i in range(0, len(mapped), _BLOCK_SIZE))
+            yield from iter_decoded_chunks(blocks, chunk_length, encoding)
+
+
+def iter_stream_chunks(stream: BinaryIO, chunk_length: int = DEFAULT_INGESTION_CHUNK_LENGTH, encoding: str = "utf-8") -> Iterator[DocumentChunk]:
+    blocks = iter(lambda: stream.read(_BLOCK_SIZE), b"")
+    yield from iter_decoded_chunks(blocks, chunk_length, encoding)
+
+
+def iter_decoded_chunks(blocks: Iterable[bytes], chunk_length: int, encoding: str = "utf-8") -> Iterator[DocumentChunk]:
+    if chunk_length <= 0:
+        raise ValueError("Chunk length must be a positive number")
+
+    # incremental so a multi byte character split between two blocks still decodes, bad bytes shouldn't sink a whole corpus
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buffer = ""
+    offset = 0
+
+    for block in blocks:
+        buffer += decoder.decode(block)
+        while len(buffer) > chunk_length:
+            cut = find_cut(buffer, chunk_length)
+            yield DocumentChunk(buffer[:cut], offset)
+            offset += cut
+            buffer = buffer[cut:]
+
+    buffer += decoder.decode(b"", final=True)
+    while len(buffer) > chunk_length:
+        cut = find_cut(buffer, chunk_length)
+        yield DocumentChunk(buffer[:cut], offset)
+        offset += cut
+        buffer = buffer[cut:]
+
+    if buffer:
+        yield DocumentChunk(buffer, offset)
+
+
+def find_cut(buffer: str, chunk_length: int) -> int:
+    window = buffer[:chunk_length]
+
+    last_boundary = None
+    for match in _BOUNDARY.finditer(window):
+        last_boundary = match
+    if last_boundary is not None and last_boundary.end() > 0:
+        return last_boundary.end()
+
+    last_whitespace = None
+    for match in _WHITESPACE.finditer(window):
+        last_whitespace = match
+    if last_whitespace is not None and last_whitespace.end() > 0:
+        return last_whitespace.end()
+
+    return chunk_length
@@ -14,12 +14,14 @@ class CSVExporter():
     def __init__(self):
         pass
 
-    def export(self, file_name:str, parser_output: ParserOutput):
+    def export(self, file_name:str, parser_output: ParserOutput, folder_path: Optional[str] = None, include_source: bool = False):
         
         field_names = ["Date", "Year", "Event", "Context_Before", "Context_After"]
+        if include_source:
+            field_names.append("Source")
         file_name += ".csv"
 
-        parent_output_dir = get_export_folder_path(nesting_level=2)
+        parent_output_dir = folder_path or get_export_folder_path(nesting_level=2)
 
         os.makedirs(parent_output_dir, exist_ok=True)
 
@@ -31,13 +33,16 @@ class CSVExporter():
             writer.writeheader()
             
             for temporal_entity in parser_output.content:
-                writer.writerow({
+                row = {
                     "Date": temporal_entity.date,
                     "Year": temporal_entity.year,
                     "Event": temporal_entity.event,
                     "Context_Before": temporal_entity.context_before,
                     "Context_After": temporal_entity.context_after,
-                })
+                }
+                if include_source:
+                    row["Source"] = temporal_entity.source
+                writer.writerow(row)
 
         print("Saved to " + file_path)
 
@@ -1,17 +1,33 @@
-from typing import List, Dict
-
-from nltk.sem.logic import EntityType
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from enum import Enum
 
 from backend.commons.t2t_logging import log_decorated, log_error, log_info
+from backend.commons.t2t_enums import ParserProfile
 from ..commons.temporal import TemporalEntity, TemporalEntityType
+from ..commons.year_index import TrackedEntityList, YearIndex, unique_events
 
 import datetime
+import hashlib
 
 import re
 
 class ParserSettings(object):
-    def __init__(self, context_radius: int = 0, name: str = "NAME_NOT_SET"):
+    def __init__(self, context_radius: int = 0, name: str = "NAME_NOT_SET", chunk_length: int = 0, n_process: int = 1, chunk_batch_size: int = 1, profile: ParserProfile = ParserProfile.FULL,
+                 inference_batch_size: int = 32, max_batch_tokens: int = 2048):
         self._context_radius = context_radius
+        self._profile = profile
+        self._inference_batch_size = inference_batch_size
+        self._max_batch_tokens = max_batch_tokens
+
+        # chunked parsing, 0 lets the parser decide (no chunking unless the document is too long for the model)
+        self._chunk_length = chunk_length
+        self._n_process = n_process
+        self._chunk_batch_size = chunk_batch_size
+
+    def cache_key(self) -> str:
+        # anything that changes the output has to end up in here, every field does for now
+        values = [(k, v.value if isinstance(v, Enum) else v) for k, v in sorted(vars(self).items())]
+        return repr(values)
 
     @property
     def context_radius(self):
@@ -21,20 +37,142 @@ class ParserSettings(object):
     def context_radius(self, radius: int):
         self._context_radius = radius
 
+    @property
+    def profile(self) -> ParserProfile:
+        return self._profile
+
+    @profile.setter
+    def profile(self, profile: ParserProfile):
+        self._profile = profile
+
+    @property
+    def inference_batch_size(self):
+        return self._inference_batch_size
+
+    @inference_batch_size.setter
+    def inference_batch_size(self, batch_size: int):
+        self._inference_batch_size = batch_size
+
+    @property
+    def max_batch_tokens(self):
+        return self._max_batch_tokens
+
+    @max_batch_tokens.setter
+    def max_batch_tokens(self, max_tokens: int):
+        self._max_batch_tokens = max_tokens
+
+    @property
+    def chunk_length(self):
+        return self._chunk_length
+
+    @chunk_length.setter
+    def chunk_length(self, chunk_length: int):
+        self._chunk_length = chunk_length
 
-import nltk
+    @property
+    def n_process(self):
+        return self._n_process
+
+    @n_process.setter
+    def n_process(self, n_process: int):
+        self._n_process = n_process
+
+    @property
+    def chunk_batch_size(self):
+        return self._chunk_batch_size
+
+    @chunk_batch_size.setter
+    def chunk_batch_size(self, chunk_batch_size: int):
+        self._chunk_batch_size = chunk_batch_size
+
+
+_tokenizer = None
 
+def get_tokenizer():
+    # nltk and the punkt model take a while to load, only paid for by the code paths that split sentences
+    global _tokenizer
+    if _tokenizer is None:
+        import nltk
+        _tokenizer = nltk.data.load('nltk:tokenizers/punkt/english.pickle')
+    return _tokenizer
 
-tokenizer = nltk.data.load('nltk:tokenizers/punkt/english.pickle')
 
 class ParserInput():
-    _tokenizer = tokenizer
 
     def __init__(self, content):
-        self._content = content
+        self._text = content
+        self._chunks = None
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable):
+        '''
+            Builds an input out of document chunks (see ingestion) or plain strings without joining them,
+            batch mode and the persistence key go over the chunks, anything asking for the full content joins them once
+        '''
+        parser_input = cls(None)
+        parser_input._chunks = [getattr(chunk, "text", chunk) for chunk in chunks]
+        return parser_input
+
+    @property
+    def _content(self):
+        # plugins read and assign this directly, the chunks are joined the first time anything does
+        if self._chunks is not None:
+            self._text = "".join(self._chunks)
+            self._chunks = None # only ever one copy of the text
+        return self._text
+
+    @_content.setter
+    def _content(self, content):
+        self._text = content
+        self._chunks = None
+
+    def is_chunked(self) -> bool:
+        return self._chunks is not None
+
+    def iter_chunks(self) -> Iterator[str]:
+        if self._chunks is not None:
+            yield from self._chunks
+        elif isinstance(self._text, str):
+            yield self._text
+        else:
+            # tokenized input
+            yield " ".join(self._text)
+
+    def is_empty(self) -> bool:
+        return not any(chunk for chunk in self.iter_chunks())
+
+    def transform(self, function: Callable[[str], str]) -> None:
+        # for pre processors that work on local patterns, keeps a chunked input chunked
+        if self._chunks is not None:
+            self._chunks = [function(chunk) for chunk in self._chunks]
+        else:
+            self._content = function(self._content)
+
+    def content_hash(self) -> str:
+        digest = hashlib.sha256()
+        for chunk in self.iter_chunks():
+            digest.update(chunk.encode("utf-8"))
+        return digest.hexdigest()
+
+    def iter_sentences(self) -> Iterator[str]:
+        '''
+            Sentences in document order with the whitespace that follows them, so joining them gives back the text.
+            Chunks from ingestion end on sentence boundaries, sentences are looked for per chunk
+        '''
+        for chunk in self.iter_chunks():
+            spans = list(get_tokenizer().span_tokenize(chunk)) # type: ignore
+            if len(spans) == 0:
+                if chunk:
+                    yield chunk
+                continue
+
+            starts = [0] + [start for start, _ in spans[1:]]
+            ends = starts[1:] + [len(chunk)]
+            for start, end in zip(starts, ends):
+                yield chunk[start:end]
 
     def tokenize(self):
-        self._content = self._tokenizer.tokenize(self._content) # type: ignore
+        self._content = get_tokenizer().tokenize(self._content) # type: ignore
 
     def remove_citations(self):
         pass
@@ -58,7 +196,7 @@ class ParserInput():
             last_batch = batches.pop()  
             batches[-1]._content += last_batch._content  
         
-        log_decorated(f"Batching size: {batch_size} / {total_items} resulting in {len(batches)} batches")
+        log_decorated("Batching size: %s / %s resulting in %d batches", batch_size, total_items, len(batches))
         return batches
 
     def get_in_batches_by_percentage(self, percentage):
@@ -69,28 +207,136 @@ class ParserInput():
         batch_size = max(1, int((percentage / 100) * total_items))
         return self.get_in_batches(batch_size)
 
+    def get_in_chunks(self, max_chunk_length: int):
+        '''
+            Unlike get_in_batches this only cuts at paragraph or sentence boundaries (hard cuts only for
+            single sentences longer than the limit), and joining the chunk contents gives back the original text
+        '''
+        if max_chunk_length <= 0:
+            raise ValueError("Chunk length must be a positive number")
+
+        chunks = []
+        current = ""
+
+        for piece in split_at_boundaries(self.get_content(), max_chunk_length):
+            if current and len(current) + len(piece) > max_chunk_length:
+                chunks.append(ParserInput(current))
+                current = ""
+            current += piece
+
+        if current:
+            chunks.append(ParserInput(current))
+
+        log_decorated("Chunking length: %s / %d resulting in %d chunks", max_chunk_length, len(self.get_content()), len(chunks))
+        return chunks
+
+
+_PARAGRAPH_BOUNDARY = re.compile(r'\n\s*\n')
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+_WORD_BOUNDARY = re.compile(r'\s+')
+
+def split_at_boundaries(text: str, max_length: int) -> List[str]:
+    # paragraphs first, then sentences for the paragraphs that don't fit, separators stay attached to the left piece
+    pieces = []
+    for paragraph in _split_keeping_separators(text, _PARAGRAPH_BOUNDARY):
+        if len(paragraph) <= max_length:
+            pieces.append(paragraph)
+            continue
+
+        for sentence in _split_keeping_separators(paragraph, _SENTENCE_BOUNDARY):
+            if len(sentence) <= max_length:
+                pieces.append(sentence)
+                continue
+
+            for word in _split_keeping_separators(sentence, _WORD_BOUNDARY):
+                # no boundary left to respect at this point
+                for i in range(0, len(word), max_length):
+                    pieces.append(word[i:i+max_length])
+
+    return pieces
+
+def _split_keeping_separators(text: str, pattern) -> List[str]:
+    parts = []
+    last_end = 0
+    for match in pattern.finditer(text):
+        parts.append(text[last_end:match.end()])
+        last_end = match.end()
+
+    if last_end < len(text):
+        parts.append(text[last_end:])
 
+    return parts
+
+
+
+
+class ParseContext(object):
+    '''
+        Everything a single accept call needs besides the loaded model, parsers keep this out of self
+        so one loaded model can serve several requests at once. Parsers hang whatever intermediate
+        state they need (sentences, index maps) on it as well
+    '''
+    def __init__(self, input: ParserInput, settings: ParserSettings, contains_no_year_temporals: bool = True, batch_mode: bool = False, batch_offset: int = -1):
+        self.input = input
+        self.settings = settings
+        self.contains_no_year_temporals = contains_no_year_temporals and not batch_mode
+        self.batch_mode = batch_mode
+        self.batch_offset = batch_offset
+
+        self.sentences: list = []
+        self.sentence_start_to_index_map: Dict[int, int] = {}
+
+        if self.batch_mode:
+            self.validate_batch_mode()
+
+    def validate_batch_mode(self) -> None:
+        if self.batch_offset == -1:
+            log_error("Parser batch mode turned on but no batch information set")
+            raise ValueError("NO BATCH INFORMATION SET IN PARSER")
+
+    @property
+    def first_order(self) -> int:
+        return self.batch_offset + 1 if self.batch_mode else 0
 
 
 class ParserOutput(object):
     enable_creation_timestamps = False
 
+    # class level defaults as well, outputs pickled into the result cache before these existed don't have them
+    stage_timings = None
+    sentence_count = None
+    _table = None
+    _table_content = None
+    _year_index = None
+    _year_index_content = None
+    _caches = None
+
     def __init__(self, content: List[TemporalEntity], contains_no_year_temporals : bool = False, batch_mode=False, finalizeOnInit=True):
-        self._content = content
+        self._content = TrackedEntityList(content) if content is not None else None
         self.page_size = 20
         self.current_page = 0
         self.parser_name = ""
         self.elapsed_time: float
+        self.skipped_sentences = 0 # sentences never sent to the model, see temporal_prefilter
+        self.sentence_count: Optional[int] = None # sentences in the document, set by whatever split it anyway
+        self.stage_timings = None # StageTimings of the pipeline run that produced this, see t2t_metrics
 
         self._no_year_temporals = contains_no_year_temporals
         self._batch_mode = batch_mode
         self._finalized = False
         self._last_batch_max_order = 0
 
-        # for adding extras
-        self._year_number_map = None
-        self._year_entity_map = None
-        self._years = None
+        # for adding extras, year maps and the like, cached against the state of content, see cached()
+        self._caches = {}
+
+        # sorted by year, kept up to date with appends to content, see year_index
+        self._year_index = None
+        self._year_index_content = None
+
+        # columnar copy of the content for aggregations, see entity_table. An output created from a table
+        # has no content list until something asks for it, _table_content is the list the table was built from
+        self._table = None
+        self._table_content = None
 
         if self.enable_creation_timestamps:
             self._creation_timestamp = datetime.datetime.now()
@@ -106,6 +352,115 @@ class ParserOutput(object):
         if finalizeOnInit:
             self.finalize_after_init()
 
+    @classmethod
+    def from_table(cls, table, contains_no_year_temporals: bool = False, finalizeOnInit: bool = True) -> "ParserOutput":
+        '''
+            Output backed by an EntityTable, sorting and splitting off the no year entities happen on the table
+            and the entities of content are only created the first time content is read
+        '''
+        output = cls(None, contains_no_year_temporals, finalizeOnInit=False) # type: ignore
+        output._table = table
+        if finalizeOnInit:
+            output.finalize_after_init()
+        return output
+
+    def entity_table(self):
+        '''
+            The content as an EntityTable, rebuilt whenever content has changed since the last call.
+            Entities edited in place aren't changes of content, see year_index
+        '''
+        if self._content is None:
+            return self._table
+
+        state = self.content_state()
+        if self._table is None or self._table_content != state:
+            from .entity_table import EntityTable # numpy, only once something aggregates
+            self._table = EntityTable.from_entities(self._content)
+            self._table_content = state
+        return self._table
+
+    def has_current_table(self) -> bool:
+        '''
+            Table backed, or the table built for content is still up to date. Only then do aggregations go through the
+            table, building one for a list backed output costs several times the loop it would replace
+        '''
+        if self._content is None:
+            return True
+        return self._table is not None and self._table_content == self.content_state()
+
+    def materialized_content(self) -> TrackedEntityList:
+        if self._content is None:
+            self._content = TrackedEntityList(self._table.to_entities()) # type: ignore
+            self._table_content = self.content_state()
+        elif not isinstance(self._content, TrackedEntityList):
+            self._content = TrackedEntityList(self._content) # unpickled from before content was tracked
+        return self._content
+
+    def content_state(self):
+        # changes whenever content is replaced or mutated, a table backed output is only read through its table
+        if self._content is None:
+            return ("table", id(self._table))
+
+        content = self.materialized_content()
+        return (id(content), content.version)
+
+    def cached(self, name: str, build):
+        if self._caches is None:
+            self._caches = {}
+
+        state = self.content_state()
+        entry = self._caches.get(name)
+        if entry is None or entry[0] != state:
+            entry = self._caches[name] = (state, build())
+        return entry[1]
+
+    def invalidate_caches(self) -> None:
+        '''
+            For whoever edits entities in place (a year, a type), everything derived from content gets rebuilt
+        '''
+        self._caches = {}
+        self._year_index = None
+        self._year_index_content = None
+        self._table_content = None
+
+    def year_index(self) -> YearIndex:
+        '''
+            Content sorted by year, appends to content are inserted into it, any other change rebuilds it
+        '''
+        if self._batch_mode == True and self._finalized == False:
+            return YearIndex()
+
+        content = self.materialized_content()
+        index = self._year_index
+
+        if index is not None and self._year_index_content is content:
+            if index.content_version == content.version:
+                return index
+
+            appended = len(content) - index.content_length
+            # a handful of appends are cheaper to insert, a lot of them (a whole batch) cheaper to sort again
+            if index.content_rewrite_version == content.rewrite_version and 0 <= appended <= max(64, index.content_length // 8):
+                index.add_all(content[index.content_length:])
+                self.mark_indexed(index, content)
+                return index
+
+        index = YearIndex(content)
+        self._year_index = index
+        self._year_index_content = content
+        self.mark_indexed(index, content)
+        return index
+
+    def mark_indexed(self, index: YearIndex, content: TrackedEntityList) -> None:
+        index.content_version = content.version
+        index.content_rewrite_version = content.rewrite_version
+        index.content_length = len(content)
+
+    def entities_between(self, start_year: int, end_year: int) -> List[TemporalEntity]:
+        return self.year_index().entities_between(start_year, end_year)
+
+    def count_between(self, start_year: int, end_year: int) -> int:
+        return self.year_index().count_between(start_year, end_year)
+
     def finalize_after_init(self):
         if self._no_year_temporals and self._batch_mode == False:
             self.prepare_non_year_temporals()
@@ -114,27 +469,19 @@ class ParserOutput(object):
             self.sort_asc()
 
     def get_content_paginated(self, page_size: int) -> List[List[TemporalEntity]]:
-        old_page_size = self.page_size
-        self.page_size = page_size
-        self.current_page = 1
-        
-        pages : List[List[TemporalEntity]] = []
-        while self.current_page_exists():
-            pages.append(self.get_and_turn_page())
-
-        self.page_size = old_page_size
-        return pages
+        index = self.year_index()
+        return [index.page(page, page_size) for page in range((len(index) + page_size - 1) // page_size)]
 
     @property
     def content(self) -> List[TemporalEntity]:
         if self._batch_mode == True and self._finalized == False:
             log_error("Batch mode content is locked until output is finalized")
             return []
-        return self._content
+        return self.materialized_content()
 
     @content.setter
     def content(self, content: List[TemporalEntity]):
-        self._content = content
+        self._content = content if isinstance(content, TrackedEntityList) else TrackedEntityList(content)
 
     def append_content(self, new_output) -> None:
         '''
@@ -146,25 +493,50 @@ class ParserOutput(object):
             return
 
         if new_output == None or len(new_output.content) == 0:
-            log_decorated(str(new_output))
+            log_decorated("%s", new_output)
             #log_info("Null output appended in batch mode, exiting")
             return
 
         new_content = new_output.content
-        log_decorated("Appending content with length "+str(len(new_content)))
+        log_decorated("Appending content with length %d", len(new_content))
         self._last_batch_max_order = new_content[-1].order
-        self._content.extend(new_content)
+        self.materialized_content().extend(new_content)
+
+    @classmethod
+    def merge(cls, outputs: List["ParserOutput"], contains_no_year_temporals: bool = True, deduplicate: bool = False) -> "ParserOutput":
+        '''
+            One output from several finalized ones (documents of a corpus). Their content is already sorted, put one after
+            the other timsort only has to merge those runs (O(n log k) comparisons for k outputs). Stable, within a year
+            entities keep the order of the outputs and then their own order
+        '''
+        merged = cls([], contains_no_year_temporals=contains_no_year_temporals, batch_mode=True)
+        content = merged.materialized_content()
+        for output in outputs:
+            # no year entities have no year key and sort first, in the order they were found
+            content.extend(getattr(output, "content_no_years", []))
+            content.extend(output.year_index().entities)
+
+        merged.finalize(deduplicate)
+        return merged
 
-    def finalize(self) -> None:
+    def finalize(self, deduplicate: bool = False) -> None:
+        '''
+            deduplicate drops every entity whose event (ignoring case and whitespace) was already seen, the first one
+            in content order is kept
+        '''
         self._finalized = True
 
+        if deduplicate:
+            self.content = list(unique_events(self.content))
+
         if self._no_year_temporals:
             self.prepare_non_year_temporals()
 
         self.sort_asc()
-        
 
     def __len__(self):
+        if self._content is None:
+            return len(self._table) # type: ignore
         return len(self._content)
 
     def __str__(self):
@@ -176,45 +548,68 @@ class ParserOutput(object):
         return result
 
     def year_entity_map(self) -> Dict[int, List[TemporalEntity]]:
-        if self._year_entity_map is not None:
-            return self._year_entity_map
+        if self._batch_mode == True and self._finalized == False:
+            return {}
 
-        year_entity_map = {}
-        for temporal_entity in self.content:
-            if temporal_entity.year not in year_entity_map:
-                year_entity_map[temporal_entity.year] = []
+        def build():
+            # the index is already grouped by year, one pass in year order
+            year_entity_map = {}
+            for temporal_entity in self.year_index().entities:
+                if temporal_entity.year_value is not None:
+                    year_entity_map.setdefault(temporal_entity.year, []).append(temporal_entity)
+            return year_entity_map
 
-            year_entity_map[temporal_entity.year].append(temporal_entity)
-        
-        self._year_entity_map = year_entity_map
-        return self._year_entity_map
+        return self.cached("year_entity_map", build)
 
     def years(self) -> List[int]:
-        if self._years is not None:
-            return self._years
-
-        year_map = self.year_entity_map()
-        years: List[int] = list(year_map.keys())
-        years = sorted(years)
-        self._years = years
-
-        return self._years
+        return self.cached("years", lambda: sorted(self.year_entity_map().keys()))
 
     def year_number_map(self) -> Dict[int,int]:
-        if self._year_number_map is not None:
-            return self._year_number_map
-
-        year_number_map = {}
-        for temporal_entity in self.content:
-            if temporal_entity.year not in year_number_map:
-                year_number_map[temporal_entity.year] = 1
-
-            year_number_map[temporal_entity.year] += 1
-        
-        self._year_number_map = year_number_map
-        return self._year_number_map
+        if self._batch_mode == True and self._finalized == False:
+            return {}
+
+        def build():
+            if self.has_current_table():
+                return self.entity_table().count_by_year_text()
+            # in year order like the table's counts, one entry per run of the index
+            index = self.year_index()
+            year_number_map: Dict[str, int] = {}
+            for start, end in index.year_runs():
+                year = index.entities[start].year
+                if index.entities[end - 1].year == year:
+                    year_number_map[year] = year_number_map.get(year, 0) + end - start
+                    continue
+                # the same year written two ways (a plugin parser that doesn't zero pad), counted by its text
+                for temporal_entity in index.entities[start:end]:
+                    year_number_map[temporal_entity.year] = year_number_map.get(temporal_entity.year, 0) + 1
+            return year_number_map
+
+        return self.cached("year_number_map", build)
+
+    def year_histogram(self, group_size: int):
+        '''
+            (first year of every group, counts) for groups of group_size years, empty groups are left out
+        '''
+        if self.has_current_table():
+            return self.entity_table().year_histogram(group_size)
+        if group_size <= 0:
+            raise ValueError("Group size must be a positive number")
+
+        index = self.year_index()
+        groups: Dict[int, int] = {}
+        for start, end in index.year_runs():
+            group = (index.keys[start] // group_size) * group_size
+            groups[group] = groups.get(group, 0) + end - start
+        return list(groups.keys()), list(groups.values())
 
     def prepare_non_year_temporals(self) -> None:
+        if self._content is None:
+            # table backed, the rest stays columnar and only the no year entities (usually a few) get created
+            table = self._table
+            self.content_no_years = table.with_type(TemporalEntityType.NO_YEAR).to_entities() # type: ignore
+            self._table = table.with_type(TemporalEntityType.WITH_YEAR) # type: ignore
+            return
+
         data_yes_years = [i for i in self.content if i.entity_type == TemporalEntityType.WITH_YEAR]
         data_no_years = [i for i in self.content if i.entity_type == TemporalEntityType.NO_YEAR]
 
@@ -223,8 +618,7 @@ class ParserOutput(object):
 
     # list splicing is inclusive beginning non-inclusive end
     def get_current_page(self) -> List[TemporalEntity]:
-        index = self.current_page * self.page_size
-        return self._content[index:index+self.page_size]
+        return self.year_index().page(self.current_page, self.page_size)
 
     def get_and_turn_page(self) -> List[TemporalEntity]:
         current_page = self.get_current_page()
@@ -248,13 +642,21 @@ class ParserOutput(object):
         return True
 
     def sort_asc(self):
-        self._content = sorted(self._content, key=lambda x: int(x.year))
+        if self._content is None:
+            self._table = self._table.sort_by_year() # type: ignore
+            return
+
+        # the index is sorted already (and only built if it isn't current), content takes over its order
+        index = self.year_index()
+        self._content = TrackedEntityList(index.entities)
+        self._year_index_content = self._content
+        self.mark_indexed(index, self._content)
 
 
     # ABORT MISSION - even with batching, I can't get accurate and standardized times for model predictions
     # leaving this here in case I get an idea but turning off the timestamp control
     def get_progress_stats_from_timestamps(self, step: int):
-        sorted_by_order = sorted(self._content, key=lambda x: int(x.order))
+        sorted_by_order = sorted(self.materialized_content(), key=lambda x: int(x.order))
 
         total_sentence_progress = []
         temporals_found_progress = []
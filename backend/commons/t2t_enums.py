@@ -5,10 +5,27 @@ from enum import Enum
 DEFAULT_RENDERER_MPL = "MPL"
 DEFAULT_RENDERER_PLOTLY = "PLOTLY"
 
+# parser names live here so the registry can use them without importing the parser modules (and their libraries)
+SPACY_PARSER_NAME = "spaCy"
+FLAIR_PARSER_NAME = "Flair"
+ALLENNLP_PARSER_NAME = "allen_nlp"
+CASCADE_PARSER_NAME = "cascade"
+
 class RendererPaginationSetting(Enum):
     SINGLE_IMAGE = 1,
     PAGES = 2
 
+class ParserProfile(Enum): # only parsers with optional pipeline components react to this, the output has to stay the same
+    FULL = "full"
+    FAST = "fast"
+
+class PipelineStage(Enum): # reported to whoever is following a pipeline run, background jobs for now
+    PRE_PROCESSING = "pre_processing"
+    PARSING = "parsing"
+    POST_PROCESSING = "post_processing"
+    RENDERING = "rendering"
+    GALLERY_EXTRAS = "gallery_extras"
+
 class PluginType(Enum): # these also act as plugin folder naming conventions
     PLUGIN_PARSER = "plugin_parsers"
     PLUGIN_RENDERER = "plugin_renderers"
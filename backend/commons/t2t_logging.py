@@ -1,44 +1,73 @@
 import logging
-import inspect
+import os
+import sys
 
-def log_info(message: str):
-    caller_name = get_caller_name()
+'''
+Thin layer over the root logger that prefixes every message with the file it was logged from.
 
-    message = f"{caller_name} -- {message}"
-    logging.info(message)
+The level is checked before anything else, a filtered out call costs a method call and an int compare.
+The caller comes from sys._getframe instead of inspect.stack, which built frame info for the whole stack
+and read source files on every call. Messages take optional %-style args which are only applied once
+the message is known to be emitted, prefer them over f-strings on hot paths.
+'''
 
+LOG_LEVEL_ENVIRONMENT_VARIABLE = "T2T_LOG_LEVEL"
+DEFAULT_LOG_LEVEL = "INFO"
 
-def log_decorated(message: str):
-    caller_name = get_caller_name()
+_DECORATION = "****************************************************  "
+_ERROR_DECORATION = "********ERROR*********ERROR**********ERROR*********ERROR************  "
 
-    message = f"{caller_name} -- {message}"
-    logging.info("****************************************************  " + message)
+_root_logger = logging.getLogger()
 
-def log_error(message :str ):
-    caller_name = get_caller_name()
 
-    message = f"{caller_name} -- {message}"
-    logging.info("********ERROR*********ERROR**********ERROR*********ERROR************  " + message)
+def log_info(message: str, *args):
+    if _root_logger.isEnabledFor(logging.INFO):
+        _root_logger.info(_format(message, args))
+
+
+def log_decorated(message: str, *args):
+    if _root_logger.isEnabledFor(logging.INFO):
+        _root_logger.info(_DECORATION + _format(message, args))
+
+
+def log_error(message: str, *args):
+    if _root_logger.isEnabledFor(logging.ERROR):
+        _root_logger.error(_ERROR_DECORATION + _format(message, args))
+
 
 def log_class_methods(classReference):
-    log_info(str(classReference) + " :: " + str(dir(classReference)))
+    if _root_logger.isEnabledFor(logging.INFO):
+        _root_logger.info(_format(str(classReference) + " :: " + str(dir(classReference)), ()))
+
+
+def _format(message: str, args: tuple, depth: int = 3) -> str:
+    # depth 3 skips this function and the log_* wrapper, the frame left is the one that logged
+    if args:
+        message = message % args
+    return f"{get_caller_name(depth)} -- {message}"
 
 
 def initialize_logging() -> None:
     logger = logging.getLogger('matplotlib.font_manager')
-    logger.setLevel(logging.WARNING) 
+    logger.setLevel(logging.WARNING)
+
+    # DEBUG, INFO, WARNING, ERROR, anything unrecognized falls back to INFO
+    level = logging.getLevelName(os.environ.get(LOG_LEVEL_ENVIRONMENT_VARIABLE, DEFAULT_LOG_LEVEL).upper())
+    if not isinstance(level, int):
+        level = logging.INFO
 
     logging.basicConfig(
-        level=logging.DEBUG,
+        level=level,
         format='%(asctime)s %(levelname)s %(message)s',
         datefmt='%H:%M:%S',
     )
 
 
-def get_caller_name() -> str: # how's python inspect (reflection?) performance?
-    frame = inspect.stack()[2]
-    module = inspect.getmodule(frame[0])
-    filename = module.__file__ # type:ignore
+def get_caller_name(depth: int = 2) -> str:
+    try:
+        filename = sys._getframe(depth).f_code.co_filename
+    except ValueError:
+        # called from closer to the top of the stack than expected
+        return "<unknown>"
 
-    fname = filename.split("\\")[-1] # type:ignore
-    return fname
\ No newline at end of file
+    return os.path.basename(filename)
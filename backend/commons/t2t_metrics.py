@@ -0,0 +1,191 @@
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+'''
+Stage timings and the process wide metrics behind /metrics.
+
+A StageTimings is created per pipeline run, every pre-processor, the parser, every post-processor,
+renderer and gallery extra records how long it took in it. The timings end up on the output and the
+result page (and from there in the Server-Timing header), every recorded timing is also observed into
+the process wide registry, which keeps latency histograms and counters labelled by stage and name.
+
+The registry only keeps totals, it's a handful of dicts behind a lock and renders the Prometheus
+text format by hand, no client library needed. Totals reset when the process restarts.
+'''
+
+# seconds, parsers take anywhere from a few ms on a sentence to minutes on a book
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+STAGE_DURATION_METRIC = "t2t_stage_duration_seconds"
+STAGE_ERRORS_METRIC = "t2t_stage_errors_total"
+PIPELINE_RUNS_METRIC = "t2t_pipeline_runs_total"
+
+_SERVER_TIMING_TOKEN = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+class StageTiming(object):
+    def __init__(self, stage: str, name: str, seconds: float):
+        self.stage = stage
+        self.name = name
+        self.seconds = seconds
+
+    def to_dict(self) -> dict:
+        return {"stage": self.stage, "name": self.name, "seconds": self.seconds}
+
+
+class StageTimings(object):
+    def __init__(self, registry: Optional["MetricsRegistry"] = None):
+        self.registry = registry if registry is not None else get_metrics_registry()
+        self.timings: List[StageTiming] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, stage: str, name: str) -> Iterator[None]:
+        start_time = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.registry.increment(STAGE_ERRORS_METRIC, {"stage": stage, "name": name})
+            raise
+        finally:
+            self.record(stage, name, time.perf_counter() - start_time)
+
+    def record(self, stage: str, name: str, seconds: float) -> None:
+        with self._lock:
+            self.timings.append(StageTiming(stage, name, seconds))
+        self.registry.observe(STAGE_DURATION_METRIC, {"stage": stage, "name": name}, seconds)
+
+    def __getstate__(self):
+        # outputs get pickled into the cache and across worker processes, locks and the registry don't travel
+        return {"timings": self.timings}
+
+    def __setstate__(self, state):
+        self.registry = get_metrics_registry()
+        self.timings = state["timings"]
+        self._lock = threading.Lock()
+
+    def total(self, stage: Optional[str] = None) -> float:
+        return sum(t.seconds for t in self.timings if stage is None or t.stage == stage)
+
+    def to_list(self) -> List[dict]:
+        return [t.to_dict() for t in self.timings]
+
+    def server_timing_header(self) -> str:
+        '''
+            One entry per stage with the summed time, plus one per named step inside it,
+            durations are in milliseconds as the header expects
+        '''
+        stage_totals: Dict[str, float] = {}
+        for t in self.timings:
+            stage_totals[t.stage] = stage_totals.get(t.stage, 0.0) + t.seconds
+
+        entries = [f"{_server_timing_name(stage)};dur={seconds * 1000:.1f}" for stage, seconds in stage_totals.items()]
+        for i, t in enumerate(self.timings):
+            # names can repeat (one renderer per page), the index keeps the metric names unique
+            name = _server_timing_name(f"{t.stage}.{t.name}.{i}")
+            description = t.name.replace("\\", "").replace('"', "")
+            entries.append(f'{name};dur={t.seconds * 1000:.1f};desc="{description}"')
+
+        return ", ".join(entries)
+
+
+def _server_timing_name(name: str) -> str:
+    return _SERVER_TIMING_TOKEN.sub("_", name)
+
+
+class _Histogram(object):
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total_count = 0
+        self.total_sum = 0.0
+
+    def observe(self, value: float) -> None:
+        # counts are per bucket here and made cumulative when rendering
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.total_count += 1
+        self.total_sum += value
+
+
+class MetricsRegistry(object):
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, str], ...], _Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}
+        self._help: Dict[str, str] = {
+            STAGE_DURATION_METRIC: "Time spent in a pipeline stage, by stage and parser, plugin or renderer name",
+            STAGE_ERRORS_METRIC: "Pipeline steps that raised, by stage and parser, plugin or renderer name",
+            PIPELINE_RUNS_METRIC: "Pipeline runs by parser and whether the result came from the cache",
+        }
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, labels: Dict[str, str], value: float) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(metric, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def increment(self, metric: str, labels: Dict[str, str], amount: float = 1.0) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(metric, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+
+        with self._lock:
+            for metric, series in sorted(self._histograms.items()):
+                self.append_header(lines, metric, "histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+                    lines.append(f"{metric}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram.total_count}")
+                    lines.append(f"{metric}_sum{_format_labels(key)} {_format_value(histogram.total_sum)}")
+                    lines.append(f"{metric}_count{_format_labels(key)} {histogram.total_count}")
+
+            for metric, counters in sorted(self._counters.items()):
+                self.append_header(lines, metric, "counter")
+                for key, value in sorted(counters.items()):
+                    lines.append(f"{metric}{_format_labels(key)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def append_header(self, lines: List[str], metric: str, metric_type: str) -> None:
+        if metric in self._help:
+            lines.append(f"# HELP {metric} {self._help[metric]}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...]) -> str:
+    if not key:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in key]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    return _registry
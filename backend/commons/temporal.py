@@ -1,30 +1,66 @@
 from enum import Enum
-from typing import Any
+from typing import Any, Optional
 import datetime
 
 class TemporalEntityType(Enum):
     WITH_YEAR = 1,
     NO_YEAR = 2
 
+def parse_year_value(year) -> Optional[int]:
+    # years are stored zero padded for display ("0800"), NO_YEAR entities and failed normalizations have none
+    if isinstance(year, str):
+        # normalized years are plain digits, checking is a lot cheaper than raising for the ones without a year
+        return int(year) if year.isdigit() else None
+    try:
+        return int(year)
+    except (TypeError, ValueError):
+        return None
+
+
 class TemporalEntity(object):
     enable_creation_timestamps = False
 
-    def __init__(self):
-        self._order : int = -1
-        self._entity_type : TemporalEntityType = TemporalEntityType.WITH_YEAR
-        self._event = ""
-        self._year = ""
-        self._date = ""
-        self._context_before = ""
-        self._context_after = ""
+    # slotted, a long document turns into hundreds of thousands of these and a __dict__ per entity adds up
+    __slots__ = ("_order", "_entity_type", "_event", "_year", "_year_value", "_date", "_context_before", "_context_after",
+                 "_year_before", "_year_after", "_source", "_sentence_index", "_creation_timestamp")
+
+    def __init__(self, event: str = "", year: str = "", date: str = "", entity_type: TemporalEntityType = TemporalEntityType.WITH_YEAR,
+                 order: int = -1, context_before: str = "", context_after: str = "", source: str = "", sentence_index: int = -1):
+        self._order : int = order
+        self._entity_type : TemporalEntityType = entity_type
+        self._event = self.format_string(event) if event else ""
+        self._year = year
+        self._year_value = parse_year_value(year)
+        self._date = date
+        self._context_before = self.format_string(context_before) if context_before else ""
+        self._context_after = self.format_string(context_after) if context_after else ""
 
         # Experimental, to be used for NO_YEAR types in an attempt to gather more context
         self._year_before = ""
         self._year_after = ""
 
+        self._source = source # document the entity came from, only set when several documents end up in one timeline
+        # index of the sentence in the document, -1 when it isn't known. Single pass spaCy and Flair count their own sentences,
+        # everything that splits the input itself (AllenNLP, batch mode, the prefilter, the sentence cache) counts ParserInput.iter_sentences
+        self._sentence_index = sentence_index
+
         if self.enable_creation_timestamps:
             self._creation_timestamp = datetime.datetime.now() # this probably wont be 100% accurate but i'll avoid adding extra logic to parsers
 
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__ if hasattr(self, k)}
+
+    def __setstate__(self, state):
+        # also takes the __dict__ of entities pickled before the class had slots, cached outputs can be that old
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+
+        self.__init__()
+        for k, v in state.items():
+            if k in self.__slots__:
+                setattr(self, k, v)
+        self._year_value = parse_year_value(self._year)
+
     @property
     def event(self):
         return self._event
@@ -40,6 +76,12 @@ class TemporalEntity(object):
     @year.setter
     def year(self, y: str):
         self._year = y
+        self._year_value = parse_year_value(y)
+
+    @property
+    def year_value(self) -> Optional[int]:
+        # the year as a number, None when there isn't one, for sorting and plotting without parsing the string again
+        return self._year_value
 
     @property
     def entity_type(self):
@@ -82,11 +124,43 @@ class TemporalEntity(object):
         self._context_after = self.format_string(ca)
         
 
+    @property
+    def source(self):
+        return self._source
+
+    @source.setter
+    def source(self, source: str):
+        self._source = source
+
+    @property
+    def sentence_index(self) -> int:
+        return self._sentence_index
+
+    @sentence_index.setter
+    def sentence_index(self, sentence_index: int):
+        self._sentence_index = sentence_index
+
     def format_string(self, s:str) -> str:
         result = s.strip()
-        result = result.replace("\n", " ")
+        if "\n" in result:
+            result = result.replace("\n", " ")
         return result
 
+    def to_dict(self) -> dict:
+        # plain values only, used wherever entities leave the process as json
+        return {
+            "order": self._order,
+            "type": self._entity_type.name,
+            "date": self._date,
+            "year": self._year,
+            "event": self._event,
+            "context_before": self._context_before,
+            "context_after": self._context_after,
+            "year_before": self._year_before,
+            "source": self._source,
+            "sentence_index": self._sentence_index,
+        }
+
     def __str__(self):
         if self.entity_type == TemporalEntityType.WITH_YEAR:
             return str(self._date) + " | " + str(self._year) + " :: " + str(self._event)
@@ -0,0 +1,95 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+'''
+Turns the date text found by the parsers into the year used for the timeline.
+
+The NER parsers (spaCy, Flair, the multiple dates post processor) and the SRL parser (AllenNLP) used to carry
+their own copies of this, the two flavours are kept because they really do behave differently:
+    - normalize: last 3-4 digit number wins, zero padded to 4 characters, "1st century" maps to year 1
+    - normalize_srl_argument: first 3+ digit number wins, not padded, "1st century" maps to year 0
+
+The same date strings show up over and over ("1945", "the 19th century") so results are memoized.
+'''
+
+_CACHE_SIZE = 65536
+
+_CENTURY_NUMBER_PATTERN = re.compile(r'([0-9]{1,2})')
+# manually editted to remove false positives because of weaker models than the heavier/slower ones
+_NER_YEAR_PATTERN = re.compile(r'(?<![\[])([0-9]{3,4})(?![\]])')
+# fix this, detects days of month as years
+_SRL_YEAR_PATTERN = re.compile(r'(?<![\[])([0-9]{3,})(?![\]])')
+_SRL_TEMPORAL_ARGUMENT_PATTERN = re.compile(r'TMP(.*?)]')
+
+
+def _is_all_zeroes(year: str) -> bool:
+    return all(v == '0' for v in year)
+
+
+def pad_year(year: str) -> str:
+    while len(year) < 4:
+        year = "0" + year
+    return year
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def normalize(date_text: str) -> Optional[str]:
+    result_year = None
+
+    if "century" in date_text:
+        century = _CENTURY_NUMBER_PATTERN.search(date_text)
+        if century is not None:
+            year = (int(century.group(1)) - 1) * 100
+            if year == 0:
+                year = 1
+            result_year = str(year)
+
+    for year in _NER_YEAR_PATTERN.findall(date_text):
+        if not _is_all_zeroes(year):
+            result_year = year
+
+    if result_year is None:
+        return None
+
+    return pad_year(result_year)
+
+
+def normalize_batch(date_texts: List[str]) -> List[Optional[str]]:
+    # duplicates are resolved once, the order of the input is kept
+    unique: Dict[str, Optional[str]] = {}
+    for date_text in date_texts:
+        if date_text not in unique:
+            unique[date_text] = normalize(date_text)
+
+    return [unique[date_text] for date_text in date_texts]
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def extract_srl_temporal_argument(description: str) -> Optional[str]:
+    # "[ARGM-TMP: in 1999]" -> " in 1999"
+    result = _SRL_TEMPORAL_ARGUMENT_PATTERN.search(description)
+    if result is None:
+        return None
+
+    return result.group(1).replace("]", "").replace(":", "")
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def normalize_srl_argument(argument: str) -> Optional[str]:
+    if "century" in argument:
+        century = _CENTURY_NUMBER_PATTERN.search(argument)
+        if century is not None:
+            return str((int(century.group(1)) - 1) * 100)
+
+    for year in _SRL_YEAR_PATTERN.findall(argument):
+        if not _is_all_zeroes(year):
+            return year
+
+    return None
+
+
+def clear_caches() -> None:
+    normalize.cache_clear()
+    extract_srl_temporal_argument.cache_clear()
+    normalize_srl_argument.cache_clear()
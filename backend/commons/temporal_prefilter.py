@@ -0,0 +1,177 @@
+import bisect
+import re
+from typing import List, Optional, Tuple
+
+from .parser_commons import ParserInput, get_tokenizer
+from .temporal import TemporalEntity
+from .t2t_logging import log_info
+
+'''
+Cheap first pass over the input that drops sentences which can't contain a temporal expression
+before they reach a (much slower) model.
+
+A sentence is kept if it has a digit or one of the cue words below, and so are its neighbours within
+the context radius so context_before/context_after come out the same as on the unfiltered text.
+This trades a bit of recall on the vaguer NO_YEAR phrases for speed, which is why it's off by default.
+
+The parser only sees the kept sentences, runs of them glued together, so whatever it says about sentences
+is about the filtered text. PrefilterResult.restore puts the entities back into the original document,
+sentence indexes point at the original sentences. The parser's context is kept, only a side that reaches
+past the edge of a run (where the filtered text has a sentence of some other run next to it) is rebuilt
+from the original neighbours, the way the parsers build it.
+'''
+
+_MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december",
+           "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec"]
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_ERAS = ["bc", "bce", "ad", "ce", "era", "eras", "age", "ages", "epoch", "dynasty", "reign", "period"]
+_UNITS = ["century", "centuries", "millennium", "millennia", "decade", "decades", "year", "years", "month", "months",
+          "week", "weeks", "day", "days", "season", "seasons"]
+_RELATIVE = ["today", "tonight", "yesterday", "tomorrow", "ago", "now", "recently", "later", "earlier", "formerly",
+             "annual", "annually", "spring", "summer", "autumn", "fall", "winter", "morning", "evening", "night",
+             "medieval", "ancient", "modern", "contemporary", "prehistoric"]
+
+_CUE_WORDS = _MONTHS + _WEEKDAYS + _ERAS + _UNITS + _RELATIVE
+
+# a single alternation compiles into one automaton, much cheaper than looping over the words per sentence
+TEMPORAL_CUE_PATTERN = re.compile(r"\d|\b(?:" + "|".join(sorted(_CUE_WORDS, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+
+_GAP_SEPARATOR = "\n\n"
+
+
+class PrefilterResult(object):
+    def __init__(self, parser_input: ParserInput, kept_indices: List[int], kept_starts: List[int], content: str, spans: List[Tuple[int, int]]):
+        self.parser_input = parser_input
+        self.kept_indices = kept_indices # filtered sentence index -> original sentence index
+        self.kept_starts = kept_starts # filtered sentence index -> where it starts in the filtered text
+        self.total_sentences = len(spans)
+        self._kept = set(kept_indices)
+
+        # the original text and its sentences, context gets rebuilt from them
+        self.content = content
+        self.spans = spans
+
+        # the filtered text without whitespace, events are looked up in it, see locate
+        self._compact: Optional[str] = None
+        self._compact_positions: List[int] = []
+        self._search_from = 0
+
+    @property
+    def skipped_sentences(self) -> int:
+        return self.total_sentences - len(self.kept_indices)
+
+    def original_sentence_index(self, filtered_index: int) -> int:
+        return self.kept_indices[filtered_index]
+
+    def original_sentence(self, index: int) -> str:
+        start, end = self.spans[index]
+        return self.content[start:end]
+
+    def restore(self, entities: List[TemporalEntity], context_radius: int) -> None:
+        '''
+            Entities have to come in document order, from one call or several (stream chunks) in a row
+        '''
+        for entity in entities:
+            position = self.locate(entity.event)
+            if position == -1:
+                entity.sentence_index = -1 # the parser's index is in filtered space, better none than a wrong one
+                continue
+
+            index = self.original_sentence_index(bisect.bisect_right(self.kept_starts, position) - 1)
+            entity.sentence_index = index
+
+            if context_radius == 0:
+                continue
+
+            # like the parsers, nearest sentence first and every sentence followed by a space
+            before = range(index - 1, max(0, index - context_radius) - 1, -1)
+            after = range(index + 1, min(self.total_sentences, index + 1 + context_radius))
+            if not all(i in self._kept for i in before):
+                entity.context_before = "".join(self.original_sentence(i) + " " for i in before)
+            if not all(i in self._kept for i in after):
+                entity.context_after = "".join(self.original_sentence(i) + " " for i in after)
+
+    def locate(self, event: str) -> int:
+        '''
+            Where the event starts in the filtered text. Compared without whitespace, events are copied out of the filtered
+            text but parsers turn newlines into spaces and AllenNLP's are rejoined tokens, an exact find would miss those
+            and scan to the end for each of them. Searches on from the last entity so a repeated sentence maps to the
+            right occurrence
+        '''
+        key = "".join(event.split())
+        if not key:
+            return -1
+
+        if self._compact is None:
+            # built once, along with where each of its characters is in the filtered text
+            filtered = self.parser_input.get_content()
+            self._compact = "".join(filtered.split())
+            self._compact_positions = [i for i, c in enumerate(filtered) if not c.isspace()]
+
+        found = self._compact.find(key, self._search_from)
+        if found == -1 and self._search_from > 0:
+            # out of order, a chunk started over or the parser reordered its sentences
+            found = self._compact.find(key)
+        if found == -1:
+            return -1
+
+        self._search_from = found
+        return self._compact_positions[found]
+
+
+class TemporalPrefilter(object):
+    def __init__(self, context_radius: int = 0):
+        self.context_radius = context_radius
+
+    def is_candidate(self, sentence: str) -> bool:
+        return TEMPORAL_CUE_PATTERN.search(sentence) is not None
+
+    def apply(self, parser_input: ParserInput) -> PrefilterResult:
+        content: str = parser_input.get_content()
+        spans: List[Tuple[int, int]] = list(get_tokenizer().span_tokenize(content)) # type: ignore
+
+        candidates = [i for i, (start, end) in enumerate(spans) if self.is_candidate(content[start:end])]
+        kept_indices = self.expand_with_neighbours(candidates, len(spans))
+
+        filtered_content, kept_starts = self.join_kept(content, spans, kept_indices)
+        result = PrefilterResult(ParserInput(filtered_content), kept_indices, kept_starts, content, spans)
+
+        log_info("Temporal prefilter kept %d/%d sentences (%d candidates), skipped %d", len(kept_indices), len(spans), len(candidates), result.skipped_sentences)
+        return result
+
+    def expand_with_neighbours(self, candidates: List[int], sentence_count: int) -> List[int]:
+        kept = set()
+        for index in candidates:
+            start = max(0, index - self.context_radius)
+            end = min(sentence_count, index + self.context_radius + 1)
+            kept.update(range(start, end))
+
+        return sorted(kept)
+
+    def join_kept(self, content: str, spans: List[Tuple[int, int]], kept_indices: List[int]) -> Tuple[str, List[int]]:
+        '''
+            The filtered text and where every kept sentence starts in it.
+            Contiguous runs are copied as-is from the original text so the parsers see the same whitespace,
+            runs are separated by a paragraph break so no sentence gets glued to an unrelated one
+        '''
+        runs: List[str] = []
+        kept_starts: List[int] = []
+        offset = 0 # where the current run starts in the filtered text
+        run_start: Optional[int] = None
+        previous = -1
+
+        for index in kept_indices:
+            if run_start is not None and index != previous + 1:
+                runs.append(content[spans[run_start][0]:spans[previous][1]])
+                offset += len(runs[-1]) + len(_GAP_SEPARATOR)
+                run_start = None
+
+            if run_start is None:
+                run_start = index
+            kept_starts.append(offset + spans[index][0] - spans[run_start][0])
+            previous = index
+
+        if run_start is not None:
+            runs.append(content[spans[run_start][0]:spans[previous][1]])
+
+        return _GAP_SEPARATOR.join(runs), kept_starts
@@ -1,15 +1,11 @@
 import logging
 import os
+import sys
 
 def word_list_to_string(word_list: list): 
     delimiter = " "
-    result = "" 
-
-    for word in word_list: 
-        result += word
-        result += delimiter
-        
-    return result 
+    # a single join, appending in a loop copied the whole string for every word
+    return "".join(word + delimiter for word in word_list) 
 
 
 # innter args/kwards handle "self" being passed from class methods
@@ -53,4 +49,21 @@ def log_decorator(callback):
         logging.getLogger().info(callback.__name__ + " " + "starting")
         callback(*args, **kwargs)
         logging.getLogger().info(callback.__name__ + " " + "finished")
-    return decorated
\ No newline at end of file
+    return decorated
+
+
+def get_resident_memory_bytes() -> int:
+    # current RSS on linux, other platforms only expose the peak without extra dependencies
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource # not available on windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return 0
+
@@ -0,0 +1,162 @@
+import bisect
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .temporal import TemporalEntity
+
+'''
+Sorted year index for the content of a ParserOutput.
+
+Content is kept in a TrackedEntityList, a plain list that counts its mutations, so anything cached from it
+(the index, the year maps, the entity table) can tell whether it's still current. Appends are the common
+mutation (batch chunks, post-processors moving entities onto the timeline), the index takes those in with
+bisect.insort instead of being rebuilt, any other mutation throws it away.
+
+Entities edited in place (a post-processor changing a year) aren't mutations of the list, whoever does
+that has to append/reassign them or call ParserOutput.invalidate_caches().
+'''
+
+
+def year_sort_key(entity: TemporalEntity) -> int:
+    # entities without a year go first instead of breaking the sort. Called for every entity whenever content gets
+    # indexed, reading the slot instead of the year_value property takes a good part off that
+    year_value = entity._year_value
+    return year_value if year_value is not None else -1
+
+
+def event_hash(entity: TemporalEntity) -> int:
+    # case and whitespace don't count, AllenNLP joins its tokens with spaces where the others keep the original text
+    return hash(" ".join(entity.event.lower().split()))
+
+
+def unique_events(entities: Iterable[TemporalEntity]) -> Iterator[TemporalEntity]:
+    # first entity of every event, see event_hash
+    seen = set()
+    for entity in entities:
+        h = event_hash(entity)
+        if h not in seen:
+            seen.add(h)
+            yield entity
+
+
+class TrackedEntityList(list):
+    # class level too, unpickling appends the items before the instance attributes are restored
+    version = 0
+    rewrite_version = 0
+
+    def __init__(self, iterable: Iterable[TemporalEntity] = ()):
+        super().__init__(iterable)
+        self.version = 0 # every mutation
+        self.rewrite_version = 0 # every mutation that isn't an append at the end
+
+    def _appended(self):
+        self.version += 1
+
+    def _rewritten(self):
+        self.version += 1
+        self.rewrite_version += 1
+
+    def append(self, entity):
+        super().append(entity)
+        self._appended()
+
+    def extend(self, entities):
+        super().extend(entities)
+        self._appended()
+
+    def __iadd__(self, entities):
+        result = super().__iadd__(entities)
+        self._appended()
+        return result
+
+    def insert(self, i, entity):
+        super().insert(i, entity)
+        self._rewritten()
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        self._rewritten()
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self._rewritten()
+
+    def remove(self, entity):
+        super().remove(entity)
+        self._rewritten()
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self._rewritten()
+        return result
+
+    def clear(self):
+        super().clear()
+        self._rewritten()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._rewritten()
+
+    def reverse(self):
+        super().reverse()
+        self._rewritten()
+
+    def __imul__(self, n):
+        result = super().__imul__(n)
+        self._rewritten()
+        return result
+
+
+class YearIndex(object):
+    def __init__(self, entities: Iterable[TemporalEntity] = ()):
+        # stable, entities of the same year keep their content order
+        self.entities: List[TemporalEntity] = sorted(entities, key=year_sort_key)
+        self.keys: List[int] = [year_sort_key(e) for e in self.entities]
+
+        # which content list state this index reflects, see ParserOutput.year_index
+        self.content_version = -1
+        self.content_rewrite_version = -1
+        self.content_length = 0
+
+    def __len__(self):
+        return len(self.entities)
+
+    def add(self, entity: TemporalEntity) -> None:
+        # after every entity of the same year, same place a stable sort of the content would put it
+        key = year_sort_key(entity)
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.entities.insert(i, entity)
+
+    def add_all(self, entities: Iterable[TemporalEntity]) -> None:
+        for entity in entities:
+            self.add(entity)
+
+    def entities_between(self, start_year: int, end_year: int) -> List[TemporalEntity]:
+        # inclusive on both ends
+        return self.entities[bisect.bisect_left(self.keys, start_year):bisect.bisect_right(self.keys, end_year)]
+
+    def count_between(self, start_year: int, end_year: int) -> int:
+        return max(0, bisect.bisect_right(self.keys, end_year) - bisect.bisect_left(self.keys, start_year))
+
+    def year_runs(self) -> Iterator[Tuple[int, int]]:
+        '''
+            (start, end) of every run of entities with the same year, entities without one are left out.
+            A bisect per distinct year, there are far fewer of those than entities
+        '''
+        keys = self.keys
+        start = bisect.bisect_right(keys, -1)
+        while start < len(keys):
+            end = bisect.bisect_right(keys, keys[start], start)
+            yield start, end
+            start = end
+
+    def page(self, page: int, page_size: int) -> List[TemporalEntity]:
+        start = page * page_size
+        return self.entities[start:start + page_size]
+
+    def first_year(self) -> Optional[int]:
+        return self.entities[0].year_value if self.entities else None
+
+    def last_year(self) -> Optional[int]:
+        return self.entities[-1].year_value if self.entities else None
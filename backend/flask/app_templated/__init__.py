@@ -5,9 +5,13 @@ from backend.services.pipeline_manager_service import PipelineManagerService
 from .config import Config
 from ...services.parserservice import ParserService
 from ...services.renderservice import RendererService
+from ...services.t2t_persistence import PersistenceService
+from ...services.model_preloader import ModelPreloader
 from ...commons.t2t_logging import initialize_logging
 from .forms.forms import LoginForm, TextOrFileForm
 from ..services.result_builder import ResultBuilder
+from ..services.job_service import JobService
+from ..services.stream_service import StreamService
 
 import matplotlib.pyplot as plt
 
@@ -27,9 +31,31 @@ do barebones in-process worker queue to make it REST viable
 still sucks but not enough ram to run multiple instances 
 '''
 
-pipeline_manager: PipelineManagerService = PipelineManagerService()
+persistence_service = PersistenceService(Config.PERSISTENCE_PATH or None)
+pipeline_manager: PipelineManagerService = PipelineManagerService(persistence_service=persistence_service, batch_chunk_length=Config.BATCH_CHUNK_LENGTH)
 parser_service = pipeline_manager.parser_service
 
+if Config.PARSER_WORKERS > 0:
+    # has to happen before any request or preloading threads exist, the workers are forked from this process.
+    # Before the sentence cache too, a forked sqlite connection isn't safe to use from either side
+    worker_models = [name.strip() for name in Config.PARSER_WORKER_MODELS.split(",") if name.strip()]
+    parser_service.start_worker_pool(Config.PARSER_WORKERS, worker_models)
+
+if Config.SENTENCE_CACHE_PATH:
+    parser_service.enable_sentence_cache(Config.SENTENCE_CACHE_PATH, Config.SENTENCE_CACHE_MAX_ENTRIES)
+
+job_service = JobService(pipeline_manager, Config.JOB_WORKERS, Config.JOB_MAX_PENDING, Config.JOB_RESULT_TTL_SECONDS)
+stream_service = StreamService()
+
+model_preloader = ModelPreloader(parser_service)
+
+if Config.PRELOAD_PARSERS:
+    if Config.PRELOAD_PARSERS == "all":
+        preload_names = list(parser_service._default_paser_loading.keys())
+    else:
+        preload_names = [name.strip() for name in Config.PRELOAD_PARSERS.split(",") if name.strip()]
+    model_preloader.start(preload_names)
+
 app = Flask(__name__)
 app.config.from_object(Config)
 
@@ -1,4 +1,33 @@
 import os
 
+from ...services.t2t_persistence import DEFAULT_PERSISTENCE_PATH
+from ..services.job_service import DEFAULT_JOB_MAX_PENDING, DEFAULT_JOB_TTL_SECONDS, DEFAULT_JOB_WORKERS
+from ...services.pipeline_manager_service import DEFAULT_STREAM_CHUNK_LENGTH
+
 class Config:
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess' # anti CSRF
\ No newline at end of file
+    SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess' # anti CSRF
+
+    # sentence level parse cache, disabled unless a path is set
+    SENTENCE_CACHE_PATH = os.environ.get('T2T_SENTENCE_CACHE_PATH')
+    SENTENCE_CACHE_MAX_ENTRIES = int(os.environ.get('T2T_SENTENCE_CACHE_MAX_ENTRIES', 500000))
+
+    # document level result cache, set to an empty string to keep results in memory only
+    PERSISTENCE_PATH = os.environ.get('T2T_PERSISTENCE_PATH', DEFAULT_PERSISTENCE_PATH)
+
+    # comma separated parser names to load in the background on startup, "all" for every built-in one
+    PRELOAD_PARSERS = os.environ.get('T2T_PRELOAD_PARSERS', '')
+
+    # forked parser worker processes sharing the models loaded at startup, 0 parses on the request threads
+    PARSER_WORKERS = int(os.environ.get('T2T_PARSER_WORKERS', 0))
+    PARSER_WORKER_MODELS = os.environ.get('T2T_PARSER_WORKER_MODELS', 'spaCy')
+
+    # background parse jobs, threads running them, queued jobs before refusing new ones, seconds results are kept
+    JOB_WORKERS = int(os.environ.get('T2T_JOB_WORKERS', DEFAULT_JOB_WORKERS))
+    JOB_MAX_PENDING = int(os.environ.get('T2T_JOB_MAX_PENDING', DEFAULT_JOB_MAX_PENDING))
+    JOB_RESULT_TTL_SECONDS = float(os.environ.get('T2T_JOB_RESULT_TTL_SECONDS', DEFAULT_JOB_TTL_SECONDS))
+
+    # characters per chunk when streaming partial timelines, smaller chunks show up sooner but parse slower overall
+    STREAM_CHUNK_LENGTH = int(os.environ.get('T2T_STREAM_CHUNK_LENGTH', DEFAULT_STREAM_CHUNK_LENGTH))
+
+    # parse documents in chunks of about this many characters with bounded memory, 0 parses them whole
+    BATCH_CHUNK_LENGTH = int(os.environ.get('T2T_BATCH_CHUNK_LENGTH', 0))
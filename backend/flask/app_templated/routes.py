@@ -5,13 +5,20 @@ from backend.renderers.base_renderer import RendererOutputType
 from backend.services import parser_comparison_service, parserservice
 from backend.services.parser_comparison_service import ParserComparisonService
 from backend.services.pipeline_manager_service import get_plugin_information_model
+from backend.flask.services.job_service import JobQueueFullError, JobState
+from backend.flask.services.stream_service import format_sse, output_to_dict
+from backend.services.pipeline_manager_service import STREAM_EVENT_CHUNK, STREAM_EVENT_RESULT
 from . import app
-from . import parser_service, pipeline_manager
+from . import parser_service, pipeline_manager, persistence_service, model_preloader, job_service, stream_service
 from . import LoginForm, TextOrFileForm
 
-from ...commons.t2t_logging import log_class_methods, log_decorated, log_info
+from ...commons.t2t_logging import log_class_methods, log_decorated, log_error, log_info
+from ...commons.utils import get_resident_memory_bytes
+from ...commons.ingestion import iter_stream_chunks
 
-from flask import render_template, flash, redirect, url_for, request
+from ...commons.t2t_metrics import get_metrics_registry
+
+from flask import Response, abort, make_response, render_template, flash, redirect, stream_with_context, url_for, request
 
 import os
 
@@ -21,6 +28,29 @@ def get_parsers():
     return parser_service.get_parser_names()
 
 
+@app.route('/health')
+def health():
+    return {
+        "status": "ok",
+        "ready": model_preloader.is_ready(),
+        "models": model_preloader.status(),
+        "resident_memory_bytes": get_resident_memory_bytes(),
+    }
+
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text exposition format, stage latency histograms and run counters since the process started
+    return Response(get_metrics_registry().render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/ready')
+def ready():
+    # 503 until every preloaded model has loaded and answered its warm up, so the load balancer holds traffic back
+    is_ready = model_preloader.is_ready()
+    return {"ready": is_ready, "models": model_preloader.status()}, 200 if is_ready else 503
+
+
 @app.route('/get_and_parse', methods=['GET', 'POST'])
 def get_and_parse():
     text_or_file_form = TextOrFileForm()
@@ -40,8 +70,7 @@ def get_and_parse():
         if text_or_file_form.text_area.data:
             input_text = text_or_file_form.text_area.data
         else:
-            file = text_or_file_form.file_upload.data
-            input_text = file.read().decode("utf-8")
+            input_text = read_upload(text_or_file_form.file_upload.data)
 
         selected_mode = request.form.get("select_type")
 
@@ -52,26 +81,135 @@ def get_and_parse():
         elif selected_mode == "generate":
             selected_parser = text_or_file_form.parser_selection.data
             return parse(input_text, selected_parser, request)
+        elif selected_mode == "generate_async":
+            selected_parser = text_or_file_form.parser_selection.data
+            return submit_job(input_text, selected_parser, request)
+        elif selected_mode == "stream":
+            selected_parser = text_or_file_form.parser_selection.data
+            stream = stream_service.register(input_text, selected_parser, request.form.getlist("disabled_plugins"))
+            return render_template('stream.html', stream=stream)
 
 
     return render_template('input.html', form=text_or_file_form, plugin_info = get_plugin_information_model(pipeline_manager))
 
 
+def read_upload(file) -> ParserInput:
+    # read off the upload stream in sentence aligned chunks, batch mode parses them without ever joining the text
+    return ParserInput.from_chunks(iter_stream_chunks(file.stream))
+
+
 def parse(input_text, parser, request):
     disabled_plugins = request.form.getlist("disabled_plugins")
-    
-    if disabled_plugins:
-        pipeline_manager._disabled_keys = disabled_plugins
 
-    result_model : ResultPageModel = pipeline_manager.run_pipeline_result_page_model(input_text, parser)
-    return render_template('results.html', results=result_model)
+    # per run, setting them on the shared manager leaked one request's selection into the next
+    result_model : ResultPageModel = pipeline_manager.run_pipeline_result_page_model(input_text, parser, disabled_keys=disabled_plugins)
+    return with_server_timing(render_template('results.html', results=result_model), result_model)
+
+
+def with_server_timing(page, result_model: ResultPageModel):
+    # shows up under the request's timing tab in the browser dev tools
+    response = make_response(page)
+    if result_model.stage_timings is not None:
+        response.headers["Server-Timing"] = result_model.stage_timings.server_timing_header()
+    return response
+
+
+def submit_job(input_text, parser, request):
+    try:
+        job = job_service.submit(input_text, parser, request.form.getlist("disabled_plugins"))
+    except JobQueueFullError as e:
+        flash(str(e), "error")
+        return redirect(url_for("get_and_parse"))
+
+    return redirect(url_for("job_page", job_id=job.id))
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    # same fields as the parse form, for clients that don't go through the page
+    parser = request.form.get("parser_selection") or request.form.get("parser")
+    if not parser or parser not in parser_service.get_parser_names():
+        return {"error": "unknown or missing parser"}, 400
+
+    file = request.files.get("file_upload") or request.files.get("file")
+    input_text = read_upload(file) if file else request.form.get("text_area") or request.form.get("text")
+    if not input_text or (isinstance(input_text, ParserInput) and input_text.is_empty()):
+        return {"error": "provide either text or a file"}, 400
+
+    try:
+        job = job_service.submit(input_text, parser, request.form.getlist("disabled_plugins"))
+    except JobQueueFullError as e:
+        return {"error": str(e)}, 503, {"Retry-After": "30"}
+
+    return {"id": job.id, "status_url": url_for("job_status", job_id=job.id)}, 202, {"Location": url_for("job_status", job_id=job.id)}
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_service.get(job_id)
+    if job is None:
+        return {"error": "no such job, it may have expired"}, 404
+
+    status = job.to_status()
+    if job.state == JobState.DONE:
+        status["result_url"] = url_for("job_result", job_id=job.id)
+        status["temporal_count"] = len(job.result.output.content) # type: ignore
+        status["stage_timings"] = job.result.stage_timings.to_list() if job.result.stage_timings else [] # type: ignore
+    return status
+
+
+@app.route('/jobs/<job_id>/view')
+def job_page(job_id):
+    job = job_service.get(job_id)
+    if job is None:
+        abort(404)
+
+    return render_template('job.html', job=job)
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_service.get(job_id)
+    if job is None:
+        abort(404)
+    if job.state != JobState.DONE:
+        return redirect(url_for("job_page", job_id=job.id))
+
+    return with_server_timing(render_template('results.html', results=job.result), job.result)
+
+
+@app.route('/stream/<stream_id>')
+def stream_events(stream_id):
+    stream = stream_service.take(stream_id)
+    if stream is None:
+        return {"error": "no such stream, it was already consumed or has expired"}, 404
+
+    def generate():
+        try:
+            for event, payload in pipeline_manager.stream_pipeline(stream.input_text, stream.parser_name, app.config["STREAM_CHUNK_LENGTH"],
+                                                                   disabled_keys=stream.disabled_plugins):
+                if event == STREAM_EVENT_CHUNK:
+                    index, parsed_characters, total_characters, entities = payload # type: ignore
+                    yield format_sse(event, {"chunk": index + 1, "parsed_characters": parsed_characters, "total_characters": total_characters,
+                                             "entities": [e.to_dict() for e in entities]})
+                elif event == STREAM_EVENT_RESULT:
+                    yield format_sse(event, output_to_dict(payload)) # type: ignore
+        except Exception as e:
+            log_error("Stream %s failed: %s", stream_id, e)
+            yield format_sse("error", {"error": str(e)})
+
+    # X-Accel-Buffering stops nginx from holding the events back until the response ends
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 def compare_parsers(input_text, parsers):
     # For now, running this without the pipeline manager as I'm not sure whether I want
     # plugins affected parser stats
 
-    parser_comparison_service = ParserComparisonService(parser_service)
+    parser_comparison_service = ParserComparisonService(parser_service, persistence_service)
+    if isinstance(input_text, ParserInput):
+        input_text = input_text.get_content()
     parser_comparison_service.parse_and_compare(parsers, input_text)
     result_model: ResultPageModel = parser_comparison_service.build_result_page_model()
     return render_template('compare_parsers.html', results=result_model)
@@ -31,6 +31,7 @@ class ResultPageModel():
         self.renders : List[Render] = []
         self.output : ParserOutput
         self.flavor_text: str = "" # for any FE pages that require a dynamic description, just add here as embedded html
+        self.stage_timings = None # StageTimings of the whole run including renders, see t2t_metrics
 
     def get_gallery(self):
         bytes = []
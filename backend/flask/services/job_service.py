@@ -0,0 +1,142 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Dict, List, Optional, Union
+
+from backend.commons.parser_commons import ParserInput
+from backend.commons.t2t_logging import log_decorated, log_error, log_info
+from backend.flask.models.app_templated_models import ResultPageModel
+from backend.services.pipeline_manager_service import PipelineManagerService
+
+'''
+Background jobs for the parse page, the request only submits the text and gets an id back,
+the pipeline and the MPL renders run on a small bounded pool and the page polls /jobs/<id>.
+
+Finished jobs (results or errors) are kept for ttl_seconds after they finish and dropped afterwards,
+expired jobs are swept whenever a job is submitted or looked up so there is no cleanup thread.
+Everything lives in this process, restarting the app loses queued and finished jobs alike.
+'''
+
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_JOB_MAX_PENDING = 32
+DEFAULT_JOB_TTL_SECONDS = 15 * 60
+
+
+class JobState(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class Job():
+    def __init__(self, input_text: Union[str, ParserInput], parser_name: str, disabled_plugins: List[str]) -> None:
+        self.id = uuid.uuid4().hex
+        self.input_text = input_text
+        self.parser_name = parser_name
+        self.disabled_plugins = disabled_plugins
+
+        self.state = JobState.QUEUED
+        self.stage: Optional[str] = None
+        self.result: Optional[ResultPageModel] = None
+        self.error: Optional[str] = None
+
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def is_finished(self) -> bool:
+        return self.state in (JobState.DONE, JobState.FAILED)
+
+    def to_status(self) -> dict:
+        return {
+            "id": self.id,
+            "state": self.state.value,
+            "stage": self.stage,
+            "parser": self.parser_name,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobService():
+    def __init__(self, pipeline_manager: PipelineManagerService, max_workers: int = DEFAULT_JOB_WORKERS,
+                 max_pending: int = DEFAULT_JOB_MAX_PENDING, ttl_seconds: float = DEFAULT_JOB_TTL_SECONDS) -> None:
+        self._pipeline_manager = pipeline_manager
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="t2t-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, input_text: Union[str, ParserInput], parser_name: str, disabled_plugins: Optional[List[str]] = None) -> Job:
+        job = Job(input_text, parser_name, list(disabled_plugins or []))
+
+        with self._lock:
+            self.evict_expired()
+
+            # the executor queue itself is unbounded, refuse here instead of piling up hours of work
+            pending = sum(1 for j in self._jobs.values() if not j.is_finished())
+            if pending >= self.max_pending:
+                raise JobQueueFullError(f"{pending} jobs already waiting, try again later")
+
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job)
+        log_info("Job %s queued for %s", job.id, parser_name)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self.evict_expired()
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job) -> None:
+        job.state = JobState.RUNNING
+        job.started_at = time.time()
+
+        def on_stage(stage: str) -> None:
+            job.stage = stage
+
+        try:
+            job.result = self._pipeline_manager.run_pipeline_result_page_model(job.input_text, job.parser_name,
+                                                                               disabled_keys=job.disabled_plugins, on_stage=on_stage)
+            job.state = JobState.DONE
+        except Exception as e:
+            log_error("Job %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.state = JobState.FAILED
+        finally:
+            job.finished_at = time.time()
+            job.input_text = "" # not needed anymore, the result is kept around for the ttl
+
+        log_decorated("Job %s %s in %.2fs", job.id, job.state.value, job.finished_at - job.started_at)
+
+    def evict_expired(self) -> None:
+        # expects the lock to be held
+        now = time.time()
+        expired = [k for k, j in self._jobs.items() if j.is_finished() and now - j.finished_at > self.ttl_seconds] # type: ignore
+        for k in expired:
+            del self._jobs[k]
+
+        if expired:
+            log_info("Evicted %d expired jobs", len(expired))
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {s.value: 0 for s in JobState}
+            for j in self._jobs.values():
+                counts[j.state.value] += 1
+            return counts
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
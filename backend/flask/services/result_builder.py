@@ -1,12 +1,10 @@
-from tkinter import FALSE
 from typing import List
-from backend.commons.t2t_enums import RendererPaginationSetting
+from backend.commons.t2t_enums import PipelineStage, RendererPaginationSetting
 from backend.commons.t2t_logging import log_decorated
 from backend.commons.temporal import TemporalEntity
 from backend.flask.models.app_templated_models import Render, RenderPlacement, ResultPageModel
-from backend.parsers import allennlp
-from backend.renderers.extras import events_per_year_bubble_mpl
 from backend.services.parserservice import ParserService
+from backend.services.batch_parsing import BatchParser, DEFAULT_BATCH_CHUNK_LENGTH
 from backend.services.renderservice import DEFAULT_RENDERER_MPL, DEFAULT_RENDERER_PLOTLY, RendererService
 from ...parsers.base import ParserOutput
 
@@ -58,40 +56,27 @@ class ResultBuilder():
 
         render_list.extend(mpl_renders)
         result_model : ResultPageModel = self.build_from_ouput(output, render_list)
-        return self.add_extras(result_model, output)
+        with render_service.stage_timings.measure(PipelineStage.GALLERY_EXTRAS.value, "events_per_year_bubble"):
+            return self.add_extras(result_model, output)
 
 
     # BATCHING DOES NOT SUPPORT DYNAMIC RENDER PAGES YET
-    def build_with_batching(self, parser_input, selected_parser, parser_service, render_service, batch_size):
+    def build_with_batching(self, parser_input, selected_parser, parser_service, render_service, chunk_length=DEFAULT_BATCH_CHUNK_LENGTH):
         start_time = time.perf_counter()
 
-        if selected_parser == allennlp.ALLENNLP_PARSER_NAME:
-            parser_input.tokenize()
-
-        batches = parser_input.get_in_batches_by_percentage(33)
-        parser = parser_service.get_parser(selected_parser)
-
-        output: ParserOutput = ParserOutput([], contains_no_year_temporals=True, batch_mode=True)
-        last_batch_max_order = 0
-
-        for i, batch in enumerate(batches):
-            batch_log_id = str(i) + "/" + str(len(batches))
-            log_decorated("Batch " + batch_log_id + " length " + str(len(batch.get_content())))
-            new_output = parser.accept(batch, batch_mode=True, batch_offset=last_batch_max_order)
-            last_batch_max_order = output._last_batch_max_order
-            log_decorated("Batch " + batch_log_id + " new max order " + str(last_batch_max_order))
-            output.append_content(new_output)
-        
-        
-
-        output.finalize()
+        # chunks of whole sentences with overlapping context, see batch_parsing
+        batch_parser = BatchParser(parser_service, chunk_length)
+        output: ParserOutput = batch_parser.parse(parser_input, selected_parser)
         output.elapsed_time = time.perf_counter() - start_time
 
         render_list = render_service.render_with_all(output)
         result_model : ResultPageModel = self.build_from_ouput(output, render_list)
-        return self.add_extras(result_model, output)
+        with render_service.stage_timings.measure(PipelineStage.GALLERY_EXTRAS.value, "events_per_year_bubble"):
+            return self.add_extras(result_model, output)
 
     def add_extras(self, result_model: ResultPageModel, parser_output: ParserOutput) -> ResultPageModel:
+        from backend.renderers.extras import events_per_year_bubble_mpl # seaborn and matplotlib, only once a page is built
+
         render: Render = events_per_year_bubble_mpl(parser_output, group_size=100) # TODO autocalc group size
         render.placement = RenderPlacement.EXTRAS
         result_model.renders.append(render)
@@ -0,0 +1,69 @@
+import json
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Union
+
+from backend.commons.parser_commons import ParserInput, ParserOutput
+from backend.commons.t2t_logging import log_info
+
+'''
+EventSource can only do GET, so the form posts the text here first and the page opens
+/stream/<id> afterwards. A pending stream is consumed by the first connection, the ones nobody
+connects to expire after ttl_seconds
+'''
+
+DEFAULT_STREAM_TTL_SECONDS = 5 * 60
+
+
+class PendingStream():
+    def __init__(self, input_text: Union[str, ParserInput], parser_name: str, disabled_plugins: List[str]) -> None:
+        self.id = uuid.uuid4().hex
+        self.input_text = input_text
+        self.parser_name = parser_name
+        self.disabled_plugins = disabled_plugins
+        self.created_at = time.time()
+
+
+class StreamService():
+    def __init__(self, ttl_seconds: float = DEFAULT_STREAM_TTL_SECONDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._pending: Dict[str, PendingStream] = {}
+        self._lock = threading.Lock()
+
+    def register(self, input_text: Union[str, ParserInput], parser_name: str, disabled_plugins: Optional[List[str]] = None) -> PendingStream:
+        stream = PendingStream(input_text, parser_name, list(disabled_plugins or []))
+        with self._lock:
+            self.evict_expired()
+            self._pending[stream.id] = stream
+        return stream
+
+    def take(self, stream_id: str) -> Optional[PendingStream]:
+        with self._lock:
+            self.evict_expired()
+            return self._pending.pop(stream_id, None)
+
+    def evict_expired(self) -> None:
+        # expects the lock to be held
+        now = time.time()
+        expired = [k for k, s in self._pending.items() if now - s.created_at > self.ttl_seconds]
+        for k in expired:
+            del self._pending[k]
+
+        if expired:
+            log_info("Dropped %d streams nobody connected to", len(expired))
+
+
+def format_sse(event: str, data) -> str:
+    # one json line per event, so no escaping of newlines inside the payload is needed
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def output_to_dict(parser_output: ParserOutput) -> dict:
+    return {
+        "parser": parser_output.parser_name,
+        "elapsed_time": getattr(parser_output, "elapsed_time", None),
+        "content": [e.to_dict() for e in parser_output.content],
+        "content_no_years": [e.to_dict() for e in getattr(parser_output, "content_no_years", [])],
+        "stage_timings": parser_output.stage_timings.to_list() if getattr(parser_output, "stage_timings", None) else [],
+    }
@@ -1,16 +1,16 @@
 import enum
-from typing import List
+from typing import List, Optional
 
 from allennlp_models.pretrained import load_predictor
 
 from .base import BaseParser
 from typing_extensions import override
-from ..commons.parser_commons import ParserInput, ParserOutput, ParserSettings
+from ..commons.parser_commons import ParseContext, ParserInput, ParserOutput, ParserSettings
 from ..commons.utils import word_list_to_string, disable_logging, log_decorator
 from ..commons.temporal import TemporalEntity, TemporalEntityType
+from ..commons.temporal_normalization import extract_srl_temporal_argument, normalize_srl_argument
 from ..commons.t2t_logging import log_error
-
-import re
+from ..commons.t2t_enums import ALLENNLP_PARSER_NAME
 
 class PredictionWrapper(object):
     # used to populate context from original text instead of predictions
@@ -18,12 +18,11 @@ class PredictionWrapper(object):
         self.content = predicition
         self.corpus_index = corpus_index
 
-ALLENNLP_PARSER_NAME = "allen_nlp"
-
 class AllennlpParser(BaseParser):
     ALLENNLP_TEMPORAL_TAG = "ARGM-TMP"
     NO_DATE_DETECTED = "ERROR_NO_DATE"
     _PARSER_NAME = ALLENNLP_PARSER_NAME
+    _MODEL_NAME = "structured-prediction-srl-bert"
 
     def __init__(self):
         self._settings = ParserSettings() # all default values
@@ -38,55 +37,85 @@ class AllennlpParser(BaseParser):
         self._settings = settings
 
     @override
-    def accept(self, input: ParserInput, contains_no_year_temporals=True, batch_mode=False, batch_offset=-1) -> ParserOutput:
-        self.input = input
-        self._contains_no_year_temporals = contains_no_year_temporals and not batch_mode
-        self._batch_mode = batch_mode
-        self._batch_offset = batch_offset
+    def accept(self, input: ParserInput, contains_no_year_temporals=True, batch_mode=False, batch_offset=-1, settings: Optional[ParserSettings] = None) -> ParserOutput:
+        # per call state goes into the context so the loaded predictor can be shared between requests
+        context = ParseContext(input, settings or self._settings, contains_no_year_temporals, batch_mode, batch_offset)
 
         intermediate_outputs = not batch_mode
 
-        if self._batch_mode:
-            self.validate_batch_mode()
+        # batches may come in already tokenized (the old per document tokenization), anything else gets tokenized here
+        if isinstance(context.input.get_content(), str):
+            context.input.tokenize()
 
-        # See which tokenization is better, per batch or total
-        if not batch_mode:
-            self.input.tokenize()
+        context.sentences = context.input.get_content()
 
+        predictions = self.get_allennlp_predictions(context)
 
-        predictions = self.get_allennlp_predictions()
 
+        tempora_entity_list = self.extract_temporal_parts(context, predictions)
 
-        tempora_entity_list = self.extract_temporal_parts(predictions)
-
-        output = ParserOutput(tempora_entity_list, contains_no_year_temporals=self._contains_no_year_temporals, finalizeOnInit=intermediate_outputs)
+        output = ParserOutput(tempora_entity_list, contains_no_year_temporals=context.contains_no_year_temporals, finalizeOnInit=intermediate_outputs)
         output.parser_name = self._PARSER_NAME
+        output.sentence_count = len(context.sentences)
         return output
 
     @disable_logging
     @override
     def initialize(self):
-        self.predictor = load_predictor("structured-prediction-srl-bert")
-
-    def validate_batch_mode(self) -> None:
-        if self._batch_offset == -1:
-            log_error("Parser batch mode turned on but no batch information set")
-            raise ValueError("NO BATCH INFORMATION SET IN PARSER")
+        self.predictor = load_predictor(self._MODEL_NAME)
 
-    def get_allennlp_predictions(self) -> list:
+    def get_allennlp_predictions(self, context: ParseContext) -> list:
         predictions = []
-        for corpus_index, part in enumerate(self.input.get_content()):
-            predictions.append(PredictionWrapper(self.predictor.predict(part), corpus_index))  # type: ignore
+        corpus = context.sentences
 
+        for batch in self.build_token_budget_batches(context.settings, corpus):
+            results = self.predictor.predict_batch_json([{"sentence": corpus[i]} for i in batch])  # type: ignore
+
+            for corpus_index, result in zip(batch, results):
+                predictions.append(PredictionWrapper(self.strip_prediction(result), corpus_index))
+
+        # batches are grouped by length, extraction expects document order for the counters
+        predictions.sort(key=lambda p: p.corpus_index)
         return predictions
 
-    def extract_temporal_parts(self, predictions: List[PredictionWrapper]) -> list:
+    def build_token_budget_batches(self, settings: ParserSettings, corpus: List[str]) -> List[List[int]]:
+        # whitespace token counts are close enough to the wordpiece counts to keep padding low,
+        # sorting by length puts similar lengths together and the budget keeps memory flat
+        max_tokens = settings.max_batch_tokens
+        by_length = sorted(range(len(corpus)), key=lambda i: len(corpus[i].split()))
+
+        batches: List[List[int]] = []
+        current: List[int] = []
+        longest = 0
+
+        for corpus_index in by_length:
+            length = max(1, len(corpus[corpus_index].split()))
+
+            # padded size of the batch is the longest sentence times the batch length
+            if current and max(longest, length) * (len(current) + 1) > max_tokens:
+                batches.append(current)
+                current = []
+                longest = 0
+
+            current.append(corpus_index)
+            longest = max(longest, length)
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    def strip_prediction(self, prediction: dict) -> dict:
+        # the full predictions carry tags and logits for every verb, only these are read later on
+        return {
+            "words": prediction["words"],
+            "verbs": [{"description": verb["description"]} for verb in prediction["verbs"]]
+        }
+
+    def extract_temporal_parts(self, context: ParseContext, predictions: List[PredictionWrapper]) -> list:
         temporal_entity_list = []
         last_valid_year : str = ""
-        counter = 0
-
-        if self._batch_mode:
-            counter += self._batch_offset + 1
+        counter = context.first_order
 
         
         for prediction_wrapper in predictions:
@@ -101,8 +130,9 @@ class AllennlpParser(BaseParser):
                     if temporal_entity.year != self.NO_DATE_DETECTED:
                         temporal_entity.order = counter
                         counter += 1
+                        temporal_entity.sentence_index = prediction_wrapper.corpus_index
                         last_valid_year = temporal_entity.year
-                        self.append_context(temporal_entity, prediction_wrapper.corpus_index) # type: ignore
+                        self.append_context(context, temporal_entity, prediction_wrapper.corpus_index) # type: ignore
                         temporal_entity_list.append(temporal_entity)
                         # each prediction should be for a single sentence, in cases like
                         # "Between 12,900 and 11,700 years ago" we will store under the first value and skip the rest
@@ -110,9 +140,10 @@ class AllennlpParser(BaseParser):
                     else:
                         temporal_entity.order = counter
                         counter += 1
+                        temporal_entity.sentence_index = prediction_wrapper.corpus_index
                         temporal_entity.entity_type = TemporalEntityType.NO_YEAR
                         temporal_entity._year_before = last_valid_year
-                        self.append_context(temporal_entity, prediction_wrapper.corpus_index) # type: ignore
+                        self.append_context(context, temporal_entity, prediction_wrapper.corpus_index) # type: ignore
                         temporal_entity_list.append(temporal_entity)
                         break
 
@@ -120,69 +151,28 @@ class AllennlpParser(BaseParser):
 
         return temporal_entity_list
 
-    def append_context(self, temporal_entity: TemporalEntity, corpus_index: int):
-        context_radius = self._settings.context_radius
+    def append_context(self, context: ParseContext, temporal_entity: TemporalEntity, corpus_index: int):
+        context_radius = context.settings.context_radius
 
         if context_radius == 0:
             return
 
-        corpus_size = len(self.input.get_content())
+        corpus = context.sentences
+        corpus_size = len(corpus)
 
         for x in range(1, context_radius+1):
-                        if (corpus_index - x) > 0:
-                            temporal_entity.context_before += self.input.get_content()[corpus_index - x] + " "
+                        if (corpus_index - x) >= 0:
+                            temporal_entity.context_before += corpus[corpus_index - x] + " "
                         if (corpus_index + x) < corpus_size:
-                            temporal_entity.context_after += self.input.get_content()[corpus_index + x] + " "
+                            temporal_entity.context_after += corpus[corpus_index + x] + " "
 
     def handle_temporal_found(self, prediction: dict, description: str) -> TemporalEntity:
-        temporal_entity = TemporalEntity()
-
         sentence = word_list_to_string(prediction["words"])
 
-        temporal_entity.event = sentence
-
-        year = self.extract_year(description)
-        date = self.extract_date(description)
-
-        temporal_entity.date = date
-        temporal_entity.year = year
-
-        return temporal_entity
-
-    def extract_date(self, description) -> str:
-        result = re.search('TMP(.*?)]', description)
-
-        result_group = result.group(1)  # type: ignore
-
-        result_group = result_group.replace("]", "")
-        result_group = result_group.replace(":", "")
-
-        return result_group
-
-    def extract_year(self, description) -> str:
-        result = re.search('TMP(.*?)]', description)
-
-        result_group = result.group(1)  # type: ignore
-
-        result_group = result_group.replace("]", "")
-        result_group = result_group.replace(":", "")
-
-        if "century" in result_group:
-            year = re.search('([0-9]{1,2})', result_group)
-            if year is not None:
-                year = (int(year.group(1)) - 1) * 100
-                return str(year)
-
-        # fix this, detects days of month as years
-        years = re.findall(r'(?<![\[])([0-9]{3,})(?![\]])', result_group)
-        if len(years) > 0:
-            for y in years:
-                if len(y) >= 3:
-                    if all(v == '0' for v in y) is False:
-                        return str(y)
-
-        # non_temporal_list.append(sentence)
-        return self.NO_DATE_DETECTED
-
-
+        # the description always contains the tag here, only checked in case of malformed predictions
+        argument = extract_srl_temporal_argument(description)
+        year = normalize_srl_argument(argument) if argument is not None else None
 
+        return TemporalEntity(event=sentence,
+                              date=argument if argument is not None else "",
+                              year=year if year is not None else self.NO_DATE_DETECTED)
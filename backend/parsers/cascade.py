@@ -0,0 +1,97 @@
+import re
+
+from typing_extensions import override
+from typing import Callable, Dict, List, Optional
+
+from .base import BaseParser
+from ..commons.temporal import TemporalEntity, TemporalEntityType
+from ..commons.parser_commons import ParseContext, ParserInput, ParserOutput, ParserSettings
+from ..commons.t2t_logging import log_decorated, log_info
+from ..commons.t2t_enums import CASCADE_PARSER_NAME, FLAIR_PARSER_NAME, SPACY_PARSER_NAME
+
+'''
+spaCy goes over the whole document, and only the sentences it isn't sure about get sent to one of the heavy models:
+    - NO_YEAR entities
+    - sentences with more than one DATE/TIME span, spaCy only keeps the first one
+    - century expressions
+The heavy model's answer replaces spaCy's for those sentences when it manages to find a year, everything else
+(order, context, the rest of the document) stays as spaCy produced it so the result looks like a single parser's output
+'''
+class CascadeParser(BaseParser):
+    _PARSER_NAME: str = CASCADE_PARSER_NAME
+
+    def __init__(self, parser_provider: Callable[[str], BaseParser], fallback_parser_name: str = FLAIR_PARSER_NAME):
+        # the provider is ParserService.get_parser, so the already loaded models are shared instead of loaded twice
+        self._settings = ParserSettings() # all default values
+        self._parser_provider = parser_provider
+        self.fallback_parser_name = fallback_parser_name
+        self.initialize()
+
+    @property
+    def settings(self):
+        return self._settings
+
+    @settings.setter
+    def settings(self, settings: ParserSettings):
+        self._settings = settings
+
+    @override
+    def initialize(self) -> None:
+        self._base_parser = self._parser_provider(SPACY_PARSER_NAME) # SpacyParser, not imported here so loading stays lazy
+
+    @property
+    def _MODEL_NAME(self) -> str:
+        # used for cache keys, results depend on both models
+        return f"{self._base_parser._MODEL_NAME}+{self.fallback_parser_name}"
+
+    @override
+    def accept(self, input: ParserInput, contains_no_year_temporals=True, batch_mode=False, batch_offset=-1, settings: Optional[ParserSettings] = None) -> ParserOutput:
+        settings = settings or self._settings
+        # the context outlives the spaCy call, the number of DATE/TIME spans per sentence is read from it
+        context = ParseContext(input, settings, True, batch_mode, batch_offset)
+        base_output = self._base_parser.accept_context(context)
+        entities: List[TemporalEntity] = list(base_output.content) + list(getattr(base_output, "content_no_years", []))
+        entities.sort(key=lambda e: e.order)
+
+        low_confidence = self.find_low_confidence(entities, context.temporal_span_counts)
+        log_info("Cascade sending %d/%d sentences to %s", len(low_confidence), len(entities), self.fallback_parser_name)
+
+        if len(low_confidence) > 0:
+            self.recheck_with_fallback(low_confidence, settings)
+
+        output = ParserOutput(entities, contains_no_year_temporals=contains_no_year_temporals and not batch_mode, finalizeOnInit=not batch_mode)
+        output.parser_name = self._PARSER_NAME
+        output.sentence_count = base_output.sentence_count
+        return output
+
+    def find_low_confidence(self, entities: List[TemporalEntity], temporal_span_counts: Dict[int, int]) -> List[TemporalEntity]:
+        # spaCy only keeps the first temporal span per sentence, it counted all of them while parsing
+        return [entity for entity in entities
+                if entity.entity_type == TemporalEntityType.NO_YEAR or "century" in entity.date.lower()
+                or temporal_span_counts.get(entity.sentence_index, 0) > 1]
+
+    def recheck_with_fallback(self, low_confidence: List[TemporalEntity], settings: ParserSettings) -> None:
+        fallback = self._parser_provider(self.fallback_parser_name)
+        fallback_output = fallback.accept(ParserInput("\n".join(e.event for e in low_confidence)), settings=settings) # type: ignore
+
+        # the fallback tokenizes differently (AllenNLP joins words with spaces), match sentences without whitespace
+        fallback_by_event: Dict[str, TemporalEntity] = {}
+        for fallback_entity in fallback_output.content:
+            if fallback_entity.entity_type == TemporalEntityType.WITH_YEAR:
+                fallback_by_event.setdefault(self.event_key(fallback_entity.event), fallback_entity)
+
+        replaced = 0
+        for entity in low_confidence:
+            match = fallback_by_event.get(self.event_key(entity.event))
+            if match is None:
+                continue
+
+            entity.date = match.date
+            entity.year = match.year
+            entity.entity_type = TemporalEntityType.WITH_YEAR
+            replaced += 1
+
+        log_decorated("Cascade replaced %s/%d low confidence entities with %s results", replaced, len(low_confidence), self.fallback_parser_name)
+
+    def event_key(self, event: str) -> str:
+        return re.sub(r"\s+", "", event)
@@ -4,25 +4,25 @@ from flair.models import SequenceTagger
 from segtok.segmenter import split_single
 
 from typing_extensions import override
-from typing import List, Tuple, Dict, Set
+from typing import List, Optional, Tuple, Dict, Set
 
 from .base import BaseParser
 from ..commons.temporal import TemporalEntity, TemporalEntityType
-from ..commons.parser_commons import ParserInput, ParserOutput, ParserSettings
+from ..commons.parser_commons import ParseContext, ParserInput, ParserOutput, ParserSettings
+from ..commons.temporal_normalization import normalize
+from ..commons.t2t_enums import FLAIR_PARSER_NAME
 
-import re
 
 class PredictionWrapper(object):
     def __init__(self, predicition: TemporalEntity, index: int):
         self.content = predicition
         self.sentence_index = index
 
-FLAIR_PARSER_NAME = "Flair"
-
 class FlairParser(BaseParser):
     _FLAIR_TEMPORAL_TAG: str = "DATE"
-    _TEMPORAL_ERROR: str = "ERROR GETTING DATE/YEAR"
     _PARSER_NAME: str = FLAIR_PARSER_NAME
+    _MODEL_NAME: str = "ner-ontonotes"
+    _FIRST_ORDER: int = 1 # flair always counted from 1 outside of batches, the sentence cache numbers its rebuilds the same way
 
     def __init__(self):
         self._settings = ParserSettings() # all default values
@@ -37,60 +37,53 @@ class FlairParser(BaseParser):
         self._settings = settings
 
     @override
-    def accept(self, input: ParserInput) -> ParserOutput:
-        self.input = input
+    def accept(self, input: ParserInput, contains_no_year_temporals=True, batch_mode=False, batch_offset=-1, settings: Optional[ParserSettings] = None) -> ParserOutput:
+        # per call state goes into the context so the loaded tagger can be shared between requests
+        context = ParseContext(input, settings or self._settings, contains_no_year_temporals, batch_mode, batch_offset)
         wrapped_prediction_list: List[PredictionWrapper] = []
 
-        # keep inits barebones to potentially run in separate threads
-        # move init out of here later, call it separately
-        self.init_document()
+        self.init_document(context)
 
-        wrapped_prediction_list = self.extract_temporals(self._sentences)
+        wrapped_prediction_list = self.extract_temporals(context)
 
         temporal_entity_list: List[TemporalEntity] = []
-        temporal_entity_list = self.populate_context(wrapped_prediction_list)    
+        temporal_entity_list = self.populate_context(context, wrapped_prediction_list)    
 
-        output: ParserOutput = ParserOutput(temporal_entity_list,  contains_no_year_temporals=True)
+        # batch outputs get appended to another output, that one does the finalizing
+        output: ParserOutput = ParserOutput(temporal_entity_list, contains_no_year_temporals=context.contains_no_year_temporals, finalizeOnInit=not batch_mode)
         output.parser_name = self._PARSER_NAME
+        output.sentence_count = len(context.sentences)
         return output
 
-    def extract_temporals(self, spacy_document) -> List[PredictionWrapper]:
+    def extract_temporals(self, context: ParseContext) -> List[PredictionWrapper]:
         wrapped: List[PredictionWrapper] = []
         processed_events: Set = set()
-        order = 1
+        order = context.first_order if context.batch_mode else self._FIRST_ORDER
         last_valid_year : str = ""
 
-        for sentence_index, sentence in enumerate(self._sentences): # type: ignore
+        for sentence_index, sentence in enumerate(context.sentences): # type: ignore
             for entity in sentence.get_spans("ner"): # type:ignore
                 if entity.tag == self._FLAIR_TEMPORAL_TAG:
                     date = entity.text
                     event = sentence.text # type: ignore
 
 
-                    result_year = self.get_year(date)
-                    temporal_value = self.format_year(result_year)
+                    temporal_value = normalize(date)
 
 
                     if temporal_value is not None and event not in processed_events:
                         processed_events.add(event)
 
-                        temporal_entity: TemporalEntity = TemporalEntity()
-                        temporal_entity.event = event
-                        temporal_entity.date = date
-                        temporal_entity.year = temporal_value
-                        temporal_entity.order = order
+                        temporal_entity: TemporalEntity = TemporalEntity(event=event, date=date, year=temporal_value, order=order, sentence_index=sentence_index)
                         order += 1
                         last_valid_year = temporal_value
                         wrap = PredictionWrapper(temporal_entity, sentence_index)
                         wrapped.append(wrap)
                     elif event not in processed_events:
                         processed_events.add(event)
-                        temporal_entity: TemporalEntity = TemporalEntity()
-                        temporal_entity.event = event
-                        temporal_entity.date = date
-                        temporal_entity.order = order
+                        temporal_entity: TemporalEntity = TemporalEntity(event=event, date=date, order=order, entity_type=TemporalEntityType.NO_YEAR,
+                                                                         sentence_index=sentence_index)
                         temporal_entity._year_before = last_valid_year
-                        temporal_entity.entity_type = TemporalEntityType.NO_YEAR
                         order += 1
                         wrap = PredictionWrapper(temporal_entity, sentence_index)
                         wrapped.append(wrap)
@@ -99,8 +92,9 @@ class FlairParser(BaseParser):
 
         return wrapped
 
-    def populate_context(self, wrapped: List[PredictionWrapper]) -> List[TemporalEntity]:
-        context_radius = self._settings.context_radius
+    def populate_context(self, context: ParseContext, wrapped: List[PredictionWrapper]) -> List[TemporalEntity]:
+        context_radius = context.settings.context_radius
+        sentences = context.sentences
         unwrapped: List[TemporalEntity] = []
 
         if context_radius == 0:
@@ -109,56 +103,33 @@ class FlairParser(BaseParser):
         for wrapper in wrapped:
             sentence_index = wrapper.sentence_index
             for x in range(1, context_radius+1):
-                            if (sentence_index - x) > 0:
-                                wrapper.content.context_before += str(self._sentences[sentence_index - x].text) + " "
-                            if (sentence_index + x) < len(self._sentences):
-                                wrapper.content.context_after += str(self._sentences[sentence_index + x].text) + " "
+                            if (sentence_index - x) >= 0:
+                                wrapper.content.context_before += str(sentences[sentence_index - x].text) + " "
+                            if (sentence_index + x) < len(sentences):
+                                wrapper.content.context_after += str(sentences[sentence_index + x].text) + " "
             unwrapped.append(wrapper.content)
 
         return unwrapped
 
 
-    def format_year(self, year):
-        if year is None or year == self._TEMPORAL_ERROR:
-            return None
-        
-        year = str(year)
-        if len(year)==4:
-            return year
-        else:
-            while len(year) < 4:
-                year = "0"+year
-            return year
-
-    def get_year(self, date_text) -> str:
-        result_year:str = self._TEMPORAL_ERROR
-
-        if "century" in date_text:
-            year = re.search('([0-9]{1,2})', date_text)
-            if year is not None:
-                year = (int(year.group(1)) -1) * 100
-                if year == 0:
-                    year = 1
-                result_year = str(year)
-
-        
-        years = re.findall(r'(?<![\[])([0-9]{3,4})(?![\]])', date_text) # manually editted to remove false positives because of shittier model
-        
-        if len(years) > 0:
-            for y in years:
-                if len(y) >= 3:
-                    if all(v == '0' for v in y) is False:
-                        result_year = str(y)
-
-        return result_year
-    
-
     @override
     def initialize(self):
-        self._model = SequenceTagger.load("ner-ontonotes")
+        self._model = SequenceTagger.load(self._MODEL_NAME)
 
-    def init_document(self):
+    def init_document(self, context: ParseContext):
         # Might as well use the flair tokenizer instead of the nltk one
-        tokenized = [Sentence(sent, use_tokenizer=True) for sent in split_single(self.input.get_content())]
-        self._model.predict(tokenized)
-        self._sentences = tokenized
\ No newline at end of file
+        tokenized = [Sentence(sent, use_tokenizer=True) for sent in split_single(context.input.get_content())]
+        self.predict_in_batches(context.settings, tokenized)
+        context.sentences = tokenized
+
+    def predict_in_batches(self, settings: ParserSettings, sentences: List[Sentence]) -> None:
+        batch_size = max(1, settings.inference_batch_size)
+
+        # similar lengths in the same batch means less padding, predictions are stored on the
+        # Sentence objects themselves so the original list stays in document order
+        by_length = sorted(range(len(sentences)), key=lambda i: len(sentences[i]), reverse=True)
+
+        for start in range(0, len(by_length), batch_size):
+            batch = [sentences[i] for i in by_length[start:start+batch_size]]
+            # embeddings aren't needed after tagging, keeping them is what makes memory grow on long documents
+            self._model.predict(batch, mini_batch_size=batch_size, embedding_storage_mode="none")
@@ -1,23 +1,29 @@
 from ast import Set
 import spacy
-import re
+from spacy.tokens import Doc
 
 from typing_extensions import override
-from typing import List, Tuple, Dict, Set
+from typing import List, Optional, Tuple, Dict, Set
 
 from .base import BaseParser
 from ..commons.temporal import TemporalEntity, TemporalEntityType
-from ..commons.parser_commons import ParserInput, ParserOutput, ParserSettings
+from ..commons.parser_commons import ParseContext, ParserInput, ParserOutput, ParserSettings
+from ..commons.temporal_normalization import normalize
+from ..commons.t2t_enums import ParserProfile, SPACY_PARSER_NAME
 
 from ..commons.t2t_logging import log_error, log_info
 
 
-SPACY_PARSER_NAME = "spaCy"
-
 class SpacyParser(BaseParser):
     _SPACY_TEMPORAL_TAGS: List[str] = ["DATE", "TIME"]
-    _TEMPORAL_ERROR: str = "ERROR GETTING DATE/YEAR"
     _PARSER_NAME: str = SPACY_PARSER_NAME
+    _MIN_CHUNK_LENGTH: int = 10000
+    _MODEL_NAME: str = "en_core_web_sm"
+
+    # extract_temporals only reads doc.ents and doc.sents, none of these feed into the entity recognizer or the
+    # dependency parser. The parser stays, it sets the sentence boundaries events and context are cut along and senter
+    # draws them differently, the fast profile has to give the same output as the full one
+    _FAST_PROFILE_EXCLUDED: List[str] = ["tagger", "lemmatizer", "attribute_ruler"]
 
     def __init__(self):
         self._settings = ParserSettings() # all default values
@@ -31,77 +37,69 @@ class SpacyParser(BaseParser):
     def settings(self, settings: ParserSettings):
         self._settings = settings
 
-    @override
-    def accept(self, input: ParserInput, contains_no_year_temporals=True, batch_mode=False, batch_offset=-1) -> ParserOutput:
-        # BIG TODO, move all class state into a short lifecycle context object
-        # since multiple requests actually works surprisingly well might as well clean up all the race conditions
-        
-        self.input = input
-        self._contains_no_year_temporals = contains_no_year_temporals and not batch_mode
-        self._batch_mode = batch_mode
-        self._batch_offset = batch_offset
+        if settings.profile != self._loaded_profile:
+            self.initialize()
 
+    @override
+    def accept(self, input: ParserInput, contains_no_year_temporals=True, batch_mode=False, batch_offset=-1, settings: Optional[ParserSettings] = None) -> ParserOutput:
+        # all per call state lives in the context, the loaded pipeline is the only thing shared between requests
+        # per call settings can change anything but the profile, that one decides which pipeline is loaded
+        context = ParseContext(input, settings or self._settings, contains_no_year_temporals, batch_mode, batch_offset)
+        return self.accept_context(context)
+
+    def accept_context(self, context: ParseContext) -> ParserOutput:
+        '''
+            accept with a context made by the caller, for callers that want what's left on it afterwards (the cascade
+            reads temporal_span_counts)
+        '''
         # Don't do any post processing after ParseOuput is instanciated
         # as the ouput will be appended to another output as part of the batching process
-        intermediate_outputs = not batch_mode
-
-        if self._batch_mode:
-            self.validate_batch_mode()
+        intermediate_outputs = not context.batch_mode
 
         tempora_entity_list: List[TemporalEntity] = []
 
-        spacy_document = self.init_document()
+        spacy_document = self.init_document(context)
         
-        tempora_entity_list = self.extract_temporals(spacy_document)
+        tempora_entity_list = self.extract_temporals(context, spacy_document)
 
-        output: ParserOutput = ParserOutput(tempora_entity_list, contains_no_year_temporals=self._contains_no_year_temporals, finalizeOnInit=intermediate_outputs)
+        output: ParserOutput = ParserOutput(tempora_entity_list, contains_no_year_temporals=context.contains_no_year_temporals, finalizeOnInit=intermediate_outputs)
         output.parser_name = self._PARSER_NAME
+        output.sentence_count = len(context.sentences)
 
-        self.teardown_and_cleanup()
         return output
 
-    def validate_batch_mode(self) -> None:
-        if self._batch_offset == -1:
-            log_error("Parser batch mode turned on but no batch information set")
-            raise ValueError("NO BATCH INFORMATION SET IN PARSER")
-
-    def extract_temporals(self, spacy_document) -> List[TemporalEntity]:
+    def extract_temporals(self, context: ParseContext, spacy_document) -> List[TemporalEntity]:
         tempora_entity_list: List[TemporalEntity] = []
         processed_events: Set = set() 
-        counter : int = 0
+        counter : int = context.first_order
         last_valid_year : str = ""
-
-        if self._batch_mode:
-            counter += self._batch_offset + 1
+        # DATE/TIME spans per sentence index, only the first one of a sentence becomes an entity
+        context.temporal_span_counts = {}
 
         for entity in spacy_document.ents:
             if entity.label_ in self._SPACY_TEMPORAL_TAGS:
+                sentence_index = context.sentence_start_to_index_map.get(entity.sent.start, -1)
+                context.temporal_span_counts[sentence_index] = context.temporal_span_counts.get(sentence_index, 0) + 1
+
                 date = entity.text
                 event = entity.sent.text
 
-                result_year = self.get_year(date)
-                temporal_value = self.format_year(result_year)
+                temporal_value = normalize(date)
 
                 if temporal_value is not None and event not in processed_events:
                     processed_events.add(event) 
 
-                    temporal_entity: TemporalEntity = TemporalEntity()
-                    temporal_entity.event = event
-                    temporal_entity.date = date
-                    temporal_entity.year = temporal_value
-                    temporal_entity.order = counter
-                    self.populate_context(temporal_entity, entity.sent.start)
+                    temporal_entity: TemporalEntity = TemporalEntity(event=event, date=date, year=temporal_value, order=counter,
+                                                                     sentence_index=sentence_index)
+                    self.populate_context(context, temporal_entity, entity.sent.start)
                     tempora_entity_list.append(temporal_entity)
 
                     last_valid_year = temporal_value
                 elif event not in processed_events:
                     processed_events.add(event)
-                    temporal_entity: TemporalEntity = TemporalEntity()
-                    temporal_entity.event = event
-                    temporal_entity.date = date
-                    temporal_entity.entity_type = TemporalEntityType.NO_YEAR
-                    temporal_entity.order = counter
-                    self.populate_context(temporal_entity, entity.sent.start)
+                    temporal_entity: TemporalEntity = TemporalEntity(event=event, date=date, order=counter, entity_type=TemporalEntityType.NO_YEAR,
+                                                                     sentence_index=sentence_index)
+                    self.populate_context(context, temporal_entity, entity.sent.start)
                     temporal_entity._year_before = last_valid_year
                     tempora_entity_list.append(temporal_entity)
 
@@ -111,75 +109,67 @@ class SpacyParser(BaseParser):
 
         return tempora_entity_list
 
-    def populate_context(self, temporal_entity: TemporalEntity, sentence_start):
-        context_radius = self._settings.context_radius
+    def populate_context(self, context: ParseContext, temporal_entity: TemporalEntity, sentence_start):
+        context_radius = context.settings.context_radius
 
         if context_radius == 0:
             return
 
-        sentence_index = self._sentence_start_to_index_map[sentence_start]
+        sentence_index = context.sentence_start_to_index_map[sentence_start]
+        sentences = context.sentences
 
         for x in range(1, context_radius+1):
-                        if (sentence_index - x) > 0:
-                            temporal_entity.context_before += str(self._sentences[sentence_index - x]) + " "
-                        if (sentence_index + x) < self._sentence_size:
-                            temporal_entity.context_after += str(self._sentences[sentence_index + x]) + " "
+                        if (sentence_index - x) >= 0:
+                            temporal_entity.context_before += str(sentences[sentence_index - x]) + " "
+                        if (sentence_index + x) < len(sentences):
+                            temporal_entity.context_after += str(sentences[sentence_index + x]) + " "
 
 
-    def format_year(self, year):
-        if year is None or year == self._TEMPORAL_ERROR:
-            return None
-        
-        year = str(year)
-        if len(year)==4:
-            return year
+    @override
+    def initialize(self):
+        profile = self._settings.profile
+
+        if profile == ParserProfile.FAST:
+            self._nlp = spacy.load(self._MODEL_NAME, exclude=self._FAST_PROFILE_EXCLUDED)
         else:
-            while len(year) < 4:
-                year = "0"+year
-            return year
-
-    def get_year(self, date_text) -> str:
-        result_year:str = self._TEMPORAL_ERROR
-
-        if "century" in date_text:
-            year = re.search('([0-9]{1,2})', date_text)
-            if year is not None:
-                year = (int(year.group(1)) -1) * 100
-                if year == 0:
-                    year = 1
-                result_year = str(year)
-
-        # manually editted to remove false positives because of weaker model than the heavier/slower ones
-        years = re.findall(r'(?<![\[])([0-9]{3,4})(?![\]])', date_text) 
+            self._nlp = spacy.load(self._MODEL_NAME)
+
+        self._loaded_profile = profile
+        log_info("Loaded %s with %s profile, pipeline: %s", self._MODEL_NAME, profile.value, self._nlp.pipe_names)
         
-        if len(years) > 0:
-            for y in years:
-                if len(y) >= 3:
-                    if all(v == '0' for v in y) is False:
-                        result_year = str(y)
+    def init_document(self, context: ParseContext):
+        content = context.input.get_content()
 
-        return result_year
-    
+        if self.use_chunked_mode(context.settings, content):
+            document = self.init_document_chunked(context, content)
+        else:
+            document = self._nlp(content) # expects non-tokenized text
 
-    @override
-    def initialize(self):
-        self._nlp = spacy.load("en_core_web_sm")
-        
-    def teardown_and_cleanup(self) -> None:
-        try:
-            del self._sentences
-            del self._sentence_start_to_index_map
-        except:
-            pass
+        context.sentences = list(document.sents)
+
+        for index, sentence in enumerate(context.sentences):
+            context.sentence_start_to_index_map[sentence.start] = index # type: ignore
+
+        return document
+
+    def use_chunked_mode(self, settings: ParserSettings, content: str) -> bool:
+        # past max_length spaCy refuses the text, so chunking isn't optional there
+        return settings.chunk_length > 0 or settings.n_process > 1 or len(content) > self._nlp.max_length
+
+    def init_document_chunked(self, context: ParseContext, content: str):
+        settings = context.settings
+        chunk_length = settings.chunk_length
 
-    def init_document(self):
-        document = self._nlp(self.input.get_content()) # expects non-tokenized text
-        self._sentences = list(document.sents)
+        if chunk_length <= 0:
+            # a few chunks per process so slower chunks don't leave the other processes idle
+            chunk_length = max(self._MIN_CHUNK_LENGTH, len(content) // (settings.n_process * 4) + 1)
 
-        self._sentence_start_to_index_map: Dict[int, int] = {}
+        chunk_length = min(chunk_length, self._nlp.max_length)
+        chunks = [chunk.get_content() for chunk in context.input.get_in_chunks(chunk_length)]
 
-        for index, sentence in enumerate(self._sentences):
-            self._sentence_start_to_index_map[sentence.start] = index # type: ignore
+        log_info("Parsing %d chunks with %s processes", len(chunks), settings.n_process)
+        documents = list(self._nlp.pipe(chunks, n_process=settings.n_process, batch_size=settings.chunk_batch_size))
 
-        self._sentence_size = len(list(document.sents))
-        return document
\ No newline at end of file
+        # merging back into a single doc keeps token offsets, sentence starts and entities global
+        # so ordering, year carry-over and context work across chunk edges exactly like the single call
+        return Doc.from_docs(documents, ensure_whitespace=False)
@@ -1,4 +1,3 @@
-from collections import defaultdict
 from enum import Enum
 from typing import List
 import seaborn as sns
@@ -72,12 +71,7 @@ def events_per_year_bubble_mpl(parser_output:ParserOutput, group_size=0) -> Rend
     bubble_sizes = [count * 50 for count in event_counts]
 
     if group_size > 0:
-        grouped_data = defaultdict(int)
-        for year, count in year_map.items():
-            group = (int(year) // group_size) * group_size  
-            grouped_data[group] += count  
-
-        years, event_counts = zip(*sorted(grouped_data.items()))
+        years, event_counts = parser_output.year_histogram(group_size)
         
     bubble_sizes = [count * 50 for count in event_counts]
     plt.figure(figsize=(10, 6))
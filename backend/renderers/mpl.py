@@ -75,16 +75,15 @@ class MPLRenderer(BaseRenderer):
 
 
     def build_plot(self, temporal_entities: List[TemporalEntity]):
-        years = [x.year if x.year != '' else "0001" for x in temporal_entities]
-        years = list(map(self.pad_year, years))
-        dates = [datetime.strptime(d, "%Y") for d in years]
+        # year 0 and entities without a year are plotted at year 1, datetime has no year 0
+        dates = [datetime(x.year_value or 1, 1, 1) for x in temporal_entities]
 
         distance_between_min_max_years, min_date, max_date = self.calculate_interval(dates)
         
         # TODO batches get different intervals, is that bad? :(
         inter = int(distance_between_min_max_years / 20) # baseline interval
 
-        log_decorated(f"Mpl Intervals, year range for this plot {distance_between_min_max_years}, baseline interval {inter}")
+        log_decorated("Mpl Intervals, year range for this plot %s, baseline interval %s", distance_between_min_max_years, inter)
 
         names = []
         annotation_wrappers = []
@@ -463,8 +462,8 @@ class MPLInteractiveRenderer(BaseRenderer):
 
 
     def build_plot(self, temporal_entities: List[TemporalEntity]):
-        entities = sorted(temporal_entities, key=lambda x: int(x.year))
-        years = [int(e.year) for e in entities]
+        entities = sorted(temporal_entities, key=lambda x: x.year_value)
+        years = [e.year_value for e in entities]
 
         plt.figure(figsize=(10, 6))
         line, = plt.plot(range(len(entities)), years, marker="o", linestyle="", color="blue")
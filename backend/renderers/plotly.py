@@ -56,7 +56,7 @@ class PlotlyRenderer(BaseRenderer):
             self.render_next_page()
 
     def build_plot(self, entity_list: List[TemporalEntity]):
-        entities = sorted(entity_list, key=lambda x: int(x.year))
+        entities = sorted(entity_list, key=lambda x: x.year_value)
         fig = go.Figure()
         dates = self.get_date_list(entities)
 
@@ -144,8 +144,4 @@ class PlotlyRenderer(BaseRenderer):
         return " ".join(result)
 
     def get_date_list(self, entity_list):
-        result = []
-        for x in entity_list:
-            result.append(int(x.year))
-        result = sorted(list(set(result)))
-        return result
+        return sorted(set(x.year_value for x in entity_list))
@@ -0,0 +1,174 @@
+import bisect
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from ..commons.parser_commons import ParserInput, ParserOutput, ParserSettings
+from ..commons.temporal import TemporalEntity, TemporalEntityType
+from ..commons.t2t_logging import log_decorated, log_info
+from .parserservice import ParserService
+
+'''
+Bounded memory batch mode, the document is parsed one chunk of whole sentences at a time and only the
+extracted entities are kept between chunks, so the model only ever sees (and allocates for) one chunk.
+
+Every chunk is parsed inside a window that also holds overlap_sentences sentences of its neighbours on
+both sides, that's what context_before/context_after and the year carry-over read at the chunk edges.
+Entities found in the overlap belong to the neighbouring chunk and are dropped, the rest get their order
+renumbered over the whole document and NO_YEAR entities without a year in their window take the last
+year of the previous chunks, the merged output then looks like a single parser call on the full text.
+Sentence indexes are over the whole document as the input splits it (ParserInput.iter_sentences), the
+parser's own are only good within its window.
+'''
+
+DEFAULT_BATCH_CHUNK_LENGTH = 20000
+DEFAULT_BATCH_OVERLAP_SENTENCES = 3
+
+
+class ChunkWindow(object):
+    def __init__(self, text: str, core_start: int, core_end: int, document_end: int, sentence_starts: List[int], first_sentence_index: int):
+        self.text = text
+        # character range of the chunk's own sentences inside text, everything around it is overlap
+        self.core_start = core_start
+        self.core_end = core_end
+        self.document_end = document_end # characters of the document covered up to and including this chunk
+
+        self.sentence_starts = sentence_starts # where every sentence of the window starts in text
+        self.first_sentence_index = first_sentence_index # index of the window's first sentence in the document
+
+    def sentence_index_at(self, position: int) -> int:
+        return self.first_sentence_index + bisect.bisect_right(self.sentence_starts, position) - 1
+
+
+class BatchParser(object):
+    def __init__(self, parser_service: ParserService, chunk_length: int = DEFAULT_BATCH_CHUNK_LENGTH, overlap_sentences: int = DEFAULT_BATCH_OVERLAP_SENTENCES):
+        if chunk_length <= 0:
+            raise ValueError("Chunk length must be a positive number")
+
+        self.parser_service = parser_service
+        self.chunk_length = chunk_length
+        self.overlap_sentences = overlap_sentences
+        self.sentence_count = 0 # sentences of the document read so far
+
+    def parse(self, parser_input: ParserInput, parser_name: str, parser_settings: Optional[ParserSettings] = None) -> ParserOutput:
+        output = ParserOutput([], contains_no_year_temporals=True, batch_mode=True)
+
+        for _, _, entities in self.parse_in_chunks(parser_input, parser_name, parser_settings):
+            output.append_content(ParserOutput(entities, finalizeOnInit=False))
+
+        output.finalize()
+        output.parser_name = parser_name
+        output.sentence_count = self.sentence_count
+        return output
+
+    def parse_in_chunks(self, parser_input: ParserInput, parser_name: str, parser_settings: Optional[ParserSettings] = None) -> Iterator[Tuple[int, int, List[TemporalEntity]]]:
+        '''
+            Yields (chunk index, characters of the document parsed so far, entities) per chunk, entities already carry their final order.
+            Sentences are read lazily from the input, a chunked input (see ingestion) is never joined into a single string
+        '''
+        settings = parser_settings or self.parser_service._parser_settings
+        # less overlap than the context radius would cut the context short at every chunk edge, the parsers read
+        # context from the first sentence of their input on so the radius itself is enough
+        overlap = max(self.overlap_sentences, settings.context_radius)
+
+        next_order = 0
+        last_valid_year = ""
+        previous_keys = set()
+
+        for i, window in enumerate(self.iter_windows(parser_input, overlap)):
+            log_decorated("Batch %s length %d, %s characters in", i + 1, len(window.text), window.document_end)
+            chunk_output = self.parser_service.parse_with_selected(ParserInput(window.text), parser_name, parser_settings)
+
+            entities = list(chunk_output.content) + list(getattr(chunk_output, "content_no_years", []))
+            entities.sort(key=lambda e: e.order)
+            entities = self.keep_core_entities(window, entities, previous_keys)
+
+            for entity in entities:
+                entity.order = next_order
+                next_order += 1
+
+                if entity.entity_type == TemporalEntityType.WITH_YEAR:
+                    last_valid_year = entity.year
+                elif entity._year_before == "":
+                    entity._year_before = last_valid_year
+
+            # the parsers split sentences on their own, an entity could still land in the core of both neighbours
+            previous_keys = set(self.event_key(e.event) for e in entities)
+            yield i, window.document_end, entities
+
+    def iter_windows(self, parser_input: ParserInput, overlap: int) -> Iterator[ChunkWindow]:
+        # only the current chunk, the next one and overlap sentences before them are held at any point
+        groups = self.group_sentences(parser_input.iter_sentences())
+        before: deque = deque(maxlen=overlap)
+        document_end = 0
+        chunk_count = 0
+        self.sentence_count = 0 # sentences of the document before the current chunk
+
+        current = next(groups, None)
+        while current is not None:
+            following = next(groups, None)
+            after = following[:overlap] if following is not None and overlap > 0 else []
+
+            sentences = list(before) + current + after
+            sentence_starts = [0]
+            for sentence in sentences[:-1]:
+                sentence_starts.append(sentence_starts[-1] + len(sentence))
+
+            prefix = "".join(before)
+            core = "".join(current)
+            document_end += len(core)
+            chunk_count += 1
+            yield ChunkWindow("".join(sentences), len(prefix), len(prefix) + len(core), document_end, sentence_starts, self.sentence_count - len(before))
+
+            self.sentence_count += len(current)
+            before.extend(current)
+            current = following
+
+        log_info("Batch mode parsed %s characters in %s chunks with %s sentences of overlap", document_end, chunk_count, overlap)
+
+    def group_sentences(self, sentences: Iterable[str]) -> Iterator[List[str]]:
+        # whole sentences per chunk, a sentence longer than the chunk length gets a chunk of its own
+        group: List[str] = []
+        length = 0
+
+        for sentence in sentences:
+            if group and length + len(sentence) > self.chunk_length:
+                yield group
+                group = []
+                length = 0
+
+            group.append(sentence)
+            length += len(sentence)
+
+        if group:
+            yield group
+
+    def keep_core_entities(self, window: ChunkWindow, entities: List[TemporalEntity], previous_keys: set) -> List[TemporalEntity]:
+        # events are located in the window text without whitespace, AllenNLP joins its tokens with spaces
+        positions = [i for i, c in enumerate(window.text) if not c.isspace()]
+        stripped = "".join(window.text[i] for i in positions)
+
+        kept: List[TemporalEntity] = []
+        search_from = 0
+
+        for entity in entities:
+            key = self.event_key(entity.event)
+            found = stripped.find(key, search_from) if key else -1
+
+            if found == -1:
+                # not located, better a possible duplicate than a lost entity. The parser's sentence index only counts
+                # from the start of the window, better none than a wrong one
+                if key not in previous_keys:
+                    entity.sentence_index = -1
+                    kept.append(entity)
+                continue
+
+            search_from = found
+            start = positions[found]
+            if window.core_start <= start < window.core_end and key not in previous_keys:
+                entity.sentence_index = window.sentence_index_at(start)
+                kept.append(entity)
+
+        return kept
+
+    def event_key(self, event: str) -> str:
+        return "".join(event.split())
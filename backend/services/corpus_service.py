@@ -0,0 +1,145 @@
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+
+from ..commons.ingestion import iter_file_chunks
+from ..commons.parser_commons import ParserInput, ParserOutput, ParserSettings
+from ..commons.t2t_logging import log_decorated, log_error, log_info
+from ..commons.temporal import TemporalEntity
+from .pipeline_manager_service import PipelineManagerService
+
+'''
+Corpus mode, a whole folder (or glob) of text files goes through the pipeline with a few documents in
+flight at once and comes out as one output per document plus a merged timeline of all of them.
+
+Documents run on threads, the parsers keep their per call state in a ParseContext so a single loaded
+model serves all of them, with the parser worker pool started the models run in separate processes.
+Every entity is tagged with its source document, its path relative to the corpus root so files with the same
+name in different folders stay apart. The merged timeline is sorted by year and keeps the document order within a year
+'''
+
+DEFAULT_CORPUS_WORKERS = 4
+CORPUS_FILE_EXTENSIONS = (".txt", ".text", ".md")
+
+
+class DocumentResult(object):
+    def __init__(self, path: str, source: str, output: Optional[ParserOutput], sentence_count: int, error: Optional[str] = None):
+        self.path = path
+        self.source = source
+        self.output = output
+        self.sentence_count = sentence_count
+        self.error = error
+
+    @property
+    def export_name(self) -> str:
+        # a file name for the document's own export, the folders become part of it
+        return os.path.splitext(self.source)[0].replace("/", "__")
+
+
+class CorpusResult(object):
+    def __init__(self, documents: List[DocumentResult], merged_output: ParserOutput, elapsed_time: float):
+        self.documents = documents
+        self.merged_output = merged_output
+        self.elapsed_time = elapsed_time
+
+    @property
+    def parsed_documents(self) -> List[DocumentResult]:
+        return [d for d in self.documents if d.output is not None]
+
+    @property
+    def sentence_count(self) -> int:
+        return sum(d.sentence_count for d in self.parsed_documents)
+
+    def documents_per_second(self) -> float:
+        return len(self.parsed_documents) / self.elapsed_time if self.elapsed_time > 0 else 0.0
+
+    def sentences_per_second(self) -> float:
+        return self.sentence_count / self.elapsed_time if self.elapsed_time > 0 else 0.0
+
+
+def resolve_corpus_paths(path_or_pattern: str) -> List[str]:
+    # a directory is walked for text files, anything else is treated as a glob
+    if os.path.isdir(path_or_pattern):
+        paths = []
+        for root, _, files in os.walk(path_or_pattern):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(CORPUS_FILE_EXTENSIONS))
+    else:
+        paths = [p for p in glob.glob(path_or_pattern, recursive=True) if os.path.isfile(p)]
+
+    return sorted(paths)
+
+
+def corpus_root(paths: List[str]) -> str:
+    # the deepest folder holding every document, sources are relative to it
+    if len(paths) == 0:
+        return ""
+    return os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+
+
+def document_source(path: str, root: str) -> str:
+    # always with forward slashes, the source ends up in exports and shouldn't depend on the platform
+    return os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/")
+
+
+class CorpusService(object):
+    def __init__(self, pipeline_manager: PipelineManagerService, workers: int = DEFAULT_CORPUS_WORKERS):
+        self.pipeline_manager = pipeline_manager
+        self.workers = max(1, workers)
+
+    def run(self, paths: List[str], parser_name: str, parser_settings: Optional[ParserSettings] = None) -> CorpusResult:
+        start_time = time.perf_counter()
+
+        # loaded once up front, otherwise every worker thread waits on the same model load
+        self.pipeline_manager.parser_service.get_parser(parser_name)
+
+        root = corpus_root(paths)
+        results: List[DocumentResult] = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="t2t-corpus") as executor:
+            futures = {executor.submit(self.parse_document, path, document_source(path, root), parser_name, parser_settings): path for path in paths}
+            for i, future in enumerate(as_completed(futures)):
+                result = future.result()
+                results.append(result)
+                log_info("Corpus %s/%d %s %s", i + 1, len(paths), result.source, "failed" if result.error else "done")
+
+        # back to the given order, so the merge (and its ties) don't depend on which thread finished first
+        order = {path: i for i, path in enumerate(paths)}
+        results.sort(key=lambda r: order[r.path])
+
+        merged_output = self.merge_outputs(results, parser_name)
+        elapsed_time = time.perf_counter() - start_time
+        merged_output.elapsed_time = elapsed_time
+
+        corpus_result = CorpusResult(results, merged_output, elapsed_time)
+        log_decorated("Corpus of %d documents parsed in %.2fs, %.2f docs/s, %.1f sentences/s",
+                      len(paths), elapsed_time, corpus_result.documents_per_second(), corpus_result.sentences_per_second())
+        return corpus_result
+
+    def parse_document(self, path: str, source: str, parser_name: str, parser_settings: Optional[ParserSettings] = None) -> DocumentResult:
+        try:
+            parser_input = ParserInput.from_chunks(iter_file_chunks(path))
+            output = self.pipeline_manager.run_pipeline_parser_output(parser_input, parser_name, parser_settings)
+
+            # the parsers count sentences while splitting them, plugin parsers might not say
+            sentence_count = output.sentence_count
+            if sentence_count is None:
+                sentence_count = sum(1 for _ in parser_input.iter_sentences())
+        except Exception as e:
+            # one unreadable file shouldn't take the rest of the corpus with it
+            log_error("Corpus document %s failed: %s", path, e)
+            return DocumentResult(path, source, None, 0, str(e))
+
+        result = DocumentResult(path, source, output, sentence_count)
+        for entity in self.all_entities(output):
+            entity.source = result.source
+        return result
+
+    def merge_outputs(self, results: List[DocumentResult], parser_name: str) -> ParserOutput:
+        # every document is already sorted, merging keeps them in document and then text order within a year
+        merged_output = ParserOutput.merge([r.output for r in results if r.output is not None], contains_no_year_temporals=True)
+        merged_output.parser_name = parser_name
+        return merged_output
+
+    def all_entities(self, output: ParserOutput) -> List[TemporalEntity]:
+        return list(output.content) + list(getattr(output, "content_no_years", []))
@@ -0,0 +1,74 @@
+import threading
+import time
+from enum import Enum
+from typing import Dict, List
+
+from ..commons.t2t_logging import log_decorated, log_error
+from ..commons.utils import get_resident_memory_bytes
+from .parserservice import ParserService
+
+'''
+Loads the configured parsers in background threads at startup so the first request for a model
+doesn't pay for SequenceTagger.load/load_predictor behind the load balancer timeout.
+Each model also runs one warm up inference, same as confirm_parsers_loaded.
+
+Memory per model is the RSS difference around its load, with several models loading at once
+the numbers overlap, the total process RSS is reported as well for that reason
+'''
+
+class ModelLoadState(Enum):
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ModelPreloader():
+    def __init__(self, parser_service: ParserService) -> None:
+        self._parser_service = parser_service
+        self._status: Dict[str, dict] = {}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def start(self, parser_names: List[str]) -> None:
+        available = self._parser_service.get_parser_names()
+
+        for parser_name in parser_names:
+            if parser_name not in available:
+                log_error("Cannot preload %s, no such parser", parser_name)
+                continue
+
+            self._set_status(parser_name, state=ModelLoadState.PENDING.value, load_seconds=None, memory_bytes=None, error=None)
+            thread = threading.Thread(target=self._load, args=(parser_name,), name=f"preload-{parser_name}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _load(self, parser_name: str) -> None:
+        self._set_status(parser_name, state=ModelLoadState.LOADING.value)
+        memory_before = get_resident_memory_bytes()
+        start_time = time.perf_counter()
+
+        try:
+            self._parser_service.get_parser(parser_name)
+            self._parser_service.warm_up_parser(parser_name)
+        except Exception as e:
+            log_error("Preloading %s failed: %s", parser_name, e)
+            self._set_status(parser_name, state=ModelLoadState.FAILED.value, error=str(e))
+            return
+
+        load_seconds = time.perf_counter() - start_time
+        self._set_status(parser_name, state=ModelLoadState.READY.value, load_seconds=load_seconds,
+                         memory_bytes=get_resident_memory_bytes() - memory_before)
+        log_decorated("PRELOADED %s in %.2fs", parser_name, load_seconds)
+
+    def _set_status(self, parser_name: str, **fields) -> None:
+        with self._lock:
+            self._status.setdefault(parser_name, {}).update(fields)
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(s["state"] == ModelLoadState.READY.value for s in self._status.values())
+
+    def status(self) -> Dict[str, dict]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._status.items()}
@@ -3,10 +3,9 @@ from backend.commons.parser_commons import ParserInput, ParserOutput
 from backend.commons.temporal import TemporalEntity
 from backend.flask.models.app_templated_models import Render, RenderPlacement, ResultPageModel
 from backend.services.parserservice import ParserService
+from backend.services.t2t_persistence import PersistenceService
 from backend.commons.t2t_logging import log_info
-from typing import List
-
-from backend.renderers.extras import parser_comparison_year_vs_no_year_grouped_bar_chart, parser_comparison_average_event_lengths, parser_comparison_execution_time
+from typing import List, Optional
 
 
 class HtmlBuilder:
@@ -25,8 +24,9 @@ class HtmlBuilder:
 class ParserComparisonService:
     
     
-    def __init__(self, parser_service: ParserService):
+    def __init__(self, parser_service: ParserService, persistence_service: Optional[PersistenceService] = None):
         self._parser_service = parser_service
+        self._persistence_service = persistence_service
         self._raw_input = None
         self.parser_instances = {}
         self.parser_outputs :dict[str, ParserOutput] = {}
@@ -53,8 +53,21 @@ class ParserComparisonService:
             # recreating this every time for service interopability
             # just in case state altering methods are used at some point
             self._parser_input = ParserInput(self._raw_input) 
-            output : ParserOutput = self._parser_service.parse_with_selected(self._parser_input, parser_name)
-            self.parser_outputs[parser_name] = output
+            self.parser_outputs[parser_name] = self._parse_or_load(parser_name)
+
+    def _parse_or_load(self, parser_name: str) -> ParserOutput:
+        if self._persistence_service is None:
+            return self._parser_service.parse_with_selected(self._parser_input, parser_name)
+
+        # no plugins run when comparing
+        key = PersistenceService.build_key(self._parser_input.content_hash(), parser_name, self._parser_service._parser_settings, []) # type: ignore
+        output = self._persistence_service.get_output(key)
+
+        if output is None:
+            output = self._parser_service.parse_with_selected(self._parser_input, parser_name)
+            self._persistence_service.save_output(key, output)
+
+        return output
 
 
     def parse_and_compare(self, parser_names: List[str], common_input: str):
@@ -77,6 +90,9 @@ class ParserComparisonService:
 
 
     def build_result_page_model(self) -> ResultPageModel:
+        # seaborn and matplotlib, imported once there is something to draw
+        from backend.renderers.extras import parser_comparison_year_vs_no_year_grouped_bar_chart, parser_comparison_average_event_lengths, parser_comparison_execution_time
+
         result_page = ResultPageModel(use_pagination=False)
         p_outputs = list(self.parser_outputs.values())
         
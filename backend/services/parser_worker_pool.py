@@ -0,0 +1,100 @@
+import gc
+import multiprocessing
+import os
+import sys
+import time
+from typing import List, Optional
+
+from ..commons.parser_commons import ParserInput, ParserOutput, ParserSettings
+from ..commons.t2t_logging import log_decorated, log_error
+
+'''
+Process pool execution mode for ParserService.
+
+The models are loaded once in the main process and the workers are forked afterwards, so the weights are
+shared copy-on-write instead of every worker loading its own copy. Extraction (the python heavy part after
+the model call) then runs in parallel without fighting over the GIL.
+
+Only works where fork exists (linux, mac), start it before serving requests, forking a process that
+already has request threads running is asking for trouble. The same goes for the thread pools of OpenMP/MKL,
+they aren't fork safe, so the main process is limited to one thread for those before the models are loaded
+and warmed up, which also means pooled models shouldn't be parsed with in the main process.
+'''
+
+# read by OpenMP, MKL and OpenBLAS when they're first loaded, the models aren't imported before the pool starts
+_THREAD_ENVIRONMENT_VARIABLES = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]
+
+# set right before forking, every worker inherits it together with the loaded models
+_worker_parser_service = None
+
+
+def _limit_threads() -> None:
+    # N workers each using every core for torch ops is slower than N workers with one thread each,
+    # and a single thread never starts the native thread pools a fork would copy in a broken state
+    for variable in _THREAD_ENVIRONMENT_VARIABLES:
+        os.environ.setdefault(variable, "1")
+
+    # only if something already imported it, importing torch just for this would load it for spaCy only pools
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(1)
+
+
+def _init_worker() -> None:
+    _limit_threads()
+
+
+def _parse_in_worker(content, parser_name: str, parser_settings: Optional[ParserSettings]) -> ParserOutput:
+    start_time = time.perf_counter()
+    output = _worker_parser_service.accept_locally(parser_name, ParserInput(content), parser_settings) # type: ignore
+    output.elapsed_time = time.perf_counter() - start_time
+    return output
+
+
+class ParserWorkerPool(object):
+    def __init__(self, parser_service, worker_count: int, parser_names: List[str]) -> None:
+        global _worker_parser_service
+
+        self.worker_count = worker_count
+        self.parser_names = list(parser_names)
+
+        start_time = time.perf_counter()
+        _limit_threads()
+        for parser_name in self.parser_names:
+            parser_service.get_parser(parser_name)
+            _limit_threads() # loading may have been what imported torch
+            parser_service.warm_up_parser(parser_name)
+        log_decorated("Worker pool models loaded in %.2fs, forking %s workers", time.perf_counter() - start_time, worker_count)
+
+        _worker_parser_service = parser_service
+
+        # objects that exist now are moved out of the gc generations, otherwise the first collection in
+        # every worker touches (and copies) all the pages holding the models
+        gc.freeze()
+
+        context = multiprocessing.get_context("fork")
+        self._pool = context.Pool(worker_count, initializer=_init_worker)
+
+    def handles(self, parser_name: str) -> bool:
+        return parser_name in self.parser_names
+
+    def parse(self, input: ParserInput, parser_name: str, parser_settings: Optional[ParserSettings] = None) -> ParserOutput:
+        return self._pool.apply(_parse_in_worker, (input.get_content(), parser_name, parser_settings))
+
+    def parse_many(self, inputs: List[ParserInput], parser_name: str, parser_settings: Optional[ParserSettings] = None) -> List[ParserOutput]:
+        arguments = [(i.get_content(), parser_name, parser_settings) for i in inputs]
+        return self._pool.starmap(_parse_in_worker, arguments, chunksize=1)
+
+    def shutdown(self) -> None:
+        self._pool.close()
+        self._pool.join()
+        gc.unfreeze()
+
+
+def create_worker_pool(parser_service, worker_count: int, parser_names: List[str]) -> Optional[ParserWorkerPool]:
+    try:
+        return ParserWorkerPool(parser_service, worker_count, parser_names)
+    except ValueError as e:
+        # no fork start method on this platform
+        log_error("Could not start parser worker pool, staying with threads: %s", e)
+        return None
@@ -1,31 +1,53 @@
-from torch.autograd.grad_mode import F
-from backend.commons.parser_commons import ParserInput, ParserOutput, ParserSettings
-from backend.commons.t2t_enums import PluginType
+from typing import Dict, List, Optional, Tuple
+from backend.commons.parser_commons import ParserInput, ParserOutput, ParserSettings, get_tokenizer
+from backend.commons.temporal import TemporalEntity, TemporalEntityType
+from backend.commons.t2t_enums import PluginType, ALLENNLP_PARSER_NAME, CASCADE_PARSER_NAME, FLAIR_PARSER_NAME, SPACY_PARSER_NAME
 from backend.parsers.base import BaseParser
 from ..commons.t2t_logging import log_decorated, log_error, log_info
 
-from ..parsers.allennlp import AllennlpParser, ALLENNLP_PARSER_NAME
-from ..parsers.flairparser import FlairParser, FLAIR_PARSER_NAME
-from ..parsers.spacy import SpacyParser, SPACY_PARSER_NAME
 from . import plugin_service
+from .t2t_sentence_cache import SentenceCache, DEFAULT_SENTENCE_CACHE_PATH, DEFAULT_SENTENCE_CACHE_MAX_ENTRIES
 
+import importlib
 import threading
 import time
 
 
+WARM_UP_TEXT = "The quick brown fox jumped over the lazy brown dog in 1999. Seven seas blow seven windows in text to speech."
+
+# module:class paths, a parser module (and torch/flair/spacy/allennlp behind it) is only imported when that parser gets created
+DEFAULT_PARSER_PATHS = {
+    ALLENNLP_PARSER_NAME: "backend.parsers.allennlp:AllennlpParser",
+    FLAIR_PARSER_NAME: "backend.parsers.flairparser:FlairParser",
+    SPACY_PARSER_NAME: "backend.parsers.spacy:SpacyParser",
+    CASCADE_PARSER_NAME: "backend.parsers.cascade:CascadeParser",
+}
+
+
+def import_parser_class(path: str):
+    module_name, class_name = path.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
 
 class ParserService: # Singleton for now
     _custom_parsers = {}
     _default_paser_loading = {}
     _threads = []
     _parser_settings : ParserSettings = ParserSettings()
+    _sentence_cache : Optional[SentenceCache] = None
+    _worker_pool = None # ParserWorkerPool, see start_worker_pool
 
     _loaded_parsers = {} # only this should have instances, the rest should have lambda class ref
 
+    # one lock per parser name so concurrent first requests wait for a single load instead of each loading a copy
+    _loading_locks: Dict[str, threading.RLock] = {}
+    _loading_locks_guard = threading.Lock()
+
     def __init__(self) -> None:
-        self._default_paser_loading[ALLENNLP_PARSER_NAME] = lambda : AllennlpParser()
-        self._default_paser_loading[FLAIR_PARSER_NAME] = lambda : FlairParser()
-        self._default_paser_loading[SPACY_PARSER_NAME] = lambda : SpacyParser()
+        self._default_paser_loading[ALLENNLP_PARSER_NAME] = lambda : import_parser_class(DEFAULT_PARSER_PATHS[ALLENNLP_PARSER_NAME])()
+        self._default_paser_loading[FLAIR_PARSER_NAME] = lambda : import_parser_class(DEFAULT_PARSER_PATHS[FLAIR_PARSER_NAME])()
+        self._default_paser_loading[SPACY_PARSER_NAME] = lambda : import_parser_class(DEFAULT_PARSER_PATHS[SPACY_PARSER_NAME])()
+        self._default_paser_loading[CASCADE_PARSER_NAME] = lambda : import_parser_class(DEFAULT_PARSER_PATHS[CASCADE_PARSER_NAME])(self.get_parser)
 
         self._parser_settings.context_radius = 5
 
@@ -33,21 +55,9 @@ class ParserService: # Singleton for now
 
     def load_default_parsers(self) -> None: # maybe should be called pre-load? you can still lazy load by get by name
         log_decorated(":: Beggining to load parsers")
-        parser1 = AllennlpParser()
-        
-        log_decorated(":: AllenNLP loaded")
-        parser2 = FlairParser()
-        log_decorated(":: Flair loaded")
-        parser3 = SpacyParser()
-        log_decorated(":: Spacy loaded")
-
-        parser1.settings = self._parser_settings
-        parser2.settings = self._parser_settings
-        parser3.settings = self._parser_settings
-
-        self._loaded_parsers[parser1._PARSER_NAME] = parser1
-        self._loaded_parsers[parser2._PARSER_NAME] = parser2
-        self._loaded_parsers[parser3._PARSER_NAME] = parser3
+        for parser_name in [ALLENNLP_PARSER_NAME, FLAIR_PARSER_NAME, SPACY_PARSER_NAME]:
+            self.get_parser(parser_name).settings = self._parser_settings
+            log_decorated(":: %s loaded", parser_name)
 
     def update_parser_settings(self, parser_settings: ParserSettings, parser_name: str) -> None:
         if parser_name == "all":
@@ -82,26 +92,44 @@ class ParserService: # Singleton for now
         return all_parser_names
 
     def get_parser(self, parser_name: str) -> BaseParser:
-        if parser_name not in self._loaded_parsers:
-            log_info(f"{parser_name} not loaded, searching references.")
-            parser_class_ref = self.find_parser(parser_name)
-
-            if parser_class_ref is None:
-                log_error(f"{parser_name} not found in loaded references, an unprecedented error has occurred. Run.")
-                # python 3.9 doesn't support None optional return type, makes you wonder how they released this, let it fail for now
+        if parser_name in self._loaded_parsers:
+            log_info("%s in memory", parser_name)
+            return self._loaded_parsers[parser_name]
+
+        with self.get_loading_lock(parser_name):
+            # whoever held the lock before us has most likely finished this exact load
+            if parser_name in self._loaded_parsers:
+                log_info("%s loaded by another request while waiting", parser_name)
             else:
-                log_decorated(f"LAZY LOADING: {parser_name}")
-                start_time = time.perf_counter()
-                self._loaded_parsers[parser_name] =  parser_class_ref()
-                self._loaded_parsers[parser_name].settings = self._parser_settings
-                elapsed_time = time.perf_counter() - start_time
-
-                log_decorated(f"FINISHED LOADING: {parser_name} in {str(elapsed_time)}")
-        else:
-            log_info(f"{parser_name} in memory")
+                self.load_parser(parser_name)
 
         return self._loaded_parsers[parser_name]
 
+    def get_loading_lock(self, parser_name: str) -> threading.RLock:
+        with self._loading_locks_guard:
+            if parser_name not in self._loading_locks:
+                self._loading_locks[parser_name] = threading.RLock()
+            return self._loading_locks[parser_name]
+
+    def load_parser(self, parser_name: str) -> None:
+        log_info("%s not loaded, searching references.", parser_name)
+        parser_class_ref = self.find_parser(parser_name)
+
+        if parser_class_ref is None:
+            log_error("%s not found in loaded references, an unprecedented error has occurred. Run.", parser_name)
+            # python 3.9 doesn't support None optional return type, makes you wonder how they released this, let it fail for now
+            return
+
+        log_decorated("LAZY LOADING: %s", parser_name)
+        start_time = time.perf_counter()
+        parser = parser_class_ref()
+        parser.settings = self._parser_settings
+        # only published once fully set up, readers outside the lock never see a half initialized parser
+        self._loaded_parsers[parser_name] = parser
+        elapsed_time = time.perf_counter() - start_time
+
+        log_decorated("FINISHED LOADING: %s in %s", parser_name, elapsed_time)
+
 
     def find_parser(self, parser_name):
         if parser_name in self._default_paser_loading:
@@ -112,30 +140,201 @@ class ParserService: # Singleton for now
 
         return None
 
-    def parse_with_selected(self, input: ParserInput, selected_parser: str) -> ParserOutput:
+    def parse_with_selected(self, input: ParserInput, selected_parser: str, parser_settings: Optional[ParserSettings] = None) -> ParserOutput:
+        '''
+            parser_settings only apply to this call, leaving it out uses the service wide settings
+        '''
         start_time = time.perf_counter()
 
-        log_info(f"Beginning to parse")
-        output: ParserOutput =  self.get_parser(selected_parser).accept(input)
+        log_info("Beginning to parse")
+        if self._sentence_cache is not None:
+            output: ParserOutput = self.parse_with_sentence_cache(input, selected_parser, parser_settings)
+        else:
+            output: ParserOutput = self.accept_with_settings(selected_parser, input, parser_settings)
         output.elapsed_time = time.perf_counter() - start_time
         # currently all default parsers do this, but this more rigid support for plugin parsers
         output.parser_name = selected_parser 
 
-        log_decorated("Parsing with " + str(output.parser_name) + " took " + str(output.elapsed_time))
+        log_decorated("Parsing with %s took %s", output.parser_name, output.elapsed_time)
 
         return output
 
 
+    def start_worker_pool(self, worker_count: int, parser_names: List[str]) -> bool:
+        '''
+            Loads the given parsers here and forks worker_count processes that share them,
+            parsing with those parsers is dispatched to the workers from then on. Returns False
+            when the platform can't fork, parsing stays on the calling threads in that case
+        '''
+        from .parser_worker_pool import create_worker_pool
+
+        ParserService._worker_pool = create_worker_pool(self, worker_count, parser_names)
+        return self._worker_pool is not None
+
+    def stop_worker_pool(self) -> None:
+        if self._worker_pool is not None:
+            self._worker_pool.shutdown()
+            ParserService._worker_pool = None
+
+    def enable_sentence_cache(self, db_path: str = DEFAULT_SENTENCE_CACHE_PATH, max_entries: int = DEFAULT_SENTENCE_CACHE_MAX_ENTRIES) -> None:
+        ParserService._sentence_cache = SentenceCache(db_path, max_entries)
+
+    @property
+    def sentence_cache_enabled(self) -> bool:
+        return self._sentence_cache is not None
+
+    def get_sentence_cache_stats(self) -> dict:
+        if self._sentence_cache is None:
+            return {}
+        return self._sentence_cache.stats()
+
+    def accept_with_settings(self, parser_name: str, input: ParserInput, parser_settings: Optional[ParserSettings] = None) -> ParserOutput:
+        if self._worker_pool is not None and self._worker_pool.handles(parser_name):
+            return self._worker_pool.parse(input, parser_name, parser_settings)
+
+        return self.accept_locally(parser_name, input, parser_settings)
+
+    def accept_locally(self, parser_name: str, input: ParserInput, parser_settings: Optional[ParserSettings] = None) -> ParserOutput:
+        parser = self.get_parser(parser_name)
+
+        # plugin parsers only have to implement accept(input), they always run with the settings they were given
+        if parser_settings is None or self.is_custom_parser(parser_name):
+            return parser.accept(input)
+
+        return parser.accept(input, settings=parser_settings) # type: ignore
+
+    def parse_with_sentence_cache(self, input: ParserInput, selected_parser: str, parser_settings: Optional[ParserSettings] = None) -> ParserOutput:
+        '''
+            Only sentences that aren't cached go to the model, joined into one smaller document.
+            The parser's entities are matched back to their sentence by text and cached per sentence,
+            then the output is rebuilt in document order with order, year carry-over and context recalculated
+            over the full sentence list the way the parser does it, so hits and misses look like an uncached parse
+        '''
+        cache: SentenceCache = self._sentence_cache # type: ignore
+        parser = self.get_parser(selected_parser)
+        model_id = getattr(parser, "_MODEL_NAME", "")
+
+        profile = (parser_settings or parser.settings).profile.value
+        sentences: List[str] = get_tokenizer().tokenize(input.get_content()) # type: ignore
+        keys = [SentenceCache.build_key(selected_parser, model_id, profile, s) for s in sentences]
+        cached = cache.get_many(keys)
+
+        spans_per_sentence: Dict[int, List[dict]] = {i: cached[k] for i, k in enumerate(keys) if k in cached}
+        unmatched: List[Tuple[int, TemporalEntity, int]] = []
+        misses = [i for i, k in enumerate(keys) if k not in cached]
+
+        if len(misses) > 0:
+            inference_start = time.perf_counter()
+            miss_output = self.accept_with_settings(selected_parser, ParserInput(" ".join(sentences[i] for i in misses)), parser_settings)
+            cache.record_inference(len(misses), time.perf_counter() - inference_start)
+
+            new_spans, unmatched, uncacheable = self.match_entities_to_sentences(miss_output, sentences, misses)
+            spans_per_sentence.update(new_spans)
+            cache.put_many({keys[i]: spans for i, spans in new_spans.items() if i not in uncacheable})
+
+        log_info("Sentence cache: %d hits, %d misses, %s", len(sentences) - len(misses), len(misses), cache.stats())
+
+        context_radius = (parser_settings or parser.settings).context_radius
+        first_order = getattr(parser, "_FIRST_ORDER", 0)
+        entities = self.rebuild_entities(sentences, spans_per_sentence, unmatched, context_radius, first_order)
+        output = ParserOutput(entities, contains_no_year_temporals=True)
+        output.sentence_count = len(sentences)
+        return output
+
+    def match_entities_to_sentences(self, output: ParserOutput, sentences: List[str], sentence_indices: List[int]):
+        all_entities = list(output.content) + list(getattr(output, "content_no_years", []))
+        all_entities.sort(key=lambda e: e.order)
+
+        # parsers tokenize on their own (AllenNLP joins words with spaces), compare without whitespace
+        sentence_keys = {i: "".join(sentences[i].split()) for i in sentence_indices}
+        key_to_index: Dict[str, int] = {}
+        for index, key in sentence_keys.items():
+            key_to_index.setdefault(key, index)
+
+        spans: Dict[int, List[dict]] = {i: [] for i in sentence_indices}
+        unmatched: List[Tuple[int, TemporalEntity, int]] = []
+        uncacheable = set()
+        last_index = sentence_indices[0]
+
+        for position, entity in enumerate(all_entities):
+            entity_key = "".join(entity.event.split())
+            index = key_to_index.get(entity_key)
+            # how far the parser's order moved on after this entity, spaCy counts every DATE/TIME span of a sentence
+            steps = max(1, all_entities[position + 1].order - entity.order) if position + 1 < len(all_entities) else 1
+
+            if index is not None:
+                spans[index].append({"event": entity.event, "date": entity.date, "year": entity.year, "type": entity.entity_type.name, "steps": steps})
+                last_index = index
+                continue
+
+            # the parser split or merged sentences differently, keep the entity but don't cache the sentences involved
+            overlapping = [i for i, k in sentence_keys.items() if k in entity_key or entity_key in k]
+            uncacheable.update(overlapping)
+            entity.sentence_index = overlapping[0] if overlapping else -1 # the parser's index is one in the misses only
+            unmatched.append((overlapping[0] if overlapping else last_index, entity, steps))
+
+        return spans, unmatched, uncacheable
+
+    def rebuild_entities(self, sentences: List[str], spans_per_sentence: Dict[int, List[dict]], unmatched: List[Tuple[int, TemporalEntity, int]],
+                         context_radius: int, first_order: int = 0) -> List[TemporalEntity]:
+        '''
+            Numbered from the parser's first order on, moving on by the steps the parser took after each entity.
+            Context is built like the parsers build it, nearest sentence first, every sentence followed by a space
+        '''
+        located: List[Tuple[int, TemporalEntity, int]] = []
+
+        for index, spans in spans_per_sentence.items():
+            for span in spans:
+                entity = TemporalEntity(event=span["event"], date=span["date"], year=span["year"], entity_type=TemporalEntityType[span["type"]],
+                                        sentence_index=index)
+                located.append((index, entity, span.get("steps", 1))) # rows cached before steps were recorded
+
+        located.extend(unmatched)
+        located.sort(key=lambda x: x[0]) # stable, keeps the parser's order within a sentence
+
+        entities: List[TemporalEntity] = []
+        processed_events = set() # same as the parsers, a repeated sentence only shows up once
+        last_valid_year = ""
+        order = first_order
+
+        for index, entity, steps in located:
+            if entity.event in processed_events:
+                continue
+            processed_events.add(entity.event)
+
+            entity.order = order
+            order += steps
+            if entity.entity_type == TemporalEntityType.NO_YEAR:
+                entity._year_before = last_valid_year
+            else:
+                last_valid_year = entity.year
+
+            entity.context_before = ""
+            entity.context_after = ""
+            for x in range(1, context_radius + 1):
+                if (index - x) >= 0:
+                    entity.context_before += sentences[index - x] + " "
+                if (index + x) < len(sentences):
+                    entity.context_after += sentences[index + x] + " "
+
+            entities.append(entity)
+
+        return entities
+
+    def warm_up_parser(self, parser_name: str) -> ParserOutput:
+        # first inference on a fresh model is noticeably slower (lazy allocations, torch kernels), pay it up front
+        return self.get_parser(parser_name).accept(ParserInput(WARM_UP_TEXT))
+
     def confirm_parsers_loaded(self):
         start_time = time.perf_counter()
         outputs: list[ParserOutput] = []
         for parser in self._loaded_parsers.values():
-            outputs.append(parser.accept(ParserInput("The quick brown fox jumped over the lazy brown dog in 1999. Seven seas blow seven windows in text to speech.")))
+            outputs.append(parser.accept(ParserInput(WARM_UP_TEXT)))
 
         for o in outputs:
             print(o)
 
-        log_decorated("PARSER CONFIRMATION COMPLETED IN " + str(time.perf_counter() - start_time))
+        log_decorated("PARSER CONFIRMATION COMPLETED IN %s", time.perf_counter() - start_time)
 
     # custom parsers are not expected to implement batching
     # especially since it didn't prove to be much of a performance improvement
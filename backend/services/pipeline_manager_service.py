@@ -1,12 +1,16 @@
-from typing import Dict, Union
-from backend.commons.parser_commons import ParserInput, ParserOutput
+from typing import Callable, Dict, Iterator, Optional, Tuple, Union
+from backend.commons.parser_commons import ParserInput, ParserOutput, ParserSettings
 from backend.commons import t2t_logging
-from backend.commons.t2t_enums import PluginType, RendererPaginationSetting
+from backend.commons.t2t_metrics import PIPELINE_RUNS_METRIC, StageTimings
+from backend.commons.t2t_enums import PipelineStage, PluginType, RendererPaginationSetting
+from backend.commons.temporal_prefilter import PrefilterResult, TemporalPrefilter
 from backend.flask.models.app_templated_models import PluginInformationModel, Render, RenderPlacement, ResultPageModel
 from backend.flask.services.result_builder import ResultBuilder
 from backend.services.parserservice import ParserService
 from backend.services import plugin_service
 from backend.services.renderservice import RendererService
+from backend.services.t2t_persistence import PersistenceService
+from backend.services.batch_parsing import BatchParser, DEFAULT_BATCH_OVERLAP_SENTENCES
 from typing import List
 import time
 
@@ -17,13 +21,24 @@ Will manage parser service, settings and plugins execution order
 PROCESSOR_EXECUTION_ORDER_FIELD_NAME = "processor_order"
 PLUGIN_DESCRIPTION_FIELD_NAME = "plugin_description"
 
+DEFAULT_STREAM_CHUNK_LENGTH = 5000
+STREAM_EVENT_CHUNK = "chunk"
+STREAM_EVENT_RESULT = "result"
+
 class PipelineManagerService:
     
-    def __init__(self) -> None: 
+    def __init__(self, use_temporal_prefilter: bool = False, persistence_service: Optional[PersistenceService] = None,
+                 batch_chunk_length: int = 0, batch_overlap_sentences: int = DEFAULT_BATCH_OVERLAP_SENTENCES) -> None: 
         # honestly I might just give up on the singleton parser service, here is a good place to swap it out
         # this is too many workarounds already, loading times will increase though
 
         self.parser_service = ParserService()
+        self.use_temporal_prefilter = use_temporal_prefilter
+        self.persistence_service = persistence_service
+
+        # above 0 documents are parsed in chunks of about this many characters, see batch_parsing
+        self.batch_chunk_length = batch_chunk_length
+        self.batch_overlap_sentences = batch_overlap_sentences
 
         self._pre_processors = {}
         self._post_processors = {}
@@ -44,50 +59,213 @@ class PipelineManagerService:
 
         return None
 
-    def run_pipeline_parser_output(self, parser_input, parser_name) -> ParserOutput:
+    '''
+    disabled_keys overrides self._disabled_keys for a single run, background jobs use it so two
+    requests with different plugin selections don't overwrite each other's on the shared manager.
+    on_stage gets called with the name of every stage as it starts.
+    Every step is timed into stage_timings (a new one unless given), the timings end up on the output
+    '''
+    def run_pipeline_parser_output(self, parser_input, parser_name, parser_settings: Optional[ParserSettings] = None,
+                                   disabled_keys: Optional[List[str]] = None, on_stage: Optional[Callable[[str], None]] = None,
+                                   stage_timings: Optional[StageTimings] = None) -> ParserOutput:
         if isinstance(parser_input, ParserInput) == False:
             parser_input = ParserInput(parser_input)
 
-        # Pre Processors
-        pre_processors = self.build_processor_execution_order_list(self._pre_processors)
+        disabled_keys = self._disabled_keys if disabled_keys is None else disabled_keys
+        on_stage = on_stage or (lambda stage: None)
+        stage_timings = stage_timings or StageTimings()
+
+        persistence_key = None
+        if self.persistence_service is not None:
+            with stage_timings.measure("cache", "lookup"):
+                persistence_key = self.build_persistence_key(parser_input, parser_name, parser_settings, disabled_keys)
+                cached_output = self.persistence_service.get_output(persistence_key)
+            if cached_output is not None:
+                stage_timings.registry.increment(PIPELINE_RUNS_METRIC, {"parser": parser_name, "cached": "true"})
+                cached_output.stage_timings = stage_timings
+                return cached_output
+
+        on_stage(PipelineStage.PRE_PROCESSING.value)
+        parser_input, prefilter_result = self.run_pre_processors(parser_input, parser_settings, disabled_keys, stage_timings)
+
+        on_stage(PipelineStage.PARSING.value)
+        with stage_timings.measure(PipelineStage.PARSING.value, parser_name):
+            if self.batch_chunk_length > 0:
+                batch_parser = BatchParser(self.parser_service, self.batch_chunk_length, self.batch_overlap_sentences)
+                parser_output = batch_parser.parse(parser_input, parser_name, parser_settings)
+            else:
+                parser_output = self.parser_service.parse_with_selected(parser_input, parser_name, parser_settings)
+
+        if prefilter_result is not None:
+            entities = list(parser_output.content) + list(getattr(parser_output, "content_no_years", []))
+            entities.sort(key=lambda e: e.order)
+            prefilter_result.restore(entities, self.context_radius(parser_settings))
+            parser_output.invalidate_caches()
+            parser_output.skipped_sentences = prefilter_result.skipped_sentences
+            parser_output.sentence_count = prefilter_result.total_sentences
+
+        on_stage(PipelineStage.POST_PROCESSING.value)
+        parser_output = self.run_post_processors(parser_output, disabled_keys, stage_timings)
+
+        if persistence_key is not None:
+            self.persistence_service.save_output(persistence_key, parser_output) # type: ignore
+
+        # after saving, a cache hit gets the timings of its own run
+        stage_timings.registry.increment(PIPELINE_RUNS_METRIC, {"parser": parser_name, "cached": "false"})
+        parser_output.stage_timings = stage_timings
+        return parser_output
+
+    def run_pre_processors(self, parser_input: ParserInput, parser_settings: Optional[ParserSettings], disabled_keys: List[str],
+                           stage_timings: Optional[StageTimings] = None) -> Tuple[ParserInput, Optional[PrefilterResult]]:
+        '''
+            The prefilter result comes back when the prefilter ran, entities parsed from its input are in filtered
+            sentence space until they go through PrefilterResult.restore
+        '''
+        stage_timings = stage_timings or StageTimings()
+        names = {id(instance): name for name, instance in self._pre_processors.items()}
+
+        pre_processors = self.build_processor_execution_order_list(self._pre_processors, disabled_keys)
         for pp in pre_processors:
-            temp = pp.process(parser_input)
+            with stage_timings.measure(PipelineStage.PRE_PROCESSING.value, names[id(pp)]):
+                temp = pp.process(parser_input)
 
             if isinstance(temp, ParserInput):
                 parser_input = temp
 
-        parser_output = self.parser_service.parse_with_selected(parser_input, parser_name)
+        prefilter_result = None
+        if self.use_temporal_prefilter:
+            with stage_timings.measure(PipelineStage.PRE_PROCESSING.value, "temporal_prefilter"):
+                prefilter_result = TemporalPrefilter(self.context_radius(parser_settings)).apply(parser_input)
+            parser_input = prefilter_result.parser_input
+
+        return parser_input, prefilter_result
+
+    def context_radius(self, parser_settings: Optional[ParserSettings]) -> int:
+        return (parser_settings or self.parser_service._parser_settings).context_radius
 
-        # Post Processors
+    def run_post_processors(self, parser_output: ParserOutput, disabled_keys: List[str], stage_timings: Optional[StageTimings] = None) -> ParserOutput:
+        stage_timings = stage_timings or StageTimings()
+        names = {id(instance): name for name, instance in self._post_processors.items()}
 
-        post_processors = self.build_processor_execution_order_list(self._post_processors)
+        post_processors = self.build_processor_execution_order_list(self._post_processors, disabled_keys)
         for pp in post_processors:
-            temp = pp.process(parser_output)
+            with stage_timings.measure(PipelineStage.POST_PROCESSING.value, names[id(pp)]):
+                temp = pp.process(parser_output)
 
             if isinstance(temp, ParserOutput):
                 parser_output = temp
 
         return parser_output
 
+    def stream_pipeline(self, parser_input, parser_name, chunk_length: int = DEFAULT_STREAM_CHUNK_LENGTH, parser_settings: Optional[ParserSettings] = None,
+                        disabled_keys: Optional[List[str]] = None) -> Iterator[Tuple[str, object]]:
+        '''
+            Same pipeline as run_pipeline_parser_output, but the document is parsed chunk by chunk and the entities
+            of every chunk are yielded as ("chunk", (index, parsed_characters, total_characters, entities)) as soon as they exist.
+            Chunking is the same as the batch mode, the chunks are appended to a batch mode output, post processors
+            run once it's finalized and the final sorted output comes last as ("result", ParserOutput)
+        '''
+        if isinstance(parser_input, ParserInput) == False:
+            parser_input = ParserInput(parser_input)
 
-    def run_pipeline_result_page_model(self, parser_input, parser_name):
-        parser_output: ParserOutput = self.run_pipeline_parser_output(parser_input, parser_name)
+        disabled_keys = self._disabled_keys if disabled_keys is None else disabled_keys
+        stage_timings = StageTimings()
+
+        persistence_key = None
+        if self.persistence_service is not None:
+            with stage_timings.measure("cache", "lookup"):
+                persistence_key = self.build_persistence_key(parser_input, parser_name, parser_settings, disabled_keys)
+                cached_output = self.persistence_service.get_output(persistence_key)
+            if cached_output is not None:
+                stage_timings.registry.increment(PIPELINE_RUNS_METRIC, {"parser": parser_name, "cached": "true"})
+                cached_output.stage_timings = stage_timings
+                yield STREAM_EVENT_RESULT, cached_output
+                return
+
+        start_time = time.perf_counter()
+        parser_input, prefilter_result = self.run_pre_processors(parser_input, parser_settings, disabled_keys, stage_timings)
+        batch_parser = BatchParser(self.parser_service, chunk_length, self.batch_overlap_sentences)
+        parser_output = ParserOutput([], contains_no_year_temporals=True, batch_mode=True)
+        total_characters = sum(len(chunk) for chunk in parser_input.iter_chunks())
+
+        # timed per chunk, the time the client spends on an event before asking for the next one isn't parsing
+        chunks = batch_parser.parse_in_chunks(parser_input, parser_name, parser_settings)
+        while True:
+            chunk_start = time.perf_counter()
+            chunk = next(chunks, None)
+            stage_timings.record(PipelineStage.PARSING.value, parser_name, time.perf_counter() - chunk_start)
+            if chunk is None:
+                break
+
+            i, parsed_characters, entities = chunk
+            if prefilter_result is not None:
+                # chunks come in document order, the prefilter picks up where the previous one stopped
+                prefilter_result.restore(entities, self.context_radius(parser_settings))
+            parser_output.append_content(ParserOutput(entities, finalizeOnInit=False))
+            yield STREAM_EVENT_CHUNK, (i, parsed_characters, total_characters, entities)
+
+        parser_output.finalize()
+        parser_output.parser_name = parser_name
+        parser_output.skipped_sentences = prefilter_result.skipped_sentences if prefilter_result is not None else 0
+        parser_output.sentence_count = prefilter_result.total_sentences if prefilter_result is not None else batch_parser.sentence_count
+        parser_output.elapsed_time = time.perf_counter() - start_time
+
+        parser_output = self.run_post_processors(parser_output, disabled_keys, stage_timings)
+
+        if persistence_key is not None:
+            self.persistence_service.save_output(persistence_key, parser_output) # type: ignore
+
+        stage_timings.registry.increment(PIPELINE_RUNS_METRIC, {"parser": parser_name, "cached": "false"})
+        parser_output.stage_timings = stage_timings
+        yield STREAM_EVENT_RESULT, parser_output
+
+    def build_persistence_key(self, parser_input: ParserInput, parser_name: str, parser_settings: Optional[ParserSettings] = None,
+                              disabled_keys: Optional[List[str]] = None) -> str:
+        disabled_keys = self._disabled_keys if disabled_keys is None else disabled_keys
+
+        # gallery extras only add renders, the stored output depends on the processors alone
+        enabled_plugins = [k for k in list(self._pre_processors) + list(self._post_processors) if k not in disabled_keys]
+        if self.use_temporal_prefilter:
+            enabled_plugins.append("temporal_prefilter")
+        if self.batch_chunk_length > 0:
+            enabled_plugins.append(f"batch_mode_{self.batch_chunk_length}_{self.batch_overlap_sentences}")
+        if self.parser_service.sentence_cache_enabled:
+            # rebuilt outputs number and split sentences the punkt way, keep them apart from plain parses
+            enabled_plugins.append("sentence_cache")
+
+        return PersistenceService.build_key(parser_input.content_hash(), parser_name, parser_settings or self.parser_service._parser_settings, enabled_plugins)
+
+
+    def run_pipeline_result_page_model(self, parser_input, parser_name, parser_settings: Optional[ParserSettings] = None,
+                                       disabled_keys: Optional[List[str]] = None, on_stage: Optional[Callable[[str], None]] = None):
+        on_stage = on_stage or (lambda stage: None)
+        stage_timings = StageTimings()
+        parser_output: ParserOutput = self.run_pipeline_parser_output(parser_input, parser_name, parser_settings, disabled_keys, on_stage, stage_timings)
 
         result_builder = ResultBuilder(RendererPaginationSetting.PAGES)
-        render_service = RendererService()
+        render_service = RendererService(stage_timings)
 
+        on_stage(PipelineStage.RENDERING.value)
         result_page: ResultPageModel = result_builder.build_no_batching(parser_output, render_service)
         
-        self.append_plugin_gallery_extras(result_page)
+        on_stage(PipelineStage.GALLERY_EXTRAS.value)
+        self.append_plugin_gallery_extras(result_page, disabled_keys, stage_timings)
+
+        result_page.stage_timings = stage_timings
         return result_page
 
 
-    def append_plugin_gallery_extras(self, result_page: ResultPageModel):
+    def append_plugin_gallery_extras(self, result_page: ResultPageModel, disabled_keys: Optional[List[str]] = None,
+                                     stage_timings: Optional[StageTimings] = None):
+        disabled_keys = self._disabled_keys if disabled_keys is None else disabled_keys
+        stage_timings = stage_timings or StageTimings()
+
         for k in self._gallery_extras:
-            if k in self._disabled_keys:
+            if k in disabled_keys:
                 continue
 
-            new_render: Render = self._gallery_extras[k](result_page.output)
+            with stage_timings.measure(PipelineStage.GALLERY_EXTRAS.value, k):
+                new_render: Render = self._gallery_extras[k](result_page.output)
             new_render.placement = RenderPlacement.EXTRAS
             result_page.renders.append(new_render)
 
@@ -105,17 +283,18 @@ class PipelineManagerService:
 
         for key, value in plugin_name_class_map.items():
             storage_map[key] = value()
-            t2t_logging.log_info(f"Loaded {key}")
+            t2t_logging.log_info("Loaded %s", key)
 
-        t2t_logging.log_info(f"Loaded {len(storage_map)} {str(plugin_type.value)} plugins")
+        t2t_logging.log_info("Loaded %d %s plugins", len(storage_map), plugin_type.value)
 
 
-    def build_processor_execution_order_list(self, processor_storage_map: Dict):
+    def build_processor_execution_order_list(self, processor_storage_map: Dict, disabled_keys: Optional[List[str]] = None):
+        disabled_keys = self._disabled_keys if disabled_keys is None else disabled_keys
         ordered_processors = []
         unordered_processors = []
 
         for k in processor_storage_map:
-            if k in self._disabled_keys: #i'd like this to be more generic but kinda tired TODO
+            if k in disabled_keys: #i'd like this to be more generic but kinda tired TODO
                 continue
 
             instance = processor_storage_map[k]
@@ -174,7 +353,7 @@ def log_execution_time(function): # ok currently not injecting
         result = function(*args, **kwargs)  
         end_time = time.time()  
         execution_time = end_time - start_time  
-        t2t_logging.log_info(f"Execution time of {function.__name__}: {execution_time:.4f} seconds")
+        t2t_logging.log_info("Execution time of %s: %.4f seconds", function.__name__, execution_time)
         return result
     return wrapper
 
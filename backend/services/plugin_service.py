@@ -3,8 +3,6 @@ import inspect
 import os
 import sys
 
-from matplotlib.pyplot import cla
-
 from ..commons.t2t_enums import PluginType
 from ..commons.t2t_logging import log_decorated, log_error, log_info
 from ..parsers.base import BaseParser
@@ -19,7 +17,7 @@ def load_plugins(plugin_type: PluginType): # path generated from root/plugins +
     plugins = {}
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
     plugin_dir = os.path.join(project_root, "plugins", str(plugin_type.value))
-    log_info(f"Scanning {plugin_dir} for {str(plugin_type.value)} plugins.")
+    log_info("Scanning %s for %s plugins.", plugin_dir, plugin_type.value)
 
     if CREATE_PLUGIN_DIRECTORY_IF_NOT_EXISTS:
         create_if_not_exists(os.path.normpath(plugin_dir))
@@ -30,10 +28,10 @@ def load_plugins(plugin_type: PluginType): # path generated from root/plugins +
                 plugin_name = filename[:-3]  # .py from filename
                 module_name = f"plugins.{str(plugin_type.value)}.{plugin_name}"
 
-                log_info(f"Attemping to import module {module_name}")
+                log_info("Attemping to import module %s", module_name)
 
                 plugin_module = importlib.import_module(module_name)
-                log_info(f"Verifying {plugin_module}")
+                log_info("Verifying %s", plugin_module)
                 plugin_class = find_class(plugin_module, plugin_type)
 
                 if plugin_class:
@@ -42,8 +40,8 @@ def load_plugins(plugin_type: PluginType): # path generated from root/plugins +
                 else:
                     print(f"Warning: No designated class found in plugin '{plugin_name}'.")
     except ImportError as e:
-        log_error(f"Error while loading module {e}")
-        log_error(f"This is very likely but not mandatorily your plugins imports fault, use direct imports not dots.")
+        log_error("Error while loading module %s", e)
+        log_error("This is very likely but not mandatorily your plugins imports fault, use direct imports not dots.")
     except Exception as e:
         print(f"An error occurred while loading plugin {e}")
 
@@ -69,7 +67,7 @@ def find_class(module_name, plugin_type: PluginType):
                 if is_valid_pre_or_post_processor(obj):
                     return obj
                 
-            log_error(f"{name} plugin did not pass validation for {str(plugin_type.value)}")
+            log_error("%s plugin did not pass validation for %s", name, plugin_type.value)
         else:
             #log_error(f"Your classname:{name} does not match expected class name: {expected_class_name}")
             pass
@@ -82,7 +80,7 @@ def find_class(module_name, plugin_type: PluginType):
 def create_if_not_exists(dir):
     directory = dir  
     if not os.path.exists(directory):
-        log_info(f"{dir} not found, creating directory")
+        log_info("%s not found, creating directory", dir)
         os.makedirs(directory) 
 
 
@@ -1,13 +1,12 @@
 from io import BytesIO
 import re
 
-from typing import List, Callable, Type
+from typing import List, Callable, Optional, Type
 from backend.commons.parser_commons import ParserInput, ParserOutput, ParserSettings
-from backend.commons.t2t_enums import DEFAULT_RENDERER_MPL, DEFAULT_RENDERER_PLOTLY, RendererPaginationSetting
+from backend.commons.t2t_enums import DEFAULT_RENDERER_MPL, DEFAULT_RENDERER_PLOTLY, PipelineStage, RendererPaginationSetting
+from backend.commons.t2t_metrics import StageTimings
 from backend.flask.models.app_templated_models import Render
 from backend.renderers.base_renderer import BaseRenderer, RendererOutputType, RendererSettings
-from backend.renderers.mpl import MPLRenderer
-from backend.renderers.plotly import PlotlyRenderer
 
 from ..commons.t2t_logging import log_info
 
@@ -17,24 +16,32 @@ import base64
 class RendererService():
     renderers = {}
 
-    def __init__(self) -> None:
+    def __init__(self, stage_timings: Optional[StageTimings] = None) -> None:
+        # every render is timed into these, the pipeline manager passes the timings of its run
+        self.stage_timings = stage_timings or StageTimings()
+
         self.renderers[DEFAULT_RENDERER_MPL] = lambda : self.create_mpl_renderer()
         self.renderers[DEFAULT_RENDERER_PLOTLY] = lambda : self.create_plotly_renderer()
         self.renderers["MPL_INTERACTIVE"] = lambda : self.create_mpl_interactive_renderer()
 
-    def create_plotly_renderer(self) -> PlotlyRenderer:
+    # renderer modules pull in matplotlib/plotly, they're imported when a renderer is first created
+
+    def create_plotly_renderer(self):
+        from backend.renderers.plotly import PlotlyRenderer
         renderer = PlotlyRenderer()
         renderer.output_type = RendererOutputType.EMBEDDED
         renderer.settings = self.create_renderer_settings(renderer._RENDERER_NAME)
         return renderer
 
-    def create_mpl_renderer(self) -> MPLRenderer:
+    def create_mpl_renderer(self):
+        from backend.renderers.mpl import MPLRenderer
         renderer = MPLRenderer()
         renderer.output_type = RendererOutputType.EXPORT_IMAGE_BYTES
         renderer.settings = self.create_renderer_settings(renderer._RENDERER_NAME)
         return renderer
 
-    def create_mpl_interactive_renderer(self) -> MPLRenderer:
+    def create_mpl_interactive_renderer(self):
+        from backend.renderers.mpl import MPLRenderer
         renderer = MPLRenderer()
         renderer.output_type = RendererOutputType.EXPORT_IMAGE_BYTES
         renderer.settings = self.create_renderer_settings(renderer._RENDERER_NAME)
@@ -60,21 +67,23 @@ class RendererService():
     def render_with_selected(self, renderer_selection: str, parser_output : ParserOutput, render_mode=RendererPaginationSetting.PAGES) -> Render:
         start_time = time.perf_counter()
         
-        log_info(f"Begining to render with {renderer_selection}")
-        renderer : BaseRenderer = self.get_renderer(renderer_selection)
-        log_info(f"Initialized renderer {renderer_selection} in {str(time.perf_counter() - start_time)}")
-        renderer.accept(parser_output, render_mode)
-        log_info(f"{renderer_selection} accept method finished in  {str(time.perf_counter() - start_time)}")
-        output = self.handle_output(renderer)
-        log_info(f"Render service output handling finished in {str(time.perf_counter() - start_time)}")
+        with self.stage_timings.measure(PipelineStage.RENDERING.value, renderer_selection):
+            log_info("Begining to render with %s", renderer_selection)
+            renderer : BaseRenderer = self.get_renderer(renderer_selection)
+            log_info("Initialized renderer %s in %s", renderer_selection, time.perf_counter() - start_time)
+            renderer.accept(parser_output, render_mode)
+            log_info("%s accept method finished in  %s", renderer_selection, time.perf_counter() - start_time)
+            output = self.handle_output(renderer)
+            log_info("Render service output handling finished in %s", time.perf_counter() - start_time)
         return output
 
     def render_with_all(self, parser_output: ParserOutput) -> List[Render]:
         renders: List[Render] = []
         for renderer_name in self.get_renderer_names():
-            instance = self.get_renderer(renderer_name)
-            instance.accept(parser_output)
-            renders.append(self.handle_output(instance))
+            with self.stage_timings.measure(PipelineStage.RENDERING.value, renderer_name):
+                instance = self.get_renderer(renderer_name)
+                instance.accept(parser_output)
+                renders.append(self.handle_output(instance))
 
         return renders
 
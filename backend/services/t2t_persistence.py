@@ -1,12 +1,162 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from ..commons.parser_commons import ParserOutput, ParserSettings
+from ..commons.t2t_logging import log_error, log_info
+
 '''
 Just experimental persistence using a combination if in memory caching and
 maybe some postgresql nosql columns
+
+-- for now it's a document level result cache, an in memory LRU in front of a folder of pickles,
+both bounded by size. Outputs are kept pickled in memory too, so every hit hands out its own copy
+and renderers turning pages (or post processors) can't change what the next request gets
 '''
 
 '''
 Ideally this would then be the only, or one of two, singletons in the entire app
 depending on how final version of keeping loaded models in memory ends up being
 '''
+
+DEFAULT_PERSISTENCE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "cache", "outputs"))
+DEFAULT_MEMORY_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_DISK_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+_FILE_EXTENSION = ".pickle"
+
+
 class PersistenceService():
-    def __init__(self) -> None:
-        pass
\ No newline at end of file
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_PERSISTENCE_PATH, memory_max_bytes: int = DEFAULT_MEMORY_MAX_BYTES, disk_max_bytes: int = DEFAULT_DISK_MAX_BYTES) -> None:
+        self.cache_dir = cache_dir # None keeps everything in memory only
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def build_key(document_hash: str, parser_name: str, parser_settings: ParserSettings, enabled_plugins: Iterable[str]) -> str:
+        # document_hash is ParserInput.content_hash(), chunked inputs get hashed without joining them
+        raw = "\0".join([document_hash, parser_name, parser_settings.cache_key(), ",".join(sorted(enabled_plugins))])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_output(self, key: str) -> Optional[ParserOutput]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+
+        if data is None:
+            data = self.read_from_disk(key)
+            if data is None:
+                self.misses += 1
+                return None
+
+            self.disk_hits += 1
+            self.store_in_memory(key, data)
+
+        log_info("Persistence hit for %s", key[:12])
+        return pickle.loads(data)
+
+    def save_output(self, key: str, output: ParserOutput) -> None:
+        try:
+            data = pickle.dumps(output, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # plugin parsers can put anything in their outputs
+            log_error("Could not persist output for %s: %s", key[:12], e)
+            return
+
+        self.store_in_memory(key, data)
+        self.write_to_disk(key, data)
+
+    def store_in_memory(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_max_bytes:
+            return
+
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key))
+
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+
+            while self._memory_bytes > self.memory_max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def read_from_disk(self, key: str) -> Optional[bytes]:
+        if self.cache_dir is None:
+            return None
+
+        file_path = os.path.join(self.cache_dir, key + _FILE_EXTENSION)
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read()
+            os.utime(file_path) # modification time doubles as last access for the eviction
+            return data
+        except FileNotFoundError:
+            return None
+
+    def write_to_disk(self, key: str, data: bytes) -> None:
+        if self.cache_dir is None:
+            return
+
+        file_path = os.path.join(self.cache_dir, key + _FILE_EXTENSION)
+        temp_path = file_path + ".tmp" + str(threading.get_ident())
+
+        # written under a temporary name first so a concurrent read never sees half a pickle
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, file_path)
+
+        self.evict_from_disk()
+
+    def evict_from_disk(self) -> None:
+        files = []
+        total_bytes = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(_FILE_EXTENSION):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+        for _, size, path in sorted(files):
+            if total_bytes <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+        if self.cache_dir is not None:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(_FILE_EXTENSION):
+                    os.remove(entry.path)
+
+    def stats(self) -> dict:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+        }
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+from ..commons.t2t_logging import log_info
+
+'''
+Content addressed cache of per-sentence parser results, so overlapping documents don't
+send the same sentences through the models again.
+
+Keys are sha256(parser name, model identifier, parser profile, whitespace normalized sentence) and values are the
+list of temporal spans the parser found in that sentence (an empty list is a valid, cached, "nothing here").
+The profile is part of the key because profiles load different pipelines, the rest of the settings only
+change the context, which is rebuilt around the cached spans anyway.
+Stored in SQLite with a last access timestamp, the least recently used rows get evicted past max_entries.
+The row count is kept in memory instead of counted on every put, it's read once when the cache opens, so with
+several processes writing to one file each of them only knows about its own inserts and eviction is approximate.
+'''
+
+DEFAULT_SENTENCE_CACHE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "cache", "sentence_cache.sqlite3"))
+DEFAULT_SENTENCE_CACHE_MAX_ENTRIES = 500000
+
+
+def normalize_sentence(sentence: str) -> str:
+    return " ".join(sentence.split())
+
+
+class SentenceCache(object):
+    def __init__(self, db_path: str = DEFAULT_SENTENCE_CACHE_PATH, max_entries: int = DEFAULT_SENTENCE_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self._inference_seconds = 0.0
+        self._inferred_sentences = 0
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        # one connection shared between request threads, sqlite calls are serialized with the lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS sentence_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS sentence_cache_last_access ON sentence_cache (last_access)")
+        self._connection.commit()
+        self._entries = self._connection.execute("SELECT COUNT(*) FROM sentence_cache").fetchone()[0]
+
+        log_info("Sentence cache at %s with %d entries", db_path, self._entries)
+
+    @staticmethod
+    def build_key(parser_name: str, model_id: str, profile: str, sentence: str) -> str:
+        raw = f"{parser_name}\0{model_id}\0{profile}\0{normalize_sentence(sentence)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[dict]]:
+        unique_keys = list(set(keys))
+        found: Dict[str, List[dict]] = {}
+
+        with self._lock:
+            # sqlite has a limit on bound parameters per statement
+            for i in range(0, len(unique_keys), 500):
+                part = unique_keys[i:i+500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._connection.execute(f"SELECT key, value FROM sentence_cache WHERE key IN ({placeholders})", part).fetchall()
+                for key, value in rows:
+                    found[key] = json.loads(value)
+
+            if found:
+                now = time.time()
+                self._connection.executemany("UPDATE sentence_cache SET last_access = ? WHERE key = ?", [(now, k) for k in found])
+                self._connection.commit()
+
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        return found
+
+    def put_many(self, entries: Dict[str, List[dict]]) -> None:
+        if not entries:
+            return
+
+        now = time.time()
+        with self._lock:
+            # only misses get put, a key that's already there was put by a concurrent request with the same value
+            cursor = self._connection.executemany("INSERT OR IGNORE INTO sentence_cache (key, value, last_access) VALUES (?, ?, ?)",
+                                                  [(k, json.dumps(v), now) for k, v in entries.items()])
+            self._entries += max(0, cursor.rowcount)
+            self.evict()
+            self._connection.commit()
+
+    def evict(self) -> None:
+        # expects the lock to be held
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            cursor = self._connection.execute("DELETE FROM sentence_cache WHERE key IN (SELECT key FROM sentence_cache ORDER BY last_access ASC LIMIT ?)", (overflow,))
+            self._entries -= max(0, cursor.rowcount)
+            log_info("Sentence cache evicted %d entries", overflow)
+
+    def record_inference(self, sentence_count: int, elapsed_seconds: float) -> None:
+        with self._lock:
+            self._inferred_sentences += sentence_count
+            self._inference_seconds += elapsed_seconds
+
+    def estimated_saved_seconds(self) -> float:
+        if self._inferred_sentences == 0:
+            return 0.0
+        return self.hits * (self._inference_seconds / self._inferred_sentences)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+            "entries": len(self),
+            "estimated_saved_seconds": self.estimated_saved_seconds(),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM sentence_cache")
+            self._connection.commit()
+            self._entries = 0
+
+    def __len__(self):
+        return self._entries
@@ -0,0 +1,72 @@
+'''
+End to end time of combining outputs, everything from the first appended entity to the finalized output is timed
+
+    python -m benchmarks.batch_merge [entity count] [batch count]
+
+Batch mode appends unsorted batches and sorts once in finalize. Merging finalized outputs (a corpus) goes
+through ParserOutput.merge, which leaves timsort only the sorted runs to merge, against heapq.merge over
+(key, position, entity) tuples built for the same outputs
+'''
+import heapq
+import random
+import sys
+import time
+
+from backend.commons.parser_commons import ParserOutput
+from backend.commons.temporal import TemporalEntity
+from backend.commons.year_index import year_sort_key
+
+
+def timed(function):
+    start_time = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - start_time) * 1000, result
+
+
+def make_batches(count: int, batch_count: int):
+    random.seed(0)
+    batch_size = count // batch_count
+    return [[TemporalEntity(event=f"Sentence {i} mentioning an event.", date="in the year", year=str(random.randint(1, 2024)).zfill(4), order=i)
+             for i in range(b * batch_size, (b + 1) * batch_size)] for b in range(batch_count)]
+
+
+def batch_mode(batches):
+    output = ParserOutput([], batch_mode=True)
+    for batch in batches:
+        output.append_content(ParserOutput(batch, finalizeOnInit=False))
+    output.finalize()
+    return output.content
+
+
+def heapq_merge(outputs):
+    # the position keeps it stable and stops the tuples from ever comparing two entities
+    runs = []
+    position = 0
+    for output in outputs:
+        runs.append([(year_sort_key(e), position + i, e) for i, e in enumerate(output.content)])
+        position += len(runs[-1])
+    return [e for _, _, e in heapq.merge(*runs)]
+
+
+def run(count: int = 1000000, batch_count: int = 50):
+    batches = make_batches(count, batch_count)
+    print(f"{count} entities in {batch_count} batches")
+
+    batch_time, expected = timed(lambda: batch_mode(batches))
+    print(f"  batch mode, append + finalize    {batch_time:8.1f}ms")
+
+    # already finalized, as the documents of a corpus are by the time they get merged
+    outputs = [ParserOutput(batch) for batch in batches]
+    merge_time, merged = timed(lambda: ParserOutput.merge(outputs, contains_no_year_temporals=False).content)
+    print(f"  ParserOutput.merge               {merge_time:8.1f}ms")
+    heapq_time, heapq_merged = timed(lambda: heapq_merge(outputs))
+    print(f"  heapq.merge over tuples          {heapq_time:8.1f}ms")
+
+    orders = [e.order for e in expected]
+    if [e.order for e in merged] != orders or [e.order for e in heapq_merged] != orders:
+        print("FAILED, merged order differs from the batch mode output")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000, int(sys.argv[2]) if len(sys.argv) > 2 else 50)
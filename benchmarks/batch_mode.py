@@ -0,0 +1,63 @@
+'''
+Peak memory and output of a whole document parse against the batch mode on the same document
+
+    python -m benchmarks.batch_mode [parser_name] [chunk_length] [repeat]
+
+The document is every file in resources/texts joined together, repeated to make it long.
+Each mode runs in a fresh process so the peak RSS of one doesn't hide the other's
+'''
+import multiprocessing
+import resource
+import sys
+import time
+
+from benchmarks.concurrent_parsing import load_documents
+
+
+def parse_in_process(parser_name: str, chunk_length: int, repeat: int, results) -> None:
+    from backend.commons.parser_commons import ParserInput
+    from backend.services.batch_parsing import BatchParser
+    from backend.services.parserservice import ParserService
+
+    document = "".join(load_documents()) * repeat
+    parser_service = ParserService()
+    parser_service.get_parser(parser_name)
+    loaded_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start_time = time.perf_counter()
+    if chunk_length > 0:
+        output = BatchParser(parser_service, chunk_length).parse(ParserInput(document), parser_name)
+    else:
+        output = parser_service.parse_with_selected(ParserInput(document), parser_name)
+    elapsed = time.perf_counter() - start_time
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # kilobytes on linux
+    entities = sorted((e.year, e.event) for e in output.content)
+    results.put((len(document), elapsed, loaded_rss, peak_rss, entities))
+
+
+def run_mode(parser_name: str, chunk_length: int, repeat: int):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=parse_in_process, args=(parser_name, chunk_length, repeat, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def run(parser_name: str = "spaCy", chunk_length: int = 20000, repeat: int = 5):
+    whole = run_mode(parser_name, 0, repeat)
+    batched = run_mode(parser_name, chunk_length, repeat)
+
+    for label, (length, elapsed, loaded_rss, peak_rss, entities) in [("whole", whole), (f"batch {chunk_length}", batched)]:
+        print(f"{label:>12}  {length} chars  {elapsed:.2f}s  parse peak +{(peak_rss - loaded_rss) / 1024:.0f} MiB  {len(entities)} temporals")
+
+    shared = len(set(whole[4]) & set(batched[4]))
+    print(f"{shared}/{len(whole[4])} temporals of the whole document parse found in batch mode")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else "spaCy",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20000,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 5)
@@ -0,0 +1,70 @@
+'''
+Runs one loaded parser from several threads at once and checks the outputs match the sequential run
+
+    python -m benchmarks.concurrent_parsing [parser_name] [max_threads]
+
+Documents are the paragraphs of resources/texts, every thread count parses the same set
+'''
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.commons.parser_commons import ParserInput, ParserSettings
+from backend.services.parserservice import ParserService
+
+TEXTS_DIR = os.path.join(os.path.dirname(__file__), "..", "resources", "texts")
+
+
+def load_documents(min_length: int = 2000):
+    documents = []
+    for root, _, files in os.walk(TEXTS_DIR):
+        for file_name in sorted(files):
+            if not file_name.endswith(".txt"):
+                continue
+            with open(os.path.join(root, file_name), "r", encoding="utf-8") as f:
+                current = ""
+                for paragraph in f.read().split("\n\n"):
+                    current += paragraph + "\n\n"
+                    if len(current) >= min_length:
+                        documents.append(current)
+                        current = ""
+    return documents
+
+
+def output_rows(output):
+    return [(e.order, e.date, e.year, e.event, e.context_before, e.context_after) for e in output.content]
+
+
+def run(parser_name: str = "spaCy", max_threads: int = 8):
+    parser_service = ParserService()
+    parser_service.get_parser(parser_name)
+    documents = load_documents()
+
+    # every other document gets a different context radius, per call settings must not leak between threads
+    settings = [ParserSettings(context_radius=(5 if i % 2 == 0 else 1)) for i in range(len(documents))]
+
+    def parse(i):
+        return output_rows(parser_service.parse_with_selected(ParserInput(documents[i]), parser_name, settings[i]))
+
+    start_time = time.perf_counter()
+    expected = [parse(i) for i in range(len(documents))]
+    sequential = time.perf_counter() - start_time
+    print(f"{len(documents)} documents, sequential {sequential:.2f}s  {len(documents) / sequential:.2f} docs/s")
+
+    threads = 2
+    while threads <= max_threads:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            start_time = time.perf_counter()
+            results = list(executor.map(parse, range(len(documents))))
+            elapsed = time.perf_counter() - start_time
+
+        identical = results == expected
+        print(f"{threads:>3} threads {elapsed:.2f}s  {len(documents) / elapsed:.2f} docs/s  x{sequential / elapsed:.2f}  identical outputs: {identical}")
+        if not identical:
+            sys.exit(1)
+        threads *= 2
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else "spaCy", int(sys.argv[2]) if len(sys.argv) > 2 else 8)
@@ -0,0 +1,125 @@
+'''
+Checks sentence indexes and context of the entities at the edges of the pieces a document gets parsed in
+against the document itself
+
+    python -m benchmarks.context_edges [parser_name] [context_radius]
+
+Prefilter: the filtered text glues runs of kept sentences together, an entity at the edge of a run has to get
+the same context as in a parse of the unfiltered document, and its sentence index has to point at its sentence
+in the original text.
+Batch mode: an entity within the context radius of a chunk edge has to get the same context as in a single
+pass over the document.
+Documents are the paragraphs of resources/texts, fails on the first entity that's wrong
+'''
+import sys
+from collections import Counter
+
+from backend.commons.parser_commons import ParserInput, ParserSettings
+from backend.commons.temporal_prefilter import TemporalPrefilter
+from backend.services.batch_parsing import BatchParser
+from backend.services.parserservice import ParserService
+from benchmarks.concurrent_parsing import load_documents
+
+BATCH_CHUNK_LENGTH = 600 # short chunks, a paragraph has to span a few of them
+
+
+def stripped(text: str) -> str:
+    # parsers differ in the whitespace they keep, AllenNLP rejoins its tokens
+    return "".join(text.split())
+
+
+def all_entities(output):
+    entities = list(output.content) + list(getattr(output, "content_no_years", []))
+    return sorted(entities, key=lambda e: e.order)
+
+
+def check_prefilter(parser_service: ParserService, parser_name: str, settings: ParserSettings, document: str):
+    '''
+        (entities at a run edge, failure message or None)
+    '''
+    radius = settings.context_radius
+    result = TemporalPrefilter(radius).apply(ParserInput(document))
+    entities = all_entities(parser_service.parse_with_selected(result.parser_input, parser_name, settings))
+    result.restore(entities, radius)
+    single = {stripped(e.event): e for e in all_entities(parser_service.parse_with_selected(ParserInput(document), parser_name, settings))}
+    # a repeated sentence can't be told apart by its event, the parsers only keep its first occurrence anyway
+    sentence_counts = Counter(stripped(result.original_sentence(i)) for i in range(result.total_sentences))
+
+    kept = set(result.kept_indices)
+    edges = 0
+
+    for entity in entities:
+        index = entity.sentence_index
+        if index == -1:
+            continue
+        if stripped(entity.event) not in stripped(result.original_sentence(index)):
+            return edges, f"sentence {index} doesn't hold the event {entity.event!r}"
+
+        # a neighbour within the radius wasn't kept, the filtered text has a sentence of another run there
+        at_edge = any(i not in kept for i in range(index - radius, index + radius + 1) if 0 <= i < result.total_sentences)
+        if not at_edge:
+            continue
+        expected = single.get(stripped(entity.event))
+        if expected is None or sentence_counts[stripped(result.original_sentence(index))] > 1:
+            continue
+        edges += 1
+
+        if (stripped(entity.context_before), stripped(entity.context_after)) != (stripped(expected.context_before), stripped(expected.context_after)):
+            return edges, (f"context of sentence {index} differs from the unfiltered parse:\n"
+                           f"  filtered before {entity.context_before!r}\n  single   before {expected.context_before!r}\n"
+                           f"  filtered after  {entity.context_after!r}\n  single   after  {expected.context_after!r}")
+
+    return edges, None
+
+
+def check_batch(parser_service: ParserService, parser_name: str, settings: ParserSettings, document: str):
+    radius = settings.context_radius
+    # no extra overlap, the windows only hold the context radius around their chunk
+    batch_parser = BatchParser(parser_service, BATCH_CHUNK_LENGTH, 0)
+    batched = all_entities(batch_parser.parse(ParserInput(document), parser_name, settings))
+    single = {stripped(e.event): e for e in all_entities(parser_service.parse_with_selected(ParserInput(document), parser_name, settings))}
+
+    # sentence indexes where a chunk starts, batch mode numbers sentences the same way
+    boundaries = []
+    sentence_count = 0
+    for group in batch_parser.group_sentences(ParserInput(document).iter_sentences()):
+        sentence_count += len(group)
+        boundaries.append(sentence_count)
+
+    edges = 0
+    for entity in batched:
+        if not any(b - radius <= entity.sentence_index < b + radius for b in boundaries[:-1]):
+            continue
+        expected = single.get(stripped(entity.event))
+        if expected is None:
+            continue
+        edges += 1
+
+        if (stripped(entity.context_before), stripped(entity.context_after)) != (stripped(expected.context_before), stripped(expected.context_after)):
+            return edges, (f"context of sentence {entity.sentence_index} differs from the single pass:\n"
+                           f"  batched before {entity.context_before!r}\n  single  before {expected.context_before!r}\n"
+                           f"  batched after  {entity.context_after!r}\n  single  after  {expected.context_after!r}")
+
+    return edges, None
+
+
+def run(parser_name: str = "spaCy", context_radius: int = 2):
+    parser_service = ParserService()
+    parser_service.get_parser(parser_name)
+    settings = ParserSettings(context_radius=context_radius)
+
+    for name, check in [("prefilter", check_prefilter), ("batch", check_batch)]:
+        total_edges = 0
+        for i, document in enumerate(load_documents()):
+            edges, failure = check(parser_service, parser_name, settings, document)
+            total_edges += edges
+            if failure is not None:
+                print(f"document {i}, {name}: {failure}")
+                print("FAILED")
+                sys.exit(1)
+
+        print(f"{name}: {total_edges} entities at edges, context and sentence indexes match")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else "spaCy", int(sys.argv[2]) if len(sys.argv) > 2 else 2)
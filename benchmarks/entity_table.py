@@ -0,0 +1,78 @@
+'''
+Aggregations over a synthetic output on the columnar EntityTable against the loops over the entity list
+ParserOutput used for them before
+
+    python -m benchmarks.entity_table [entity count]
+
+Building the table is a single pass over the entities and is timed separately, it's done once per output.
+A list backed ParserOutput doesn't build one to count years, its counts are checked against the table's
+'''
+import random
+import sys
+import time
+from collections import defaultdict
+
+from backend.commons.entity_table import EntityTable
+from backend.commons.parser_commons import ParserOutput
+from backend.commons.temporal import TemporalEntity
+
+
+def list_year_counts(entities):
+    counts = {}
+    for e in entities:
+        counts[e.year] = counts.get(e.year, 0) + 1
+    return counts
+
+
+def list_histogram(entities, group_size):
+    groups = defaultdict(int)
+    for e in entities:
+        groups[(int(e.year) // group_size) * group_size] += 1
+    return sorted(groups.items())
+
+
+def list_between(entities, start_year, end_year):
+    return [e for e in entities if start_year <= int(e.year) <= end_year]
+
+
+def timed(function):
+    start_time = time.perf_counter()
+    function()
+    return (time.perf_counter() - start_time) * 1000
+
+
+def run(count: int = 1000000):
+    random.seed(0)
+    events = [f"Sentence number {i} mentioning an event." for i in range(1000)]
+    entities = [TemporalEntity(event=events[i % 1000], date="in the year", year=str(random.randint(1, 2024)).zfill(4), order=i) for i in range(count)]
+
+    build_time = timed(lambda: EntityTable.from_entities(entities))
+    table = EntityTable.from_entities(entities)
+    print(f"{count} entities, table built in {build_time:.0f}ms, {len(table.pool)} distinct strings")
+
+    cases = [
+        ("count by year", lambda: list_year_counts(entities), table.count_by_year_text),
+        ("histogram", lambda: list_histogram(entities, 100), lambda: table.year_histogram(100)),
+        ("filter years", lambda: list_between(entities, 1500, 1600), lambda: table.between_years(1500, 1600)),
+        ("sort by year", lambda: sorted(entities, key=lambda e: e.year_value), table.sort_by_year),
+    ]
+    for name, list_function, table_function in cases:
+        print(f"  {name:<14} list {timed(list_function):8.1f}ms  table {timed(table_function):8.1f}ms")
+
+    # the default, list backed output never builds a table, it counts the runs of its year index
+    output = ParserOutput(list(entities)) # finalizing sorts it, which builds the year index
+    print(f"  list backed ParserOutput, year_number_map {timed(output.year_number_map):.1f}ms, "
+          f"year_histogram {timed(lambda: output.year_histogram(100)):.1f}ms")
+
+    years, counts = output.year_histogram(100)
+    table_years, table_counts = table.year_histogram(100)
+    if output.year_number_map() != table.count_by_year_text() or list(years) != list(table_years) or list(counts) != list(table_counts):
+        print("FAILED, the output's counts differ from the table's")
+        sys.exit(1)
+    if output.has_current_table():
+        print("FAILED, counting built a table")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,71 @@
+'''
+Per call overhead of the t2t_logging helpers against the inspect.stack based version they replaced
+
+    python -m benchmarks.logging_overhead [iterations]
+
+Measured with the message filtered out (WARNING level, what a quiet deployment runs with) and emitted
+into a handler that drops it, called a few frames deep since inspect.stack cost grows with the stack
+'''
+import inspect
+import logging
+import sys
+import timeit
+
+from backend.commons import t2t_logging
+
+STACK_DEPTH = 20
+
+
+# what log_info did before, copied as-is for comparison
+def legacy_get_caller_name() -> str:
+    frame = inspect.stack()[2]
+    module = inspect.getmodule(frame[0])
+    filename = module.__file__ # type:ignore
+
+    fname = filename.split("\\")[-1] # type:ignore
+    return fname
+
+
+def legacy_log_info(message: str):
+    caller_name = legacy_get_caller_name()
+
+    message = f"{caller_name} -- {message}"
+    logging.info(message)
+
+
+class DroppingHandler(logging.Handler):
+    def emit(self, record):
+        self.format(record) # formatting is part of the cost of an emitted message
+
+
+def nested(depth: int, function):
+    if depth == 0:
+        return function()
+    return nested(depth - 1, function)
+
+
+def time_per_call(function, iterations: int) -> float:
+    total = timeit.timeit(lambda: nested(STACK_DEPTH, function), number=iterations)
+    return total / iterations * 1e6
+
+
+def run(iterations: int = 2000):
+    root = logging.getLogger()
+    root.handlers = [DroppingHandler()]
+    value = 1871
+
+    cases = [
+        ("legacy", lambda: legacy_log_info(f"Parsed year {value}")),
+        ("current, f-string", lambda: t2t_logging.log_info(f"Parsed year {value}")),
+        ("current, lazy args", lambda: t2t_logging.log_info("Parsed year %s", value)),
+    ]
+
+    for level_name, level in (("filtered", logging.WARNING), ("emitted", logging.INFO)):
+        root.setLevel(level)
+        print(f"{level_name}:")
+        for name, function in cases:
+            print(f"  {name:<20} {time_per_call(function, iterations):10.2f} us/call")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
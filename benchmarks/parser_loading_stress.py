@@ -0,0 +1,73 @@
+'''
+Fires concurrent get_parser calls at a parser that isn't loaded yet and checks it only gets constructed once
+
+    python -m benchmarks.parser_loading_stress [threads]
+
+Uses a slow stand-in parser so no model has to be downloaded, the load path is the same one the real parsers take
+'''
+import sys
+import threading
+import time
+
+from backend.commons.parser_commons import ParserInput, ParserOutput, ParserSettings
+from backend.parsers.base import BaseParser
+from backend.services.parserservice import ParserService
+
+STRESS_PARSER_NAME = "stress_test_parser"
+
+
+class SlowParser(BaseParser):
+    constructed = 0
+    _construction_lock = threading.Lock()
+
+    def __init__(self):
+        with SlowParser._construction_lock:
+            SlowParser.constructed += 1
+        self._settings = ParserSettings()
+        self.initialize()
+
+    @property
+    def settings(self):
+        return self._settings
+
+    @settings.setter
+    def settings(self, settings: ParserSettings):
+        self._settings = settings
+
+    def initialize(self) -> None:
+        time.sleep(0.5) # long enough for every thread to pile up on the load
+
+    def accept(self, input: ParserInput) -> ParserOutput:
+        return ParserOutput([])
+
+
+def run(thread_count: int = 32):
+    parser_service = ParserService()
+    parser_service._custom_parsers[STRESS_PARSER_NAME] = SlowParser
+    parser_service._loaded_parsers.pop(STRESS_PARSER_NAME, None)
+
+    barrier = threading.Barrier(thread_count)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(parser_service.get_parser(STRESS_PARSER_NAME))
+
+    threads = [threading.Thread(target=worker) for _ in range(thread_count)]
+    start_time = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    elapsed = time.perf_counter() - start_time
+    same_instance = all(r is results[0] for r in results)
+    print(f"{thread_count} concurrent calls, constructor ran {SlowParser.constructed} time(s), same instance: {same_instance}, {elapsed:.2f}s")
+
+    if SlowParser.constructed != 1 or not same_instance or len(results) != thread_count:
+        print("FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 32)
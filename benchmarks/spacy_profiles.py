@@ -0,0 +1,80 @@
+'''
+Compares the full and fast spaCy profiles on everything under resources/texts
+
+    python -m benchmarks.spacy_profiles [repeats]
+
+Entity spans and the parser output (events, context and all) have to match exactly for the fast profile
+to be usable, any difference fails the run
+'''
+import os
+import sys
+import time
+
+from backend.commons.parser_commons import ParserInput, ParserSettings
+from backend.commons.t2t_enums import ParserProfile
+from backend.parsers.spacy import SpacyParser
+
+TEXTS_DIR = os.path.join(os.path.dirname(__file__), "..", "resources", "texts")
+
+
+def load_texts():
+    texts = {}
+    for root, _, files in os.walk(TEXTS_DIR):
+        for file_name in sorted(files):
+            if file_name.endswith(".txt"):
+                with open(os.path.join(root, file_name), "r", encoding="utf-8") as f:
+                    texts[file_name] = f.read()
+    return texts
+
+
+def create_parser(profile: ParserProfile) -> SpacyParser:
+    parser = SpacyParser()
+    parser.settings = ParserSettings(context_radius=5, profile=profile)
+    return parser
+
+
+def entity_spans(parser: SpacyParser, text: str):
+    document = parser._nlp(text)
+    return [(e.start_char, e.end_char, e.label_) for e in document.ents]
+
+
+def output_rows(parser: SpacyParser, text: str):
+    output = parser.accept(ParserInput(text))
+    entities = list(output.content) + list(getattr(output, "content_no_years", []))
+    return [(e.order, e.date, e.year, e.event, e.context_before, e.context_after, e.sentence_index) for e in entities]
+
+
+def time_parser(parser: SpacyParser, texts, repeats: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for text in texts.values():
+            parser.accept(ParserInput(text))
+    return time.perf_counter() - start_time
+
+
+def run(repeats: int = 3):
+    texts = load_texts()
+    total_chars = sum(len(t) for t in texts.values()) * repeats
+
+    full = create_parser(ParserProfile.FULL)
+    fast = create_parser(ParserProfile.FAST)
+
+    for name, text in texts.items():
+        same_entities = entity_spans(full, text) == entity_spans(fast, text)
+        same_output = output_rows(full, text) == output_rows(fast, text)
+        print(f"{name:<30} entities identical: {same_entities}   parser output identical: {same_output}")
+
+        if not same_entities or not same_output:
+            print("OUTPUT DIFFERS, fast profile is not safe for this model version")
+            sys.exit(1)
+
+    full_time = time_parser(full, texts, repeats)
+    fast_time = time_parser(fast, texts, repeats)
+
+    print(f"full {full.__class__.__name__} pipeline {full._nlp.pipe_names}: {full_time:.2f}s  {total_chars / full_time:,.0f} chars/s")
+    print(f"fast {fast.__class__.__name__} pipeline {fast._nlp.pipe_names}: {fast_time:.2f}s  {total_chars / fast_time:,.0f} chars/s")
+    print(f"speedup x{full_time / fast_time:.2f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
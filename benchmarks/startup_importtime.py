@@ -0,0 +1,63 @@
+'''
+Imports the CLI and the parser service in a fresh interpreter with -X importtime and checks that startup
+stays under a budget, none of the models, renderers or nltk should be imported until they're used
+
+    python -m benchmarks.startup_importtime [budget in ms]
+
+Also fails if one of the heavy modules shows up in the import log at all
+'''
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = 1500
+STARTUP_MODULES = ["cli_runner", "backend.services.parserservice"]
+HEAVY_MODULES = ["spacy", "flair", "allennlp", "torch", "nltk", "matplotlib", "plotly", "tkinter"]
+
+
+def measure(module: str):
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr}")
+
+    # lines look like "import time:   self [us] |  cumulative | imported package", the top level
+    # imports aren't indented so their cumulative times add up to the whole startup
+    total_us = 0
+    imported = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if not parts[1].strip().isdigit():
+            continue # header
+
+        name = parts[2].rstrip()
+        imported.add(name.strip())
+        if not name.startswith("  "):
+            total_us += int(parts[1])
+
+    heavy = sorted(m for m in imported if m.split(".")[0] in HEAVY_MODULES)
+    return total_us / 1000, heavy
+
+
+def run(budget_ms: float = DEFAULT_BUDGET_MS):
+    failed = False
+
+    for module in STARTUP_MODULES:
+        elapsed_ms, heavy = measure(module)
+        print(f"import {module}: {elapsed_ms:.1f}ms, budget {budget_ms:.0f}ms")
+
+        if elapsed_ms > budget_ms:
+            print("  over budget")
+            failed = True
+        if heavy:
+            print(f"  imports heavy modules eagerly: {', '.join(heavy[:10])}")
+            failed = True
+
+    if failed:
+        print("FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS)
@@ -0,0 +1,119 @@
+'''
+Memory and time of a synthetic output of slotted TemporalEntity objects against the __dict__ based
+class it replaced, built the way the parsers build them and sorted the way sort_asc and the renderers sort
+
+    python -m benchmarks.temporal_entity_memory [entity count]
+'''
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from backend.commons.temporal import TemporalEntity, TemporalEntityType
+
+
+# what TemporalEntity was before, trimmed to the parts the parsers and sort_asc use
+class LegacyTemporalEntity(object):
+    def __init__(self):
+        self._order = -1
+        self._entity_type = TemporalEntityType.WITH_YEAR
+        self._event = ""
+        self._year = ""
+        self._date = ""
+        self._context_before = ""
+        self._context_after = ""
+        self._year_before = ""
+        self._year_after = ""
+        self._source = ""
+
+    @property
+    def event(self):
+        return self._event
+
+    @event.setter
+    def event(self, e):
+        self._event = self.format_string(e)
+
+    @property
+    def year(self):
+        return self._year
+
+    @year.setter
+    def year(self, y):
+        self._year = y
+
+    @property
+    def date(self):
+        return self._date
+
+    @date.setter
+    def date(self, d):
+        self._date = d
+
+    @property
+    def order(self):
+        return self._order
+
+    @order.setter
+    def order(self, order):
+        self._order = order
+
+    def format_string(self, s):
+        result = s.strip()
+        result = result.replace("\n", " ")
+        return result
+
+
+def build_legacy(rows):
+    entities = []
+    for order, (event, date, year) in enumerate(rows):
+        e = LegacyTemporalEntity()
+        e.event = event
+        e.date = date
+        e.year = year
+        e.order = order
+        entities.append(e)
+    return entities
+
+
+def build_slotted(rows):
+    return [TemporalEntity(event=event, date=date, year=year, order=order) for order, (event, date, year) in enumerate(rows)]
+
+
+def measure(name, build, rows, sort_key):
+    # timed and measured in separate runs, tracemalloc slows allocation down a lot
+    gc.collect()
+    start_time = time.perf_counter()
+    entities = build(rows)
+    build_time = time.perf_counter() - start_time
+    del entities
+
+    gc.collect()
+    tracemalloc.start()
+    entities = build(rows)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    sorted(entities, key=sort_key)
+    sort_time = time.perf_counter() - start_time
+
+    print(f"{name:<8} {memory / len(rows):8.1f} bytes/entity  build {build_time:6.2f}s  sort {sort_time:6.2f}s")
+    return entities
+
+
+def run(count: int = 1000000):
+    random.seed(0)
+    # the strings are shared between both runs and already clean (as sentence text from the models is),
+    # so only the entities themselves get measured
+    events = [f"Sentence number {i} mentioning an event." for i in range(1000)]
+    rows = [(events[i % 1000], "in 1871", str(random.randint(1, 2024)).zfill(4)) for i in range(count)]
+
+    print(f"{count} entities")
+    measure("legacy", build_legacy, rows, lambda x: int(x.year))
+    measure("slotted", build_slotted, rows, lambda x: x.year_value)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,85 @@
+'''
+Microbenchmark for backend.commons.temporal_normalization against the per-parser copies it replaced
+
+    python -m benchmarks.temporal_normalization [iterations]
+'''
+import re
+import sys
+import timeit
+
+from backend.commons import temporal_normalization
+
+DATE_TEXTS = [
+    "1945", "the 19th century", "June 1812", "between 1618 and 1648", "the early 1990s", "800 AD", "the 5th century BC",
+    "yesterday", "the following year", "12 March 1938", "[12] 1871", "the 1st century", "two years later", "2000",
+    "the 10th and 11th centuries", "from 1933 to 1945", "the end of the war", "1990 and 2005", "0000", "summer",
+]
+
+
+# what SpacyParser/FlairParser did before, copied as-is for comparison
+def legacy_get_year(date_text) -> str:
+    result_year: str = "ERROR GETTING DATE/YEAR"
+
+    if "century" in date_text:
+        year = re.search('([0-9]{1,2})', date_text)
+        if year is not None:
+            year = (int(year.group(1)) - 1) * 100
+            if year == 0:
+                year = 1
+            result_year = str(year)
+
+    years = re.findall(r'(?<![\[])([0-9]{3,4})(?![\]])', date_text)
+
+    if len(years) > 0:
+        for y in years:
+            if len(y) >= 3:
+                if all(v == '0' for v in y) is False:
+                    result_year = str(y)
+
+    return result_year
+
+
+def legacy_format_year(year):
+    if year is None or year == "ERROR GETTING DATE/YEAR":
+        return None
+
+    year = str(year)
+    while len(year) < 4:
+        year = "0" + year
+    return year
+
+
+def legacy_normalize(date_text):
+    return legacy_format_year(legacy_get_year(date_text))
+
+
+def run(iterations: int = 20000):
+    for date_text in DATE_TEXTS:
+        if legacy_normalize(date_text) != temporal_normalization.normalize(date_text):
+            print(f"MISMATCH for {date_text!r}: {legacy_normalize(date_text)} vs {temporal_normalization.normalize(date_text)}")
+            sys.exit(1)
+
+    def legacy():
+        for date_text in DATE_TEXTS:
+            legacy_normalize(date_text)
+
+    def cold():
+        temporal_normalization.clear_caches()
+        for date_text in DATE_TEXTS:
+            temporal_normalization.normalize(date_text)
+
+    def warm():
+        for date_text in DATE_TEXTS:
+            temporal_normalization.normalize(date_text)
+
+    def batch():
+        temporal_normalization.normalize_batch(DATE_TEXTS)
+
+    calls = iterations * len(DATE_TEXTS)
+    for name, function in [("legacy", legacy), ("normalize (cold cache)", cold), ("normalize (memoized)", warm), ("normalize_batch (memoized)", batch)]:
+        elapsed = timeit.timeit(function, number=iterations)
+        print(f"{name:<28} {elapsed:.3f}s  {elapsed / calls * 1e9:,.0f} ns/call")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
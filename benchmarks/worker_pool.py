@@ -0,0 +1,44 @@
+'''
+Threaded parsing against the forked worker pool on the same documents
+
+    python -m benchmarks.worker_pool [parser_name] [workers]
+'''
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.commons.parser_commons import ParserInput
+from backend.services.parserservice import ParserService
+from benchmarks.concurrent_parsing import load_documents, output_rows
+
+
+def run(parser_name: str = "spaCy", workers: int = 4):
+    parser_service = ParserService()
+    parser_service.get_parser(parser_name)
+    documents = load_documents()
+
+    def parse(document):
+        return output_rows(parser_service.parse_with_selected(ParserInput(document), parser_name))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        start_time = time.perf_counter()
+        threaded = list(executor.map(parse, documents))
+        threaded_time = time.perf_counter() - start_time
+    print(f"{len(documents)} documents, {workers} threads   {threaded_time:.2f}s  {len(documents) / threaded_time:.2f} docs/s")
+
+    if not parser_service.start_worker_pool(workers, [parser_name]):
+        print("fork not available on this platform")
+        return
+
+    # same dispatch path the web app uses, callers stay on threads and hand the work to the pool
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        start_time = time.perf_counter()
+        pooled = list(executor.map(parse, documents))
+        pooled_time = time.perf_counter() - start_time
+    parser_service.stop_worker_pool()
+
+    print(f"{len(documents)} documents, {workers} processes {pooled_time:.2f}s  {len(documents) / pooled_time:.2f} docs/s  x{threaded_time / pooled_time:.2f}  identical outputs: {pooled == threaded}")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else "spaCy", int(sys.argv[2]) if len(sys.argv) > 2 else 4)
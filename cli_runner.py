@@ -2,7 +2,6 @@ from operator import mul, pos
 import re
 from typing import List
 
-from click import parser
 from backend.commons.parser_commons import ParserInput
 from backend.commons.t2t_enums import RendererPaginationSetting
 from backend.renderers.base_renderer import RendererOutputType, RendererSettings
@@ -10,10 +9,14 @@ from backend.services import parserservice, renderservice, pipeline_manager_serv
 from backend.services.parser_comparison_service import ParserComparisonService
 from backend.commons.utils import word_list_to_string
 from backend.commons.parser_commons import ParserInput
-from backend.renderers.mpl import MPLInteractiveRenderer, MPLRenderer
 from backend.commons.t2t_logging import initialize_logging
+from backend.commons.ingestion import iter_file_chunks
+from backend.commons.output_exports import CSVExporter
+from backend.commons.utils import get_export_folder_path
+from backend.services.corpus_service import CorpusService, resolve_corpus_paths
+import os
 
-def run_cli() -> None:
+def run_cli(batch_chunk_length: int = 0, batch_overlap_sentences = None) -> None:
     initialize_logging()
 
     possible_selections = ["Generate Timeline", "Compare Parsers"]
@@ -23,11 +26,45 @@ def run_cli() -> None:
         mode_select = input()
 
     if resolve_selection_text(mode_select, possible_selections) == possible_selections[0]:
-        generate_timeline_flow()
+        generate_timeline_flow(batch_chunk_length, batch_overlap_sentences)
     elif resolve_selection_text(mode_select, possible_selections) == possible_selections[1]:
         compare_parsers_flow()
 
     
+def run_corpus(corpus: str, parser_name: str, workers: int, output_dir = None, batch_chunk_length: int = 0, batch_overlap_sentences = None) -> None:
+    initialize_logging()
+
+    paths = resolve_corpus_paths(corpus)
+    if len(paths) == 0:
+        print(f"No text files found for {corpus}")
+        return
+
+    pipeline_manager = pipeline_manager_service.PipelineManagerService(batch_chunk_length=batch_chunk_length)
+    if batch_overlap_sentences is not None:
+        pipeline_manager.batch_overlap_sentences = batch_overlap_sentences
+
+    if parser_name not in pipeline_manager.parser_service.get_parser_names():
+        print(f"Unknown parser {parser_name}, available: {pipeline_manager.parser_service.get_parser_names()}")
+        return
+
+    print(f"Parsing {len(paths)} documents with {parser_name} on {workers} workers")
+    corpus_result = CorpusService(pipeline_manager, workers).run(paths, parser_name)
+
+    output_dir = output_dir or os.path.join(get_export_folder_path(nesting_level=2), "corpus")
+    exporter = CSVExporter()
+    for document in corpus_result.parsed_documents:
+        exporter.export(document.export_name, document.output, output_dir) # type: ignore
+    exporter.export("merged_timeline", corpus_result.merged_output, output_dir, include_source=True)
+
+    for document in corpus_result.documents:
+        if document.error is not None:
+            print(f"Failed: {document.path} ({document.error})")
+
+    print(f"{len(corpus_result.parsed_documents)}/{len(paths)} documents, {corpus_result.sentence_count} sentences, "
+          f"{len(corpus_result.merged_output.content)} temporals in {corpus_result.elapsed_time:.2f}s")
+    print(f"{corpus_result.documents_per_second():.2f} documents/s, {corpus_result.sentences_per_second():.1f} sentences/s")
+
+
 def compare_parsers_flow():
     parser_service = parserservice.ParserService()
     parser_list = parser_service.get_parser_names()
@@ -47,8 +84,12 @@ def compare_parsers_flow():
     print(multi_select)
 
 
-def generate_timeline_flow():
-    pipeline_manager = pipeline_manager_service.PipelineManagerService()
+def generate_timeline_flow(batch_chunk_length: int = 0, batch_overlap_sentences = None):
+    pipeline_manager = pipeline_manager_service.PipelineManagerService(batch_chunk_length=batch_chunk_length)
+    if batch_overlap_sentences is not None:
+        pipeline_manager.batch_overlap_sentences = batch_overlap_sentences
+    if batch_chunk_length > 0:
+        print(f"Batch mode, chunks of {batch_chunk_length} characters")
     parser_service = pipeline_manager.parser_service
 
     selected_parser = ""
@@ -83,6 +124,9 @@ def generate_timeline_flow():
         print_possible_selections(possible_selections)
         mode_select = input()
 
+    # matplotlib only once there is a timeline to show, the menus before this start fast
+    from backend.renderers.mpl import MPLInteractiveRenderer, MPLRenderer
+
     if resolve_selection_text(mode_select, possible_selections) == possible_selections[0]:
         renderer = MPLInteractiveRenderer()
         #renderer = MPLRenderer()
@@ -105,8 +149,7 @@ def get_file_as_parser_input() -> ParserInput:
     while is_valid_selection(input_path) == False:
         input_path = input("Path to file  ")
 
-    input_content = load_input_file(input_path)
-    parser_input: ParserInput = ParserInput(input_content)
+    parser_input: ParserInput = load_input_file(input_path) # type: ignore
     return parser_input
 
 
@@ -185,9 +228,8 @@ def get_multiple_selections(possible_selections):
 
 def load_input_file(path: str): # no typing because str | None requires python 3.10, TODO see how many things the update breaks
     try:
-        with open(path, 'r') as file:
-            lines = file.readlines()
-        return word_list_to_string(lines)
+        # memory mapped and cut into sentence aligned chunks, batch mode parses them without joining the whole text
+        return ParserInput.from_chunks(iter_file_chunks(path))
     except FileNotFoundError:
         print(f"Error: File not found at path: {path}")
         return None
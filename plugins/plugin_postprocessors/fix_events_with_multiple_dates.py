@@ -1,7 +1,6 @@
 import enum
 from backend.commons.parser_commons import ParserOutput
-import spacy
-import re
+from backend.commons.temporal_normalization import normalize_batch, normalize
 
 '''
 Currently, some of the default parsers will only detect the first occurrence of a phrase indicating a temporal event
@@ -16,14 +15,14 @@ class fix_events_with_multiple_dates:
     _SPACY_TEMPORAL_TAGS = ["DATE", "TIME"]
 
     def __init__(self):
-        pass
+        self._nlp = None # plugins get instantiated on startup, spaCy is loaded on the first output that needs it
 
     def process(self, parser_ouput: ParserOutput) -> None:
         if parser_ouput.content_no_years is None or len(parser_ouput.content_no_years) == 0:
             print("This parser output has no non-year temporals, plugin terminating early")
             return
 
-        nlp = spacy.load("en_core_web_sm")
+        nlp = self.get_nlp()
         
         indices_to_remove = []
 
@@ -39,9 +38,7 @@ class fix_events_with_multiple_dates:
             if len(all_temporals) <= 1:
                 continue
             
-            for t in all_temporals:
-                parsed = self.parse_date(t)
-
+            for t, parsed in zip(all_temporals, normalize_batch(all_temporals)):
                 if parsed is not None:
                     # print("GREAT SUCCESS ", x.date, " to ", t, " ", x.event)
                     indices_to_remove.append(i)
@@ -58,31 +55,11 @@ class fix_events_with_multiple_dates:
 
 
 
-    def parse_date(self, date_text):
-        result_year = None
-
-        if "century" in date_text:
-            year = re.search('([0-9]{1,2})', date_text)
-            if year is not None:
-                year = (int(year.group(1)) -1) * 100
-                if year == 0:
-                    year = 1
-                result_year = str(year)
-
-        years = re.findall(r'(?<![\[])([0-9]{3,4})(?![\]])', date_text)
-
-        if len(years) > 0:
-            for y in years:
-                if len(y) >= 3:
-                    if all(v == '0' for v in y) is False:
-                        result_year = str(y)
-        
-        if result_year is None:
-            return None
-
-        while len(result_year) < 4:
-            result_year = "0"+result_year
-
-        return result_year
+    def get_nlp(self):
+        if self._nlp is None:
+            import spacy
+            self._nlp = spacy.load("en_core_web_sm")
+        return self._nlp
 
-            
+    def parse_date(self, date_text):
+        return normalize(date_text)
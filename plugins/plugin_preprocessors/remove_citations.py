@@ -8,7 +8,8 @@ class remove_citations:
         pass
 
     def process(self, parser_input: ParserInput):
-        parser_input._content = self.remove_wikipedia_citations(parser_input._content)
+        # per chunk, a citation never spans a sentence boundary so chunked inputs stay chunked
+        parser_input.transform(self.remove_wikipedia_citations)
 
     def remove_wikipedia_citations(self, parser_content):
         pattern = r'\[\s*(?:[0-9]+|citation needed|[\w\s]+)\s*\]'
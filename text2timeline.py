@@ -1,13 +1,30 @@
 from backend.commons.t2t_logging import log_info, log_error
-import sys
+import argparse
+
+def parse_arguments():
+    argument_parser = argparse.ArgumentParser(description="Text2Timeline, starts the web app unless -cli is passed")
+    argument_parser.add_argument("-cli", action="store_true", help="run the interactive command line flow instead of the web app")
+    argument_parser.add_argument("--batch-chunk-length", type=int, default=0,
+                                 help="parse documents in chunks of about this many characters to bound memory, 0 parses them whole")
+    argument_parser.add_argument("--batch-overlap", type=int, default=None,
+                                 help="sentences of context shared between neighbouring chunks in batch mode")
+    argument_parser.add_argument("--corpus", default=None,
+                                 help="directory or glob of text files, parses all of them without prompts and merges the timelines")
+    argument_parser.add_argument("--parser", default="spaCy", help="parser used in corpus mode")
+    argument_parser.add_argument("--workers", type=int, default=4, help="documents parsed at the same time in corpus mode")
+    argument_parser.add_argument("--output-dir", default=None, help="where corpus mode writes its csv files, exports/corpus by default")
+    return argument_parser.parse_args()
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "-cli":
-            import cli_runner
-            cli_runner.run_cli()
-        else:
-            print(f"Unrecognized command line argument {sys.argv[1]} passed, exiting.")
+    arguments = parse_arguments()
+
+    if arguments.corpus:
+        import cli_runner
+        cli_runner.run_corpus(arguments.corpus, arguments.parser, arguments.workers, arguments.output_dir,
+                              arguments.batch_chunk_length, arguments.batch_overlap)
+    elif arguments.cli:
+        import cli_runner
+        cli_runner.run_cli(arguments.batch_chunk_length, arguments.batch_overlap)
     else:
         from backend.flask.app_templated import app
         app.run(debug=True, host="0.0.0.0")